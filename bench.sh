@@ -0,0 +1,2 @@
+export PYTHONPATH=$PYTHONPATH:$(pwd)/src
+python3 -m bench "$@"
@@ -1,78 +1,467 @@
+import functools
+import heapq
+import itertools
+import logging
 import os
 import shutil
+import sys
 import textwrap
-from helpers import markdown_to_html_node
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, NamedTuple
+from helpers import BASEPATH_SLOT, apply_basepath, block_memo, block_to_html, blocks_to_html_node, collect_urls, inline_memo, iter_blocks, markdown_to_html, memo_counts, note_urls, rebase_urls
+from frontmatter import is_opening, read_front_matter, split_front_matter, title_from_line
+from manifest import BuildManifest, SourceVersion, collect_sources, hash_file, note_source, read_source, remove_output
+from parsecache import ParseCache
+from rendercache import RenderCache
+from template import Template, load_template
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Pages at least this big are streamed instead of being held in memory whole
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+# The handler configure_logging added to the root logger, if it added one
+_stdout_handler = None
+
+def configure_logging(level: int | str = logging.INFO):
+    """
+    Sends build messages to stdout as plain lines. Logging a program that
+    runs the build has set up itself is left alone; calling this again only
+    changes the level.
+    """
+    global _stdout_handler
+    root = logging.getLogger()
+    if _stdout_handler in root.handlers:
+        # Follows sys.stdout when it was replaced since, as basicConfig would
+        _stdout_handler.setStream(sys.stdout)
+    elif root.handlers:
+        return
+    else:
+        _stdout_handler = logging.StreamHandler(sys.stdout)
+        _stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(_stdout_handler)
+    root.setLevel(level)
 
 def copy_directory_recursive(src_path: str, dest_path: str):
-    print(f"Cleaning and copying from {src_path} to {dest_path}")
+    logger.info("Cleaning and copying from %s to %s", src_path, dest_path)
 
     if os.path.exists(dest_path):
-        print(f"Removing contents from {dest_path}")
+        logger.info("Removing contents from %s", dest_path)
         shutil.rmtree(dest_path)
-        print(f"{dest_path} is now empty")
+        logger.info("%s is now empty", dest_path)
 
     # if dest_path doesn't exist
-    print(f"Creating directory {dest_path}...")
+    logger.info("Creating directory %s...", dest_path)
     os.makedirs(dest_path, exist_ok=True)
-    print(f"Directory {dest_path} created")
+    logger.info("Directory %s created", dest_path)
 
     for item in os.listdir(src_path):
         src_item_path = os.path.join(src_path, item)
         dest_item_path = os.path.join(dest_path, item)
 
         if os.path.isfile(src_item_path):
-            print(f"Copying {src_item_path} to {dest_item_path}")
+            logger.info("Copying %s to %s", src_item_path, dest_item_path)
             shutil.copy2(src_item_path, dest_item_path)
         elif os.path.isdir(src_item_path):
-            print(f"Entering subdirectory {src_item_path}")
+            logger.info("Entering subdirectory %s", src_item_path)
             copy_directory_recursive(src_item_path, dest_item_path)
         else:
-            print(f"Unknown file type: {src_item_path}. Skipping...") 
+            logger.info("Unknown file type: %s. Skipping...", src_item_path)
     
-    print(f"Finished copying from {src_path} to {dest_path}")
+    logger.info("Finished copying from %s to %s", src_path, dest_path)
+
+def files_differ(src_path: str, dest_path: str) -> bool:
+    if not os.path.exists(dest_path):
+        return True
+
+    src_stat = os.stat(src_path)
+    dest_stat = os.stat(dest_path)
+    if src_stat.st_size != dest_stat.st_size:
+        return True
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return False
+
+    # Same size but different mtime, only the content can tell
+    if hash_file(src_path) != hash_file(dest_path):
+        return True
+
+    # Identical content, align the mtime so the next sync takes the fast path
+    shutil.copystat(src_path, dest_path)
+    return False
+
+def sync_directory(src_path: str, dest_path: str, previous: set[str] | None = None) -> set[str]:
+    """
+    Copies only new or changed files from src_path to dest_path and leaves
+    unchanged ones untouched. Files listed in previous (paths relative to
+    dest_path synced by an earlier run) that no longer exist in src_path are
+    deleted. Returns the relative paths of all files now in sync.
+    """
+    logger.info("Syncing from %s to %s", src_path, dest_path)
+
+    synced = set()
+    copied = 0
+
+    for dir_path, dir_names, file_names in os.walk(src_path):
+        dir_names.sort()
+        relative_dir = os.path.relpath(dir_path, src_path)
+
+        for item in sorted(file_names):
+            src_item_path = os.path.join(dir_path, item)
+            if not os.path.isfile(src_item_path):
+                logger.info("Unknown file type: %s. Skipping...", src_item_path)
+                continue
+
+            relative_path = os.path.normpath(os.path.join(relative_dir, item))
+            dest_item_path = os.path.join(dest_path, relative_path)
+            synced.add(relative_path)
+
+            if not files_differ(src_item_path, dest_item_path):
+                continue
+
+            logger.info("Copying %s to %s", src_item_path, dest_item_path)
+            os.makedirs(os.path.dirname(dest_item_path), exist_ok=True)
+            shutil.copy2(src_item_path, dest_item_path)
+            copied += 1
+
+    orphans = sorted((previous or set()) - synced)
+    for relative_path in orphans:
+        orphan_path = os.path.join(dest_path, relative_path)
+        if os.path.isfile(orphan_path):
+            logger.info("Removing orphaned file %s", orphan_path)
+            remove_output(orphan_path, dest_path)
+
+    logger.info("Finished syncing from %s to %s: %s copied, %s removed, %s unchanged", src_path, dest_path, copied, len(orphans), len(synced) - copied)
+    return synced
+
+def unrecorded_assets(dest_path: str, dir_path_content: str) -> set[str]:
+    """
+    Returns the files in dest_path, relative to it, that are not pages of
+    dir_path_content. Without a manifest any of them may have been synced
+    by an earlier build, so passed to sync_directory as previous, those no
+    longer in the static directory are deleted as they would be by a full build.
+    """
+    pages = {os.path.relpath(output_path, dest_path) for _, output_path in iter_pages(dir_path_content, dest_path)}
+    files = set()
+    for dir_path, _, file_names in os.walk(dest_path):
+        for item in file_names:
+            relative_path = os.path.relpath(os.path.join(dir_path, item), dest_path)
+            if relative_path not in pages:
+                files.add(relative_path)
+    return files
 
 def extract_title(markdown: str) -> str:
-    header = markdown.strip().split("\n")[0].lstrip("#").strip()
-    
-    if not header:
-        raise ValueError("No title found in Markdown")
-    
-    return header
+    """Returns the title from the front matter of markdown, or else its first line."""
+    metadata, body = split_front_matter(markdown)
+    if metadata.get("title"):
+        return metadata["title"]
 
-def generate_page(basepath: str, from_path: str, template_path: str, output_path: str):
-    markdown = ""
-    template = ""
+    # Only the first line is needed, don't split the whole document
+    body = body.lstrip()
+    first_line_end = body.find("\n")
+    return title_from_line(body if first_line_end == -1 else body[:first_line_end])
 
-    print(f"Generating page from {from_path} to {output_path} using {template_path}")
+def clean_markdown(markdown: str) -> str:
+    with tracing.span("dedent"):
+        return textwrap.dedent(markdown.strip()).strip().replace(BASEPATH_SLOT, "\ufffd")
 
-    with open(from_path, "r") as f:
-        markdown = f.read().strip()
+def clean_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the lines clean_markdown would leave, one at a time. Blank lines
+    at either end are dropped, the first line is left-stripped and the last
+    one right-stripped, and lines of only spaces and tabs are emptied, which
+    is all dedent does once the text is stripped. Blank lines are held back
+    until a line with text shows they aren't trailing.
+    """
+    blank_lines = []
+    previous = None
+
+    for line in lines:
+        line = line.rstrip("\n").replace(BASEPATH_SLOT, "\ufffd")
+        if not line.strip():
+            if previous is not None:
+                blank_lines.append("" if not line.strip(" \t") else line)
+            continue
+
+        if previous is None:
+            line = line.lstrip()
+        else:
+            yield previous
+            yield from blank_lines
+            blank_lines.clear()
+        previous = line
 
-    cleaned_markdown = textwrap.dedent(markdown).strip()
+    if previous is not None:
+        yield previous.rstrip()
 
-    with open(template_path, "r") as f:
-        template = f.read()
+def decode_markdown(data: bytes) -> str:
+    # Same newline translation as reading the file in text mode
+    return data.decode().replace("\r\n", "\n").replace("\r", "\n")
 
-    html = markdown_to_html_node(cleaned_markdown).to_html()
-    title = extract_title(cleaned_markdown)
-    page = template.replace("{{ Title }}", title).replace("{{ Content }}", html)
-    page = page.replace("href=\"/", f"href=\"{basepath}").replace("src=\"/", f"src=\"{basepath}")
+def read_markdown(from_path: str) -> str:
+    with tracing.span("read"):
+        data, _ = read_source(from_path)
+
+    return clean_markdown(decode_markdown(data))
+
+def fill_template(basepath: str, template: Template, markdown: str, html: str) -> str:
+    return fill_page(basepath, template, extract_title(markdown), html)
+
+def fill_page(basepath: str, template: Template, title: str, html: str) -> str:
+    """
+    Fills a title and HTML rendered with BASEPATH_SLOT into the template.
+    The basepath goes into the site-absolute URLs of the template's own
+    attributes and of the links and images in html, and nowhere else.
+    """
+    with tracing.span("template fill"):
+        page = template.rebased(basepath).render({"Title": title, "Content": html})
+
+    with tracing.span("basepath rewrite"):
+        return apply_basepath(basepath, page)
+
+def write_page(output_path: str, page: str):
+    with tracing.span("write"):
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        with open(output_path, "w") as f:
+            f.write(page)
+
+def render_content(markdown: str, fast: bool = False) -> str:
+    """Returns the HTML of cleaned markdown, before it is filled into the template."""
+    markdown = split_front_matter(markdown)[1]
+
+    # The fast path emits the same HTML without building the node tree
+    if fast:
+        with tracing.span("render"):
+            return markdown_to_html(markdown, basepath=None)
+
+    with tracing.span("block split"):
+        blocks = list(iter_blocks(markdown))
+    with tracing.span("inline parse"):
+        node = blocks_to_html_node(blocks)
+    with tracing.span("render"):
+        return rebase_urls(node).to_html()
+
+def render_markdown(basepath: str, markdown: str, template: Template, fast: bool = False, parsed: ParseCache | None = None) -> str:
+    """
+    Returns the finished HTML of a page from its cleaned markdown. With a
+    parse cache, markdown rendered by an earlier build is only filled in.
+    """
+    if parsed is None:
+        return fill_template(basepath, template, markdown, render_content(markdown, fast))
+
+    key = parsed.key(markdown)
+    with tracing.span("parse cache load"):
+        entry = parsed.load(key)
+    if entry is None:
+        with collect_urls() as rendered:
+            html = render_content(markdown, fast)
+        urls = rendered.urls
+        with tracing.span("parse cache store"):
+            parsed.save(key, html, urls)
+    else:
+        html, urls = entry
+    note_urls(urls)
+
+    return fill_template(basepath, template, markdown, html)
+
+def render_page(basepath: str, from_path: str, template_path: str, fast: bool = False, parsed: ParseCache | None = None) -> str:
+    """Returns the finished HTML of the page generated from from_path."""
+    # Compiled once and only reloaded when the template or one of its includes changes
+    return render_markdown(basepath, read_markdown(from_path), load_template(template_path), fast, parsed)
+
+def _stream_html(lines: Iterable[str]) -> Iterator[str]:
+    yield "<div>"
+    parts = []
+    valid = True
+    blocks = 0
+    for block_type, block in iter_blocks(lines):
+        valid = block_to_html(block_type, block, parts) and valid
+        yield "".join(parts)
+        parts.clear()
+        blocks += 1
+    yield "</div>"
+
+    # Raised at the end, like markdown_to_html, so parse errors come first
+    if not valid or not blocks:
+        raise ValueError("Parent nodes must have children")
+
+def stream_page(basepath: str, from_path: str, template_path: str, output_path: str):
+    """
+    Writes the same page as generate_page without ever holding all of it in
+    memory: the markdown is read line by line, rendered one block at a time
+    and written straight to the output file between the template's prefix
+    and suffix, so memory use depends on the largest block rather than the
+    size of the file. The page is written to a temporary file and renamed
+    into place, so an error never leaves half a page behind.
+    """
+    template = load_template(template_path)
+    if template.names.count("Content") != 1:
+        # Content can only be streamed once
+        write_page(output_path, render_page(basepath, from_path, template_path, fast=True))
+        return
 
     output_dir = os.path.dirname(output_path)
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
-    with open(output_path, "w") as f:
-        f.write(page)
+    tmp_path = f"{output_path}.tmp"
+    try:
+        with tracing.span("render"), open(from_path, "r") as source, open(tmp_path, "w") as output:
+            lines = clean_lines(source)
+            first_line = next(lines, "")
+            metadata = {}
+            if is_opening(first_line):
+                metadata = read_front_matter(lines)
+                first_line = next((line for line in lines if line.strip()), "")
+
+            try:
+                title, title_error = metadata.get("title") or title_from_line(first_line), None
+            except ValueError as e:
+                title, title_error = "", e
+
+            content = _stream_html(itertools.chain([first_line], lines))
+            # The slot is a single character, so it is never split between chunks
+            for chunk in template.rebased(basepath).stream({"Title": title, "Content": content}):
+                output.write(apply_basepath(basepath, chunk))
+
+            # A missing title is reported after rendering errors, as fill_template does
+            if title_error is not None:
+                raise title_error
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _generate_streamed_page(basepath: str, from_path: str, template_path: str, output_path: str, cache: RenderCache | None) -> bool:
+    # Never read whole, so the version the manifest records is taken up front
+    with tracing.span("read"):
+        note_source(from_path)
+
+    if cache is None:
+        stream_page(basepath, from_path, template_path, output_path)
+        return False
+
+    with tracing.span("read"):
+        key = cache.key_file(from_path, load_template(template_path).hash, basepath)
+    with tracing.span("cache fetch"):
+        if cache.fetch(key, output_path):
+            note_urls(None)
+            return True
+
+    stream_page(basepath, from_path, template_path, output_path)
+    with tracing.span("cache store"):
+        cache.store_file(key, output_path)
+    return False
 
-    print(f"Page generated at {output_path}")
+def is_streamed(from_path: str) -> bool:
+    """Whether the page generated from from_path is too big to hold in memory whole, and is streamed instead."""
+    return os.path.getsize(from_path) >= STREAM_THRESHOLD
 
-def generate_pages_recursive(basepath: str, dir_path_content: str, template_path: str, dest_dir_path: str):
-    print(f"Generating pages from directory: {dir_path_content}")
+def fetch_page(basepath: str, from_path: str, template: Template, output_path: str, cache: RenderCache | None) -> tuple[bytes, str | None] | None:
+    """
+    Reads from_path. With a render cache, a page some earlier build already
+    rendered from the same inputs is copied to output_path and None is
+    returned. Otherwise returns the source and the render cache key to
+    store the page under, None without a render cache.
+    """
+    with tracing.span("read"):
+        data, _ = read_source(from_path)
+    if cache is None:
+        return data, None
+
+    key = cache.key(data, template.hash, basepath)
+    with tracing.span("cache fetch"):
+        if cache.fetch(key, output_path):
+            note_urls(None)
+            return None
+    return data, key
+
+def render_source(basepath: str, data: bytes, template: Template, fast: bool = False, parsed: ParseCache | None = None) -> str:
+    """Returns the finished HTML of a page from the source fetch_page read."""
+    return render_markdown(basepath, clean_markdown(decode_markdown(data)), template, fast, parsed)
+
+def store_page(output_path: str, page: str, cache: RenderCache | None, key: str | None):
+    """Writes a rendered page, and stores it in the render cache under the key fetch_page returned."""
+    write_page(output_path, page)
+    if key is not None:
+        with tracing.span("cache store"):
+            cache.store(key, page)
+
+def generate_page(basepath: str, from_path: str, template_path: str, output_path: str, fast: bool = False, cache: RenderCache | None = None, parsed: ParseCache | None = None) -> bool:
+    """
+    Renders from_path into output_path. With a render cache, a page some
+    earlier build already rendered from the same inputs is copied from the
+    cache instead. With a parse cache, markdown rendered by an earlier build
+    is only filled into the template. Pages of STREAM_THRESHOLD bytes or more
+    are rendered with stream_page. Returns whether the page came from the
+    render cache.
+    """
+    logger.info("Generating page from %s to %s using %s", from_path, output_path, template_path)
+
+    with tracing.page(from_path):
+        # Huge pages are streamed so memory use doesn't grow with their size
+        if is_streamed(from_path):
+            from_cache = _generate_streamed_page(basepath, from_path, template_path, output_path, cache)
+            logger.info("Page copied from the render cache to %s" if from_cache else "Page generated at %s", output_path)
+            return from_cache
+
+        # Compiled once and only reloaded when the template or one of its includes changes
+        template = load_template(template_path)
+        fetched = fetch_page(basepath, from_path, template, output_path, cache)
+        if fetched is None:
+            logger.info("Page copied from the render cache to %s", output_path)
+            return True
+
+        data, key = fetched
+        store_page(output_path, render_source(basepath, data, template, fast, parsed), cache, key)
+
+    logger.info("Page generated at %s", output_path)
+    return False
+
+def write_rebased_copy(src_path: str, dest_path: str, basepath: str):
+    """Copies a page generated with BASEPATH_SLOT as the basepath to dest_path, with basepath filled in."""
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+
+    with open(src_path, "r") as src, open(dest_path, "w") as dest:
+        for chunk in iter(lambda: src.read(1 << 20), ""):
+            dest.write(apply_basepath(basepath, chunk))
+
+def generate_page_targets(targets: list[tuple[str, str]], basepath: str, from_path: str, template_path: str, output_path: str, fast: bool = False, cache: RenderCache | None = None, parsed: ParseCache | None = None) -> bool:
+    """
+    Generates the page at output_path, inside the output directory of the
+    first of targets, for every (basepath, output directory) in targets.
+    The page is generated once with generate_page, with basepath
+    BASEPATH_SLOT, and every target gets a copy with its own basepath
+    filled in, so the markdown is only parsed once however many targets
+    there are. Returns whether the page came from the render cache.
+    """
+    relative_path = os.path.relpath(output_path, targets[0][1])
+    slotted_path = f"{output_path}.slotted.tmp"
+    try:
+        from_cache = generate_page(basepath, from_path, template_path, slotted_path, fast, cache, parsed)
+        with tracing.span("write targets"):
+            for target_basepath, target_dir in targets:
+                write_rebased_copy(slotted_path, os.path.join(target_dir, relative_path), target_basepath)
+    finally:
+        if os.path.exists(slotted_path):
+            os.remove(slotted_path)
+    return from_cache
+
+def generate_pages_recursive(basepath: str, dir_path_content: str, template_path: str, dest_dir_path: str, manifest: BuildManifest | None = None, fast: bool = False, cache: RenderCache | None = None, parsed: ParseCache | None = None):
+    logger.info("Generating pages from directory: %s", dir_path_content)
 
     os.makedirs(dest_dir_path, exist_ok=True)
 
-    for item in os.listdir(dir_path_content):
+    with tracing.span("discovery"):
+        items = os.listdir(dir_path_content)
+
+    for item in items:
         full_content_path = os.path.join(dir_path_content, item)
         
         if os.path.isfile(full_content_path):
@@ -80,16 +469,200 @@ def generate_pages_recursive(basepath: str, dir_path_content: str, template_path
                 file_name_html = item.replace(".md", ".html")
                 output_file_path = os.path.join(dest_dir_path, file_name_html)
                 
-                print(f"Generating page for markdown file: {full_content_path}")
-                generate_page(basepath, full_content_path, template_path, output_file_path)
+                if manifest is not None and manifest.is_fresh(full_content_path, output_file_path):
+                    logger.info("Skipping unchanged page: %s", full_content_path)
+                    continue
+
+                logger.info("Generating page for markdown file: %s", full_content_path)
+                with collect_urls() as rendered, collect_sources() as sources:
+                    from_cache = generate_page(basepath, full_content_path, template_path, output_file_path, fast, cache, parsed)
+                if cache is not None:
+                    cache.record(from_cache)
+
+                if manifest is not None:
+                    manifest.record(full_content_path, output_file_path, rendered.known(), sources.get(full_content_path))
             else:
-                print(f"Skipping non-markdown file: {full_content_path}")
+                logger.info("Skipping non-markdown file: %s", full_content_path)
         
         elif os.path.isdir(full_content_path):
             new_dest_dir_path = os.path.join(dest_dir_path, item)
-            print(f"Entering content subdirectory: {full_content_path}")
-            generate_pages_recursive(basepath,full_content_path, template_path, new_dest_dir_path)
+            logger.info("Entering content subdirectory: %s", full_content_path)
+            generate_pages_recursive(basepath,full_content_path, template_path, new_dest_dir_path, manifest, fast, cache, parsed)
         else:
-            print(f"Skipping unknown item type in content directory: {full_content_path}")
+            logger.info("Skipping unknown item type in content directory: %s", full_content_path)
+
+    logger.info("Finished crawling directory: %s", dir_path_content)
+
+
+class PageGenerationError(Exception):
+    def __init__(self, source_path: str, error: Exception):
+        super().__init__(f"Failed to generate page from {source_path}: {error}")
+        self.source_path = source_path
+
+def iter_pages(dir_path_content: str, dest_dir_path: str) -> Iterator[tuple[str, str]]:
+    """Yields (markdown path, output path) pairs for every page below dir_path_content, one directory at a time."""
+    for dir_path, dir_names, file_names in os.walk(dir_path_content):
+        dir_names.sort()
+        relative_dir = os.path.relpath(dir_path, dir_path_content)
+
+        for item in sorted(file_names):
+            if not item.endswith(".md"):
+                continue
+
+            output_file_path = os.path.normpath(os.path.join(dest_dir_path, relative_dir, item.replace(".md", ".html")))
+            yield os.path.join(dir_path, item), output_file_path
+
+def discover_pages(dir_path_content: str, dest_dir_path: str) -> list[tuple[str, str]]:
+    """Returns (markdown path, output path) pairs for every page below dir_path_content."""
+    return list(iter_pages(dir_path_content, dest_dir_path))
+
+def shard_pages(pages: list[tuple[str, str]], index: int, count: int) -> list[tuple[str, str]]:
+    """
+    Returns the pages of shard index (counting from 1) out of count. Pages
+    are handed out largest first, each to the shard with the fewest bytes so
+    far, which keeps the shards balanced. Only file sizes and paths are used,
+    so every machine building the same content computes the same split.
+    """
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index}/{count} is out of range")
+
+    sized = sorted(((os.path.getsize(source), source, output) for source, output in pages), key=lambda page: (-page[0], page[1]))
+    # (bytes assigned, shard index) so ties go to the lowest index
+    totals = [(0, shard) for shard in range(1, count + 1)]
+    selected = []
+
+    for size, source, output in sized:
+        total, shard = heapq.heappop(totals)
+        if shard == index:
+            selected.append((source, output))
+        heapq.heappush(totals, (total + size, shard))
+
+    return sorted(selected)
+
+def default_executor() -> str:
+    # Threads only run Python code in parallel on free-threaded builds
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    return "process" if is_gil_enabled() else "thread"
+
+def _init_worker(log_level: int):
+    # Worker processes started with spawn or forkserver don't inherit the logging setup
+    configure_logging(log_level)
+    # Forked workers inherit the parent's memo counts, which the parent already has
+    block_memo.reset_counts()
+    inline_memo.reset_counts()
+
+def _generate_page_collecting(generate: Callable[..., bool], basepath: str, from_path: str, *args) -> tuple[bool, set[str] | None, SourceVersion | None]:
+    """
+    Runs generate and returns whether the page came from the cache, with
+    the URLs it rendered or None if they are unknown, and the version of
+    from_path it read.
+    """
+    with collect_urls() as rendered, collect_sources() as sources:
+        from_cache = generate(basepath, from_path, *args)
+    return from_cache, rendered.known(), sources.get(from_path)
+
+class WorkerResult(NamedTuple):
+    """What a worker process sends back for every page it generated."""
+
+    from_cache: bool
+    # The URLs the page rendered, None if they are unknown
+    urls: set[str] | None
+    source: SourceVersion | None
+    # (events, page times, page peaks) the worker's own tracer recorded, if traced
+    trace: tuple | None
+    pid: int
+    # The worker's memo counts so far
+    memo_counts: dict[str, tuple[int, int]]
+    # The parse cache hits and misses of this page
+    parsed_counts: tuple[int, int]
+
+def _generate_page_in_worker(basepath: str, from_path: str, template_path: str, output_path: str, fast: bool, cache: RenderCache | None, parsed: ParseCache | None, traced: bool, memory: bool, generate: Callable[..., bool] = generate_page) -> WorkerResult:
+    """Runs generate (generate_page by default) in a worker process."""
+    # Untraced workers keep the null tracer they started with
+    worker_tracer = tracing.Tracer(memory) if traced else tracing.tracer
+    previous = tracing.set_tracer(worker_tracer)
+    try:
+        from_cache, urls, source = _generate_page_collecting(generate, basepath, from_path, template_path, output_path, fast, cache, parsed)
+    finally:
+        tracing.set_tracer(previous)
+
+    trace = (worker_tracer.events, worker_tracer.page_times, worker_tracer.page_peaks) if traced else None
+    parsed_counts = (parsed.hits, parsed.misses) if parsed is not None else (0, 0)
+    return WorkerResult(from_cache, urls, source, trace, os.getpid(), memo_counts(), parsed_counts)
+
+def _memo_lookups(counts: dict[str, tuple[int, int]]) -> int:
+    return sum(hits + misses for hits, misses in counts.values())
+
+def generate_pages_parallel(basepath: str, dir_path_content: str, template_path: str, dest_dir_path: str, jobs: int, *, executor: str | None = None, manifest: BuildManifest | None = None, fast: bool = False, cache: RenderCache | None = None, shard: tuple[int, int] | None = None, parsed: ParseCache | None = None, targets: list[tuple[str, str]] | None = None):
+    """
+    Generates every page below dir_path_content on a pool of jobs workers.
+    With targets, a list of (basepath, output directory) whose first
+    directory is dest_dir_path, every page is rendered once with basepath
+    and written to all of them by generate_page_targets.
+    """
+    logger.info("Discovering pages in directory: %s", dir_path_content)
+
+    with tracing.span("discovery"):
+        pages = discover_pages(dir_path_content, dest_dir_path)
+        # Sharded before the freshness check, so the split doesn't depend on what changed locally
+        if shard is not None:
+            pages = shard_pages(pages, *shard)
+        if manifest is not None:
+            pages = [(source, output) for source, output in pages if not manifest.is_fresh(source, output)]
+
+        # Largest pages first so a single huge page doesn't finish last on an otherwise idle pool
+        pages.sort(key=lambda page: (-os.path.getsize(page[0]), page[0]))
+
+    executor = executor or default_executor()
+    logger.info("Generating %s pages with %s %s workers", len(pages), jobs, executor)
+
+    os.makedirs(dest_dir_path, exist_ok=True)
+
+    if executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(logging.getLogger().level,))
+
+    # Threads share the tracer and the memos, worker processes send back what theirs recorded
+    tracer = tracing.tracer
+    in_worker = executor == "process"
+    generate = generate_page if targets is None else functools.partial(generate_page_targets, targets)
+    task, extra_args = (_generate_page_in_worker, (parsed, tracer.enabled, tracer.memory, generate)) if in_worker else (functools.partial(_generate_page_collecting, generate), (parsed,))
+    # Each worker's latest memo counts, by process id
+    worker_counts = {}
+
+    with pool:
+        futures = {
+            pool.submit(task, basepath, source, template_path, output, fast, cache, *extra_args): (source, output)
+            for source, output in pages
+        }
+
+        for future in as_completed(futures):
+            source, output = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                raise PageGenerationError(source, e) from e
+
+            from_cache, urls, version = result[:3]
+            if in_worker:
+                if parsed is not None:
+                    parsed.add_counts(*result.parsed_counts)
+                if result.trace is not None:
+                    tracer.merge(*result.trace)
+                # Results arrive out of order, a worker's latest counts are its largest
+                counts = result.memo_counts
+                worker_counts[result.pid] = max(worker_counts.get(result.pid, counts), counts, key=_memo_lookups)
+            if cache is not None:
+                cache.record(from_cache)
+
+            if manifest is not None:
+                manifest.record(source, output, urls, version)
+
+    for counts in worker_counts.values():
+        block_memo.add_counts(*counts["block"])
+        inline_memo.add_counts(*counts["inline"])
 
-    print(f"Finished crawling directory: {dir_path_content}")
+    logger.info("Finished generating pages from directory: %s", dir_path_content)
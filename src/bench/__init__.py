@@ -0,0 +1 @@
+"""Benchmarks for the static site generator on seeded synthetic corpora."""
@@ -0,0 +1,140 @@
+import os
+import random
+
+WORDS = (
+    "ring", "hobbit", "shire", "wizard", "elf", "dwarf", "mountain", "river", "forest",
+    "journey", "fellowship", "shadow", "light", "tower", "king", "sword", "song", "road",
+    "the", "a", "of", "and", "to", "in", "is", "was", "that", "with", "for", "on", "old",
+)
+
+# Weights of each block kind per document shape
+DOCUMENT_SHAPES = {
+    "mixed": {"paragraph": 6, "heading": 2, "list": 2, "ordered": 1, "quote": 1, "code": 1},
+    "link-dense": {"paragraph": 8, "heading": 1, "list": 3},
+    "list-heavy": {"paragraph": 1, "heading": 1, "list": 6, "ordered": 6},
+    "deep-quotes": {"paragraph": 1, "quote": 8},
+    "huge-code": {"paragraph": 1, "code": 6},
+}
+
+# Number of pages and approximate size of each page in bytes
+SITE_SHAPES = {
+    "many-small": (2000, 2_000),
+    "few-large": (4, 1_000_000),
+}
+
+TEMPLATE = """<!doctype html>
+<html>
+<head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+</head>
+<body>
+    <article>{{ Content }}</article>
+</body>
+</html>
+"""
+
+class CorpusGenerator:
+    """
+    Generates reproducible markdown corpora. The same seed always produces
+    the same documents, so benchmark runs can be compared over time.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def words(self, count: int) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(count))
+
+    def link(self) -> str:
+        return f"[{self.words(self.random.randint(1, 4))}](/{self.words(2).replace(' ', '-')})"
+
+    def sentence(self, link_density: float = 0.1) -> str:
+        parts = []
+        for _ in range(self.random.randint(6, 16)):
+            roll = self.random.random()
+            if roll < link_density:
+                parts.append(self.link())
+            elif roll < link_density + 0.04:
+                parts.append(f"**{self.words(2)}**")
+            elif roll < link_density + 0.08:
+                parts.append(f"_{self.words(2)}_")
+            elif roll < link_density + 0.10:
+                parts.append(f"`{self.words(1)}`")
+            else:
+                parts.append(self.random.choice(WORDS))
+        return " ".join(parts).capitalize() + "."
+
+    def paragraph(self, link_density: float) -> str:
+        return "\n".join(self.sentence(link_density) for _ in range(self.random.randint(1, 5)))
+
+    def heading(self) -> str:
+        return f"{'#' * self.random.randint(2, 6)} {self.words(self.random.randint(2, 6)).title()}"
+
+    def unordered_list(self, link_density: float) -> str:
+        return "\n".join(f"- {self.sentence(link_density)}" for _ in range(self.random.randint(2, 12)))
+
+    def ordered_list(self, link_density: float) -> str:
+        return "\n".join(f"{i}. {self.sentence(link_density)}" for i in range(1, self.random.randint(2, 12) + 1))
+
+    def quote(self) -> str:
+        depth = self.random.randint(1, 8)
+        return "\n".join(f"{'> ' * depth}{self.sentence()}" for _ in range(self.random.randint(2, 10)))
+
+    def code(self, large: bool) -> str:
+        line_count = self.random.randint(200, 2000) if large else self.random.randint(3, 20)
+        lines = [f"{'    ' * self.random.randint(0, 3)}{self.words(self.random.randint(1, 8))}" for _ in range(line_count)]
+        return "```\n" + "\n".join(lines) + "\n```"
+
+    def block(self, kind: str, shape: str) -> str:
+        link_density = 0.5 if shape == "link-dense" else 0.1
+        if kind == "paragraph":
+            return self.paragraph(link_density)
+        elif kind == "heading":
+            return self.heading()
+        elif kind == "list":
+            return self.unordered_list(link_density)
+        elif kind == "ordered":
+            return self.ordered_list(link_density)
+        elif kind == "quote":
+            return self.quote()
+        return self.code(shape == "huge-code")
+
+    def document(self, shape: str = "mixed", size: int = 10_000) -> str:
+        if shape not in DOCUMENT_SHAPES:
+            raise ValueError(f"Unknown document shape: {shape}")
+
+        kinds = list(DOCUMENT_SHAPES[shape])
+        weights = list(DOCUMENT_SHAPES[shape].values())
+
+        blocks = [f"# {self.words(4).title()}"]
+        length = len(blocks[0])
+        while length < size:
+            block = self.block(self.random.choices(kinds, weights)[0], shape)
+            blocks.append(block)
+            length += len(block) + 2
+
+        return "\n\n".join(blocks) + "\n"
+
+    def write_site(self, root: str, pages: int, page_size: int, shape: str = "mixed") -> int:
+        """Writes content/, static/ and template.html below root. Returns the markdown bytes written."""
+        total = 0
+        for i in range(pages):
+            relative_dir = "" if i == 0 else os.path.join("posts", f"{i // 100:03d}", f"post-{i:05d}")
+            page_dir = os.path.join(root, "content", relative_dir)
+            os.makedirs(page_dir, exist_ok=True)
+
+            document = self.document(shape, page_size)
+            with open(os.path.join(page_dir, "index.md"), "w") as f:
+                f.write(document)
+            total += len(document.encode())
+
+        os.makedirs(os.path.join(root, "static", "images"), exist_ok=True)
+        with open(os.path.join(root, "static", "index.css"), "w") as f:
+            f.write("body { font-family: serif; }\n")
+        with open(os.path.join(root, "static", "images", "logo.png"), "wb") as f:
+            f.write(self.random.randbytes(64_000))
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write(TEMPLATE)
+
+        return total
@@ -0,0 +1,198 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+from application import configure_logging, generate_page
+from bench.corpus import CorpusGenerator, DOCUMENT_SHAPES, SITE_SHAPES
+from helpers import (
+    BlockType,
+    block_memo,
+    heading_block_content,
+    inline_memo,
+    iter_blocks,
+    markdown_to_blocks,
+    markdown_to_html,
+    markdown_to_html_node,
+    ol_block_items,
+    paragraph_block_content,
+    quote_block_content,
+    text_to_textnodes,
+    ul_block_items,
+)
+import main as site
+
+RESULTS_FILE = "bench_results.json"
+
+def time_runs(function: Callable[[], object], repeat: int) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        # Otherwise every run after the first only times memo hits of what the first rendered
+        block_memo.clear()
+        inline_memo.clear()
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def result(name: str, shape: str, size: int, pages: int, runs: list[float]) -> dict:
+    best = min(runs)
+    return {
+        "name": name,
+        "shape": shape,
+        "bytes": size,
+        "pages": pages,
+        "runs": runs,
+        "best_s": best,
+        "median_s": statistics.median(runs),
+        "mb_per_s": size / best / 1_000_000 if best else None,
+        "pages_per_s": pages / best if best else None,
+    }
+
+@contextlib.contextmanager
+def working_directory(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def inline_texts(document: str) -> list[str]:
+    """Returns the text of every heading, paragraph, quote and list item of document, as the renderers hand it to the inline parser."""
+    texts = []
+    for block_type, block in iter_blocks(document):
+        if block_type == BlockType.HEADING:
+            texts.append(heading_block_content(block)[1])
+        elif block_type == BlockType.QUOTE:
+            texts.append(quote_block_content(block))
+        elif block_type == BlockType.UNORDERED_LIST:
+            texts.extend(ul_block_items(block))
+        elif block_type == BlockType.ORDERED_LIST:
+            texts.extend(ol_block_items(block))
+        elif block_type == BlockType.PARAGRAPH:
+            texts.append(paragraph_block_content(block))
+    return texts
+
+def bench_document(shape: str, document: str, repeat: int) -> list[dict]:
+    size = len(document.encode())
+    texts = inline_texts(document)
+    # Code blocks aren't tokenized, so they don't count towards the inline throughput
+    inline_size = sum(len(text.encode()) for text in texts)
+    tree = markdown_to_html_node(document)
+
+    return [
+        result("markdown_to_blocks", shape, size, 1, time_runs(lambda: markdown_to_blocks(document), repeat)),
+        result("text_to_textnodes", shape, inline_size, 1, time_runs(lambda: [text_to_textnodes(text) for text in texts], repeat)),
+        result("markdown_to_html_node", shape, size, 1, time_runs(lambda: markdown_to_html_node(document), repeat)),
+        result("to_html", shape, size, 1, time_runs(tree.to_html, repeat)),
+        result("markdown_to_html", shape, size, 1, time_runs(lambda: markdown_to_html(document), repeat)),
+    ]
+
+def bench_generate_page(shape: str, root: str, document: str, repeat: int) -> dict:
+    source = os.path.join(root, f"{shape}.md")
+    with open(source, "w") as f:
+        f.write(document)
+    template = os.path.join(root, "template.html")
+    output = os.path.join(root, "out", f"{shape}.html")
+
+    runs = time_runs(lambda: generate_page("/", source, template, output), repeat)
+    return result("generate_page", shape, len(document.encode()), 1, runs)
+
+def bench_site(shape: str, root: str, generator: CorpusGenerator, repeat: int, extra_args: list[str]) -> list[dict]:
+    pages, page_size = SITE_SHAPES[shape]
+    site_root = os.path.join(root, shape)
+    size = generator.write_site(site_root, pages, page_size)
+    label = " ".join(["main()", *extra_args])
+    # The build logs a line per file; keep it out of the report
+    extra_args = ["--quiet", *extra_args]
+
+    with working_directory(site_root):
+        full = time_runs(lambda: site.main(extra_args), repeat)
+        # Once the manifest exists an incremental run has nothing to do, which is the edit-loop case
+        site.main(["--incremental", *extra_args])
+        noop = time_runs(lambda: site.main(["--incremental", *extra_args]), repeat)
+
+    return [
+        result(label, shape, size, pages, full),
+        result(f"{label} --incremental (no changes)", shape, size, pages, noop),
+    ]
+
+def compare(results: list[dict], previous_path: str):
+    with open(previous_path) as f:
+        previous = {(item["name"], item["shape"]): item for item in json.load(f)["results"]}
+
+    print(f"\nCompared to {previous_path} (best time ratio, < 1 is faster):")
+    for item in results:
+        before = previous.get((item["name"], item["shape"]))
+        if before and before["best_s"]:
+            print(f"  {item['name']:<40} {item['shape']:<12} {item['best_s'] / before['best_s']:.2f}x")
+
+def report(results: list[dict]):
+    print(f"{'benchmark':<40} {'shape':<12} {'best s':>9} {'MB/s':>9} {'pages/s':>10}")
+    for item in results:
+        print(
+            f"{item['name']:<40} {item['shape']:<12} {item['best_s']:>9.4f} "
+            f"{item['mb_per_s'] or 0:>9.2f} {item['pages_per_s'] or 0:>10.1f}"
+        )
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the static site generator on a synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0, help="corpus generator seed (default: 0)")
+    parser.add_argument("--size", type=int, default=1_000_000, help="bytes per benchmarked document (default: 1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the best is reported (default: 3)")
+    parser.add_argument("--shape", action="append", choices=sorted(DOCUMENT_SHAPES), help="document shapes to run (default: all)")
+    parser.add_argument("--site", action="append", choices=sorted(SITE_SHAPES), help="site shapes to build with main() (default: all)")
+    parser.add_argument("--no-site", action="store_true", help="skip the full main() builds")
+    parser.add_argument("--build-args", default="", help="extra arguments for the main() builds, e.g. '--jobs 0 --fast'")
+    parser.add_argument("--output", default=RESULTS_FILE, help=f"JSON results file (default: {RESULTS_FILE})")
+    parser.add_argument("--compare", help="previous JSON results file to compare against")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging(logging.WARNING)
+    generator = CorpusGenerator(args.seed)
+    results = []
+
+    with tempfile.TemporaryDirectory() as root:
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write("<title>{{ Title }}</title><article>{{ Content }}</article>")
+
+        for shape in args.shape or sorted(DOCUMENT_SHAPES):
+            document = generator.document(shape, args.size)
+            results.extend(bench_document(shape, document, args.repeat))
+            results.append(bench_generate_page(shape, root, document, args.repeat))
+
+        if not args.no_site:
+            for shape in args.site or sorted(SITE_SHAPES):
+                results.extend(bench_site(shape, root, generator, args.repeat, args.build_args.split()))
+
+    report(results)
+
+    data = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "size": args.size,
+            "repeat": args.repeat,
+            "build_args": args.build_args,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,46 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Iterator
+from application import PageGenerationError, configure_logging, iter_pages
+from frontmatter import scan_metadata
+
+logger = logging.getLogger(__name__)
+
+def scan_pages(dir_path_content: str, drafts: bool = False) -> Iterator[tuple[str, str, dict]]:
+    """
+    Yields (markdown path, output path relative to the site root, metadata)
+    for every page below dir_path_content, reading only the header of each
+    file. Drafts are left out unless drafts is True.
+    """
+    for source, output in iter_pages(dir_path_content, ""):
+        try:
+            metadata = scan_metadata(source)
+        except (OSError, ValueError) as e:
+            raise PageGenerationError(source, e) from e
+
+        if metadata.get("draft") and not drafts:
+            continue
+        yield source, output, metadata
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py pages", description="List every page with its title and front matter, one JSON object per line, without rendering anything")
+    parser.add_argument("--content-dir", default="content", help="directory of the Markdown pages (default: content)")
+    parser.add_argument("--drafts", action="store_true", help="include pages marked 'draft: true'")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging()
+
+    if not os.path.isdir(args.content_dir):
+        logger.error("Error, directory does not exist: %s", args.content_dir)
+        return
+
+    try:
+        for source, output, metadata in scan_pages(args.content_dir, args.drafts):
+            print(json.dumps({"source": source, "output": output, **metadata}))
+    except PageGenerationError as e:
+        logger.error("Error, %s", e)
@@ -0,0 +1,332 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import sys
+import time
+from typing import Iterable
+from application import configure_logging, discover_pages, files_differ, fill_template, read_markdown, sync_directory, unrecorded_assets, write_page
+from frontmatter import split_front_matter
+from helpers import block_to_html, collect_urls, iter_blocks, markdown_to_html, note_urls
+from manifest import BuildManifest, MANIFEST_FILE, SourceVersion, collect_sources, hash_bytes, remove_output
+from template import Template, load_template
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = ".build-daemon.sock"
+
+def render_blocks(markdown: str, previous: dict[tuple, tuple]) -> tuple[str, dict[tuple, tuple]]:
+    """
+    Renders markdown like markdown_to_html(markdown, basepath=None), reusing
+    the HTML of every block found in previous, a dict keyed by (block type,
+    block text) of (HTML, URLs rendered). Returns the HTML and the block
+    cache for this version of the document.
+    """
+    fragments = {}
+    parts = ["<div>"]
+
+    for typed_block in iter_blocks(markdown):
+        fragment = previous.get(typed_block) or fragments.get(typed_block)
+        if fragment is None:
+            block_parts = []
+            with collect_urls() as rendered:
+                valid = block_to_html(*typed_block, block_parts)
+            if not valid:
+                # Let the full renderer raise the error it would have raised
+                return markdown_to_html(markdown, basepath=None), {}
+            fragment = ("".join(block_parts), tuple(rendered.urls))
+
+        fragments[typed_block] = fragment
+        parts.append(fragment[0])
+        note_urls(fragment[1])
+
+    if len(parts) == 1:
+        return markdown_to_html(markdown, basepath=None), {}
+
+    parts.append("</div>")
+    return "".join(parts), fragments
+
+class BuildDaemon:
+    """
+    Keeps everything a build needs in memory between builds: the manifest,
+    the compiled template (through load_template's loader) and, for every
+    page, the hash of its markdown, its rendered HTML and the HTML of each
+    of its blocks. A build only re-renders pages whose inputs changed, and
+    within a changed page only the blocks that changed. A template or
+    basepath change re-fills every page without parsing any markdown.
+    """
+
+    def __init__(self, static_dir: str, content_dir: str, template_path: str, output_dir: str, manifest_path: str = MANIFEST_FILE):
+        self.static_dir = static_dir
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.output_dir = output_dir
+        self.manifest = BuildManifest(manifest_path)
+        # Whether manifest.assets lists the static files an earlier build synced
+        self.assets_known = self.manifest.loaded
+        # source path -> (markdown hash, HTML, block cache, URLs rendered)
+        self.pages = {}
+        # Absolute paths of the template and everything it includes or extends
+        self.template_files = set()
+
+    def render(self, source_path: str) -> tuple[str, str, set[str]]:
+        """Returns the cleaned markdown, HTML and link and image URLs of a page, re-rendering only what changed."""
+        markdown = read_markdown(source_path)
+        markdown_hash = hash_bytes(markdown.encode())
+
+        cached = self.pages.get(source_path)
+        if cached is not None and cached[0] == markdown_hash:
+            return markdown, cached[1], cached[3]
+
+        with tracing.span("render"), collect_urls() as rendered:
+            html, fragments = render_blocks(split_front_matter(markdown)[1], cached[2] if cached is not None else {})
+        self.pages[source_path] = (markdown_hash, html, fragments, rendered.urls)
+        return markdown, html, rendered.urls
+
+    def warm(self) -> int:
+        """Parses every page into the cache up front. Returns the number of pages parsed."""
+        count = 0
+        for source_path, output_path in discover_pages(self.content_dir, self.output_dir):
+            try:
+                self.render(source_path)
+            except (OSError, ValueError) as e:
+                # The next build reports it
+                logger.warning("Could not parse %s: %s", source_path, e)
+                continue
+            count += 1
+        return count
+
+    def build_page(self, basepath: str, template: Template, source_path: str, output_path: str) -> tuple[set[str], SourceVersion]:
+        """Writes a page and returns the link and image URLs in its content, with the version of the source it read."""
+        logger.info("Generating page from %s to %s", source_path, output_path)
+
+        with tracing.page(source_path), collect_sources() as sources:
+            markdown, html, urls = self.render(source_path)
+            write_page(output_path, fill_template(basepath, template, markdown, html))
+        return urls, sources[source_path]
+
+    def build(self, basepath: str) -> dict:
+        start = time.perf_counter()
+
+        self.manifest.begin(self.template_path, basepath, self.static_dir)
+        template = load_template(self.template_path)
+        self.template_files = set(template.dependencies)
+        previous = self.manifest.assets if self.assets_known else unrecorded_assets(self.output_dir, self.content_dir)
+        self.manifest.assets = sync_directory(self.static_dir, self.output_dir, previous)
+        self.assets_known = True
+
+        pages = discover_pages(self.content_dir, self.output_dir)
+        built = []
+        for source_path, output_path in pages:
+            if self.manifest.is_fresh(source_path, output_path):
+                continue
+
+            urls, version = self.build_page(basepath, template, source_path, output_path)
+            self.manifest.record(source_path, output_path, urls, version)
+            built.append(source_path)
+
+        removed = self.manifest.prune(self.output_dir)
+
+        sources = {source_path for source_path, output_path in pages}
+        for source_path in set(self.pages) - sources:
+            del self.pages[source_path]
+
+        return {
+            "pages": len(pages),
+            "built": built,
+            "removed": removed,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def update(self, basepath: str, changed_paths: Iterable[str]) -> dict:
+        """
+        Rebuilds only what the changed files affect: a changed page is
+        re-rendered, a changed static file is copied and a template change
+        re-fills every page. Anything that can't be narrowed down to single
+        files, like a moved directory, falls back to build().
+        """
+        start = time.perf_counter()
+        if self.manifest.basepath != basepath:
+            return self.build(basepath)
+
+        content_root = os.path.abspath(self.content_dir)
+        static_root = os.path.abspath(self.static_dir)
+        pages = []
+        assets = []
+
+        for path in sorted(os.path.abspath(path) for path in changed_paths):
+            if path in self.template_files:
+                return self.build(basepath)
+            elif path in (content_root, static_root) or os.path.isdir(path):
+                return self.build(basepath)
+            elif path.startswith(content_root + os.sep):
+                source_path = os.path.join(self.content_dir, os.path.relpath(path, content_root))
+                if source_path.endswith(".md"):
+                    pages.append(source_path)
+                elif any((entry["source_path"] or "").startswith(source_path + os.sep) for entry in self.manifest.entries.values()):
+                    # A directory of pages was deleted or moved away
+                    return self.build(basepath)
+            elif path.startswith(static_root + os.sep):
+                relative_path = os.path.relpath(path, static_root)
+                if os.path.isfile(path) or relative_path in self.manifest.assets:
+                    assets.append(relative_path)
+                elif any(asset.startswith(relative_path + os.sep) for asset in self.manifest.assets):
+                    return self.build(basepath)
+
+        template = load_template(self.template_path)
+        built = []
+        copied = []
+        removed = []
+
+        for source_path in pages:
+            relative_path = os.path.relpath(source_path, self.content_dir)
+            output_path = os.path.normpath(os.path.join(self.output_dir, relative_path[:-len(".md")] + ".html"))
+
+            if os.path.isfile(source_path):
+                urls, version = self.build_page(basepath, template, source_path, output_path)
+                self.manifest.record(source_path, output_path, urls, version)
+                built.append(source_path)
+            elif output_path in self.manifest.entries:
+                del self.manifest.entries[output_path]
+                self.pages.pop(source_path, None)
+                if os.path.exists(output_path):
+                    logger.info("Removing stale page %s", output_path)
+                    remove_output(output_path, self.output_dir)
+                    removed.append(output_path)
+
+        for relative_path in assets:
+            src_path = os.path.join(self.static_dir, relative_path)
+            dest_path = os.path.join(self.output_dir, relative_path)
+
+            if os.path.isfile(src_path):
+                self.manifest.assets.add(relative_path)
+                if files_differ(src_path, dest_path):
+                    logger.info("Copying %s to %s", src_path, dest_path)
+                    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                    shutil.copy2(src_path, dest_path)
+                    copied.append(relative_path)
+            else:
+                self.manifest.assets.discard(relative_path)
+                if os.path.isfile(dest_path):
+                    logger.info("Removing orphaned file %s", dest_path)
+                    remove_output(dest_path, self.output_dir)
+                    removed.append(dest_path)
+
+        return {
+            "pages": len(self.manifest.entries),
+            "built": built,
+            "copied": copied,
+            "removed": removed,
+            "seconds": time.perf_counter() - start,
+        }
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    """Answers one JSON request line with one JSON response line."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = {"ok": True, **self.server.dispatch(request)}
+        except Exception as e:
+            logger.error("Daemon request failed: %s", e)
+            response = {"ok": False, "error": str(e)}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+class BuildServer(socketserver.UnixStreamServer):
+    """Serves build requests one at a time, so builds never overlap."""
+
+    def __init__(self, socket_path: str, builder: BuildDaemon, root: str):
+        self.builder = builder
+        self.root = root
+        self.running = True
+        super().__init__(socket_path, BuildRequestHandler)
+
+    def dispatch(self, request: dict) -> dict:
+        command = request.get("command")
+
+        if request.get("root") not in (None, self.root):
+            raise ValueError(f"Daemon builds {self.root}, not {request['root']}")
+
+        if command == "build":
+            return self.builder.build(request.get("basepath", "/"))
+        elif command == "ping":
+            return {"root": self.root, "pages": len(self.builder.pages)}
+        elif command == "stop":
+            self.running = False
+            return {}
+        raise ValueError(f"Unknown daemon command: {command}")
+
+    def serve_until_stopped(self):
+        while self.running:
+            self.handle_request()
+
+def send_request(socket_path: str, request: dict) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as f:
+            line = f.readline()
+
+    if not line:
+        raise ConnectionError(f"Build daemon on {socket_path} closed the connection")
+    return json.loads(line)
+
+def remove_stale_socket(socket_path: str):
+    """Deletes a socket file left behind by a daemon that is no longer running."""
+    if not os.path.exists(socket_path):
+        return
+
+    try:
+        send_request(socket_path, {"command": "ping"})
+    except (ConnectionError, OSError):
+        os.remove(socket_path)
+        return
+    raise ValueError(f"A build daemon is already listening on {socket_path}")
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py daemon", description="Keep a warm build daemon running and build on request")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Unix socket to listen on (default: {DEFAULT_SOCKET})")
+    parser.add_argument("--stop", action="store_true", help="stop the daemon listening on --socket")
+    parser.add_argument("--no-warm", action="store_true", help="don't parse every page on startup")
+    parser.add_argument("--quiet", "-q", action="store_true", help="only log warnings and errors")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging(logging.WARNING if args.quiet else logging.INFO)
+
+    if args.stop:
+        try:
+            send_request(args.socket, {"command": "stop"})
+        except (ConnectionError, OSError):
+            logger.error("Error, no build daemon is listening on %s", args.socket)
+            return
+        logger.info("Build daemon on %s stopped", args.socket)
+        return
+
+    builder = BuildDaemon("static", "content", "template.html", "docs")
+    if not args.no_warm:
+        start = time.perf_counter()
+        count = builder.warm()
+        logger.info("Parsed %s pages in %.2fs", count, time.perf_counter() - start)
+
+    remove_stale_socket(args.socket)
+    server = BuildServer(args.socket, builder, os.getcwd())
+    logger.info("Build daemon listening on %s", args.socket)
+
+    try:
+        server.serve_until_stopped()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+        # Lets a later --incremental build start from where the daemon left off
+        builder.manifest.save()
+
+    logger.info("Build daemon stopped")
@@ -0,0 +1,305 @@
+import argparse
+import functools
+import logging
+import os
+import sys
+import threading
+import urllib.parse
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from application import configure_logging, render_page
+from daemon import BuildDaemon
+from manifest import hash_bytes, hash_file
+from template import load_template
+from watcher import create_watcher
+
+logger = logging.getLogger(__name__)
+
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_SCRIPT = f'<script>new EventSource("{LIVE_RELOAD_PATH}").onmessage = () => location.reload();</script>'
+
+class ReloadNotifier:
+    """Counts finished rebuilds and wakes up every browser waiting for the next one."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Returns the current version, once it differs from version or after timeout seconds."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+def inject_live_reload(html: str) -> str:
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + LIVE_RELOAD_SCRIPT
+    return html[:index] + LIVE_RELOAD_SCRIPT + html[index:]
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the output directory, with a live reload script in every page."""
+
+    def __init__(self, *args, notifier: ReloadNotifier, **kwargs):
+        self.notifier = notifier
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == LIVE_RELOAD_PATH:
+            self.send_events()
+            return
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?")[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+
+        if path.endswith(".html") and os.path.isfile(path):
+            self.send_page(path)
+        else:
+            super().do_GET()
+
+    def send_page(self, path: str):
+        with open(path, "r") as f:
+            body = inject_live_reload(f.read()).encode()
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self):
+        version = self.notifier.version
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+        try:
+            while True:
+                current = self.notifier.wait(version, timeout=15)
+                # A comment line keeps the connection alive and notices closed tabs
+                self.wfile.write(b"data: reload\n\n" if current != version else b": ping\n\n")
+                self.wfile.flush()
+                version = current
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format: str, *args):
+        logger.debug(format, *args)
+
+class OnDemandSite:
+    """
+    Renders pages from the content directory the first time they are
+    requested, with the same logic as generate_page, and keeps them in memory.
+    A cached page is reused as long as its source and the template hash it
+    was rendered with are unchanged, so pages nobody opens are never rendered.
+    """
+
+    def __init__(self, content_dir: str, template_path: str, basepath: str = "/", live_reload: bool = False):
+        self.content_dir = os.path.normpath(content_dir)
+        self.template_path = template_path
+        self.basepath = basepath
+        self.live_reload = live_reload
+        # source path -> ((source hash, template hash), body, etag)
+        self.pages = {}
+        # source path -> (size, mtime_ns, source hash), so unchanged sources are never re-hashed
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def find_source(self, url_path: str) -> str | None:
+        """Returns the markdown file a URL path is generated from, or None."""
+        relative_path = urllib.parse.unquote(url_path.split("?", 1)[0].split("#", 1)[0]).strip("/")
+        if relative_path.endswith(".html"):
+            relative_path = relative_path[:-len(".html")]
+        if relative_path == "index" or relative_path.endswith("/index"):
+            relative_path = relative_path[:-len("index")]
+
+        source_dir = os.path.normpath(os.path.join(self.content_dir, relative_path))
+        if source_dir != self.content_dir and not source_dir.startswith(self.content_dir + os.sep):
+            return None
+
+        for source_path in (os.path.join(source_dir, "index.md"), source_dir + ".md"):
+            if os.path.isfile(source_path):
+                return source_path
+        return None
+
+    def source_hash(self, source_path: str) -> str:
+        stat = os.stat(source_path)
+        cached = self.sources.get(source_path)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+
+        source_hash = hash_file(source_path)
+        self.sources[source_path] = (stat.st_size, stat.st_mtime_ns, source_hash)
+        return source_hash
+
+    def get(self, source_path: str) -> tuple[bytes, str]:
+        """Returns the rendered page and its strong ETag, rendering it only if needed."""
+        key = (self.source_hash(source_path), load_template(self.template_path).hash)
+
+        with self.lock:
+            cached = self.pages.get(source_path)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        logger.info("Rendering %s", source_path)
+        page = render_page(self.basepath, source_path, self.template_path)
+        if self.live_reload:
+            page = inject_live_reload(page)
+
+        body = page.encode()
+        etag = f'"{hash_bytes(body)[:32]}"'
+        with self.lock:
+            self.pages[source_path] = (key, body, etag)
+        return body, etag
+
+class OnDemandRequestHandler(DevRequestHandler):
+    """Serves pages rendered by an OnDemandSite and everything else from the static directory."""
+
+    def __init__(self, *args, site: OnDemandSite, **kwargs):
+        self.site = site
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.send_site_page(head=False)
+
+    def do_HEAD(self):
+        self.send_site_page(head=True)
+
+    def send_site_page(self, head: bool):
+        if self.path == LIVE_RELOAD_PATH and not head:
+            self.send_events()
+            return
+
+        source_path = self.site.find_source(self.path)
+        if source_path is None:
+            if head:
+                super().do_HEAD()
+            else:
+                super().do_GET()
+            return
+
+        url_path = self.path.split("?", 1)[0]
+        if source_path.endswith("index.md") and not url_path.endswith(("/", ".html")):
+            # Relative links in the page only work from the directory URL
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", url_path + "/" + self.path[len(url_path):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        try:
+            body, etag = self.site.get(source_path)
+        except Exception as e:
+            logger.error("Error, rendering %s failed: %s", source_path, e)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Rendering {source_path} failed: {e}")
+            return
+
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        # Always revalidate, a matching ETag only costs a 304
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def watch_on_demand(site: OnDemandSite, static_dir: str, notifier: ReloadNotifier, poll: bool = False):
+    """Tells the browsers to reload after every batch of changes, the next request renders what changed."""
+    watcher = create_watcher([site.content_dir, static_dir], load_template(site.template_path).dependencies, poll)
+
+    for changed in watcher.batches():
+        watcher.add_files(set(load_template(site.template_path).dependencies) - watcher.files)
+        logger.info("%s files changed", len(changed))
+        notifier.notify()
+
+def watch(builder: BuildDaemon, notifier: ReloadNotifier, basepath: str, poll: bool = False):
+    """Rebuilds what every batch of file changes affects and tells the browsers to reload."""
+    watcher = create_watcher([builder.content_dir, builder.static_dir], builder.template_files, poll)
+    logger.info("Watching %s, %s and %s with %s", builder.content_dir, builder.static_dir, builder.template_path, type(watcher).__name__)
+
+    for changed in watcher.batches():
+        try:
+            result = builder.update(basepath, changed)
+        except Exception as e:
+            # Keep watching, the next save usually fixes it
+            logger.error("Error, rebuild failed: %s", e)
+            continue
+
+        # The template may include new files now
+        watcher.add_files(builder.template_files - watcher.files)
+        logger.info(
+            "Rebuilt %s pages, copied %s files and removed %s in %.1fms",
+            len(result["built"]), len(result.get("copied", [])), len(result["removed"]), result["seconds"] * 1000,
+        )
+        notifier.notify()
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Build the site and serve it locally")
+    parser.add_argument("--port", type=int, default=8888, help="port to serve on (default: 8888)")
+    parser.add_argument("--watch", action="store_true", help="rebuild what changes in content/, static/ and the template, and reload the browser")
+    parser.add_argument("--on-demand", action="store_true", help="render pages in memory when they are requested instead of building docs/ first")
+    parser.add_argument("--poll", action="store_true", help="poll for changes instead of using inotify")
+    parser.add_argument("--quiet", "-q", action="store_true", help="only log warnings and errors")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging(logging.WARNING if args.quiet else logging.INFO)
+
+    # Served from the root of the dev server
+    basepath = "/"
+    notifier = ReloadNotifier()
+    static_dir = "static"
+    builder = None
+
+    if args.on_demand:
+        site = OnDemandSite("content", "template.html", basepath, live_reload=args.watch)
+        handler = functools.partial(OnDemandRequestHandler, directory=static_dir, notifier=notifier, site=site)
+        served_dir = static_dir
+    else:
+        builder = BuildDaemon(static_dir, "content", "template.html", "docs")
+        result = builder.build(basepath)
+        logger.info("Built %s of %s pages in %.2fs", len(result["built"]), result["pages"], result["seconds"])
+        handler = functools.partial(DevRequestHandler, directory=builder.output_dir, notifier=notifier)
+        served_dir = builder.output_dir
+
+    server = ThreadingHTTPServer(("", args.port), handler)
+    server.daemon_threads = True
+
+    if args.watch and args.on_demand:
+        threading.Thread(target=watch_on_demand, args=(site, static_dir, notifier, args.poll), daemon=True).start()
+    elif args.watch:
+        threading.Thread(target=watch, args=(builder, notifier, basepath, args.poll), daemon=True).start()
+
+    logger.info("Serving %s on http://localhost:%s/", served_dir, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if builder is not None:
+            builder.manifest.save()
@@ -0,0 +1,80 @@
+import argparse
+import logging
+import os
+import sys
+from application import configure_logging
+from manifest import MANIFEST_FILE, BuildManifest, hash_file
+
+logger = logging.getLogger(__name__)
+
+def find_output(manifest: BuildManifest, path: str) -> str | None:
+    """Returns the output recorded for path, which may be the output itself or its Markdown source."""
+    if path in manifest.entries:
+        return path
+
+    path = os.path.normpath(path)
+    for output_path, entry in manifest.entries.items():
+        if os.path.normpath(output_path) == path or (entry["source_path"] and os.path.normpath(entry["source_path"]) == path):
+            return output_path
+    return None
+
+def _status(entry: dict, path: str, kind: str) -> str:
+    if not os.path.exists(path):
+        return "missing"
+    if kind == "source":
+        recorded = entry["source_hash"]
+    elif kind == "template":
+        recorded = entry.get("template_files", {}).get(path)
+    else:
+        # Static files and listed pages are not hashed into the entry
+        return ""
+    return "unchanged" if hash_file(path) == recorded else "changed since"
+
+def explain(manifest: BuildManifest, output_path: str) -> list[str]:
+    """Returns the lines describing what the output was built from and why it was last rebuilt."""
+    entry = manifest.entries[output_path]
+    lines = [output_path]
+    if entry["source_path"] is not None:
+        lines.append(f"  built from {entry['source_path']}")
+    else:
+        lines.append(f"  lists {entry['query']}")
+    lines.append(f"  last rebuilt because: {entry.get('reason', 'unknown')}")
+    lines.append(f"  basepath {entry['basepath']}, generator version {entry['generator_version']}")
+
+    dependencies = entry.get("dependencies", {})
+    lines.append(f"  depends on {len(dependencies)} files:")
+    for path, kind in sorted(dependencies.items(), key=lambda item: (item[1], item[0])):
+        status = _status(entry, path, kind)
+        lines.append(f"    {kind:<12} {path}" + (f" ({status})" if status else ""))
+    return lines
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py explain", description="Explain why pages were rebuilt by the last incremental build, or which pages changed files make stale")
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="output or Markdown file to explain, or changed files with --changed")
+    parser.add_argument("--changed", action="store_true", help="list the outputs the given changed files make stale, and why")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help=f"build manifest to read (default: {MANIFEST_FILE})")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging()
+
+    if not os.path.exists(args.manifest):
+        logger.error("Error, no build manifest at %s, run an --incremental build first", args.manifest)
+        return
+    manifest = BuildManifest(args.manifest)
+
+    if args.changed:
+        for output_path, causes in sorted(manifest.stale(args.paths).items()):
+            print(f"{output_path}: " + ", ".join(f"{path} ({kind})" for path, kind in causes))
+        for path in args.paths:
+            if os.path.relpath(path) not in manifest.dependents:
+                logger.info("%s is not a dependency of any recorded output", path)
+        return
+
+    for path in args.paths:
+        output_path = find_output(manifest, path)
+        if output_path is None:
+            logger.error("Error, %s was not built by the last incremental build", path)
+            return
+        print("\n".join(explain(manifest, output_path)))
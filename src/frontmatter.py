@@ -0,0 +1,144 @@
+import re
+from datetime import datetime
+from typing import Iterator
+
+# The opening line is "---", the closing one "---" or "..."
+DELIMITER = "---"
+CLOSING_DELIMITERS = ("---", "...")
+
+def is_opening(line: str) -> bool:
+    return line.strip() == DELIMITER
+
+def _parse_scalar(text: str) -> str | bool:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+
+    # A comment needs whitespace before it, so "C#" stays intact
+    comment = re.search(r"\s#", text)
+    if comment is not None:
+        text = text[:comment.start()].rstrip()
+
+    if text.lower() in ("true", "yes"):
+        return True
+    if text.lower() in ("false", "no"):
+        return False
+    return text
+
+def _parse_value(text: str) -> str | bool | list:
+    if text.startswith("[") and text.endswith("]"):
+        return [_parse_scalar(item.strip()) for item in text[1:-1].split(",") if item.strip()]
+    return _parse_scalar(text)
+
+def _normalize(metadata: dict) -> dict:
+    # A key with nothing after it and no list items below is unset
+    for key in ("title", "layout", "date", "draft"):
+        if metadata.get(key) == []:
+            del metadata[key]
+
+    for key in ("title", "layout"):
+        if key in metadata and not isinstance(metadata[key], str):
+            raise ValueError(f"Front matter '{key}' must be text, not {metadata[key]!r}")
+
+    if "date" in metadata:
+        try:
+            datetime.fromisoformat(str(metadata["date"]))
+        except ValueError:
+            raise ValueError(f"Front matter 'date' must be an ISO date like 2024-05-01, not {metadata['date']!r}")
+
+    if "tags" in metadata:
+        tags = metadata["tags"]
+        if isinstance(tags, bool):
+            raise ValueError(f"Front matter 'tags' must be a list, not {tags!r}")
+        if isinstance(tags, str):
+            tags = tags.split(",")
+        metadata["tags"] = [str(tag).strip() for tag in tags if str(tag).strip()]
+
+    if "draft" in metadata and not isinstance(metadata["draft"], bool):
+        raise ValueError(f"Front matter 'draft' must be true or false, not {metadata['draft']!r}")
+
+    return metadata
+
+def read_front_matter(lines: Iterator[str]) -> dict:
+    """
+    Parses front matter from lines, which start right after the opening
+    "---", and consumes them up to and including the closing delimiter, so
+    the rest of lines is the document body. Understands the YAML subset
+    pages use: "key: value" with quoted strings, booleans and [a, b] lists,
+    keys followed by "- item" lines, and # comments.
+    """
+    metadata = {}
+    list_key = None
+
+    for number, line in enumerate(lines, 2):
+        stripped = line.strip()
+        if stripped in CLOSING_DELIMITERS:
+            return _normalize(metadata)
+        if not stripped or stripped.startswith("#"):
+            continue
+
+        if stripped == "-" or stripped.startswith("- "):
+            if list_key is None:
+                raise ValueError(f"Front matter line {number} is a list item without a key: {stripped}")
+            metadata[list_key].append(_parse_scalar(stripped[1:].strip()))
+            continue
+
+        key, separator, value = stripped.partition(":")
+        key = key.strip()
+        if not separator or not key:
+            raise ValueError(f"Front matter line {number} must look like 'key: value': {stripped}")
+
+        value = value.strip()
+        if value:
+            metadata[key] = _parse_value(value)
+            list_key = None
+        else:
+            metadata[key] = []
+            list_key = key
+
+    raise ValueError("Front matter is never closed with '---'")
+
+def split_front_matter(markdown: str) -> tuple[dict, str]:
+    """Returns the front matter of markdown and the body after it. Markdown without front matter is returned as is."""
+    text = markdown.lstrip()
+    position = text.find("\n") + 1
+    if not is_opening(text[:position] if position else text):
+        return {}, markdown
+
+    def lines() -> Iterator[str]:
+        # Sliced off one at a time, the body is never split
+        nonlocal position
+        while position and position < len(text):
+            end = text.find("\n", position)
+            end = len(text) if end == -1 else end
+            line = text[position:end]
+            # Moved past the line first, the caller stops right after the closing one
+            position = end + 1
+            yield line
+
+    metadata = read_front_matter(lines())
+    return metadata, text[position:]
+
+def title_from_line(line: str) -> str:
+    """Returns the title given by the first line of a page, its heading text."""
+    header = line.strip().lstrip("#").strip()
+
+    if not header:
+        raise ValueError("No title found in Markdown")
+
+    return header
+
+def scan_metadata(path: str) -> dict:
+    """
+    Returns the front matter of a markdown file with its title filled in,
+    reading only up to the end of the front matter, or up to the first line
+    of text when the title comes from the heading. The body is never read.
+    """
+    with open(path, "r") as f:
+        line = next((line for line in f if line.strip()), "")
+        if not is_opening(line):
+            return {"title": title_from_line(line)}
+
+        metadata = read_front_matter(f)
+        if not metadata.get("title"):
+            metadata["title"] = title_from_line(next((line for line in f if line.strip()), ""))
+        return metadata
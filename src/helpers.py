@@ -1,4 +1,10 @@
+import contextlib
+import contextvars
+import os
 import re
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
 from enum import Enum
 from texnode import TextNode, TextType
 from htmlnode import HtmlNode
@@ -13,6 +19,83 @@ class BlockType(Enum):
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
 
+# Stands for the basepath at the start of the site-absolute link and image
+# URLs in rendered HTML, so the HTML can be shared between basepaths and the
+# basepath filled in by apply_basepath. Input text never contains it,
+# clean_markdown replaces NUL like HTML parsers do.
+BASEPATH_SLOT = "\x00"
+# The URL attribute of every tag the renderers emit with one
+URL_ATTRIBUTES = {"a": "href", "img": "src"}
+
+# Longer blocks and spans are rarely repeated and would pin a lot of memory
+MEMO_MAX_TEXT = 4096
+BLOCK_MEMO_ENTRIES = 4096
+INLINE_MEMO_ENTRIES = 16384
+
+class RenderMemo:
+    """
+    A bounded least recently used map from markdown text to what it renders
+    to, shared by every page rendered in the process. Lookups and updates
+    are locked, so worker threads can share it. Errors aren't memoized: a
+    block that fails to render fails again on every page it appears on.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_or_render(self, key: object, render: Callable[[], object]) -> object:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        # Rendered outside the lock, so two threads may both render a new key
+        value = render()
+        with self.lock:
+            self.entries[key] = value
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def counts(self) -> tuple[int, int]:
+        with self.lock:
+            return self.hits, self.misses
+
+    def add_counts(self, hits: int, misses: int):
+        """Adds the lookups another process made, so this memo's counts cover a whole build."""
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+    def reset_counts(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _reset_lock(self):
+        # A fork can happen while another thread holds the lock
+        self.lock = threading.Lock()
+
+block_memo = RenderMemo(BLOCK_MEMO_ENTRIES)
+inline_memo = RenderMemo(INLINE_MEMO_ENTRIES)
+
+for _memo in (block_memo, inline_memo):
+    os.register_at_fork(after_in_child=_memo._reset_lock)
+
+def memo_counts() -> dict[str, tuple[int, int]]:
+    """Returns the (hits, misses) of the block and inline memos."""
+    return {"block": block_memo.counts(), "inline": inline_memo.counts()}
+
 def split_nodes_delimiter(old_nodes: list[TextNode], delimiter: str, text_type: TextType) -> list[TextNode]:
     new_nodes = []
     for old_node in old_nodes:
@@ -128,71 +211,264 @@ def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
 
     return new_nodes
 
-def text_to_textnodes(text: str) -> list[TextNode]:
-    nodes = [TextNode(text, TextType.NORMAL)]
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    
-    return nodes
+# Images and links. Images take precedence, so neither a link's text nor
+# its URL ever contains one.
+INLINE_SPAN_PATTERN = re.compile(
+    r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
+    r"|(?<!!)\[((?:!(?!\[[^\[\]]*\]\([^\(\)]*\))|[^\]!])*)\]\(((?:!(?!\[[^\[\]]*\]\([^\(\)]*\))|[^)!])*)\)"
+)
+DELIMITER_PATTERN = re.compile(r"`|\*\*|_")
+EMPHASIS_PATTERN = re.compile(r"\*\*|_")
+DELIMITER_TYPES = {"`": TextType.CODE, "**": TextType.BOLD, "_": TextType.ITALIC}
+
+def _append_text(items: list[tuple], text: str):
+    if not text:
+        return
+
+    # Merge with preceding plain text so literal delimiters don't fragment it
+    if items and items[-1][0] == TextType.NORMAL:
+        items[-1] = (TextType.NORMAL, items[-1][1] + text, None, None)
+    else:
+        items.append((TextType.NORMAL, text, None, None))
+
+def _container_item(text_type: TextType, children: list[tuple], url: str | None = None) -> tuple:
+    if not children:
+        return (text_type, "", url, None)
+
+    if len(children) == 1 and children[0][0] == TextType.NORMAL:
+        return (text_type, children[0][1], url, None)
+
+    return (text_type, "".join(child[1] for child in children), url, children)
+
+def _opens_emphasis(text: str, position: int, start: int, end: int, token: str) -> bool:
+    after = position + len(token)
+    if after >= end or text[after].isspace() or text[after] == token[0]:
+        return False
+    if token == "_" and position > start and (text[position - 1].isalnum() or text[position - 1] == "_"):
+        return False
+    return True
+
+def _closes_emphasis(text: str, position: int, end: int, token: str) -> bool:
+    before = text[position - 1]
+    if before.isspace() or before == token[0]:
+        return False
+    after = position + len(token)
+    if after < end and (text[after] == token[0] or token == "_" and text[after].isalnum()):
+        return False
+    return True
+
+def _tokenize_emphasis(text: str, start: int, end: int) -> list[tuple]:
+    """
+    Lexes the emphasis nested in a link's or bold span's text[start:end].
+    Only unambiguous emphasis nests: a delimiter touching whitespace, an
+    underscore inside a word, an empty pair or a delimiter without a partner
+    stays plain text, as the whole span's text did before spans nested.
+    """
+    items = []
+    position = scan = start
+    while True:
+        match = EMPHASIS_PATTERN.search(text, scan, end)
+        if match is None:
+            break
 
-def markdown_to_blocks(markdown : str) -> list[str]:
-    normalized_markdown = markdown.replace("\r\n", "\n").replace("\r", "\n").replace("\xa0", " ")
-    lines = normalized_markdown.split('\n')
-    blocks = []
-    current_block_lines = []
+        token = match.group()
+        scan = match.end()
+        if not _opens_emphasis(text, match.start(), start, end, token):
+            continue
 
-    for line in lines:
-        if line.strip() == "":
-            if current_block_lines:
-                blocks.append("\n".join(current_block_lines).strip())
-                current_block_lines = []
+        closing = text.find(token, match.end(), end)
+        while closing != -1 and not _closes_emphasis(text, closing, end, token):
+            closing = text.find(token, closing + 1, end)
+        if closing == -1:
+            continue
+
+        _append_text(items, text[position:match.start()])
+        items.append(_container_item(DELIMITER_TYPES[token], _tokenize_emphasis(text, match.end(), closing)))
+        position = scan = closing + len(token)
+
+    _append_text(items, text[position:end])
+    return items
+
+def _find_or_end(text: str, token: str, start: int, end: int) -> int:
+    position = text.find(token, start, end)
+    return end if position == -1 else position
+
+def _tokenize_delimiters(text: str, start: int, end: int, items: list[tuple]):
+    # Code spans pair up across text[start:end], bold pairs between code spans
+    # and italic pairs between those, as splitting on each delimiter in turn
+    # did, so the nodes stay the same
+    position = start
+    next_code = next_bold = -1
+    while True:
+        match = DELIMITER_PATTERN.search(text, position, end)
+        if match is None:
+            break
+
+        token = match.group()
+        boundary = end
+        if token != "`":
+            if next_code < match.start():
+                next_code = _find_or_end(text, "`", match.start(), end)
+            boundary = next_code
+            if token == "_":
+                if next_bold < match.start():
+                    next_bold = _find_or_end(text, "**", match.start(), end)
+                boundary = min(boundary, next_bold)
+
+        closing = text.find(token, match.end(), boundary)
+        if closing == -1:
+            raise ValueError(f"Invalid Markdown syntax: closing delimiter '{token}' not found in '{text[start:end]}'")
+
+        if match.start() > position:
+            items.append((TextType.NORMAL, text[position:match.start()], None, None))
+        if closing > match.end():
+            if token == "**":
+                items.append(_container_item(TextType.BOLD, _tokenize_emphasis(text, match.end(), closing)))
+            else:
+                items.append((DELIMITER_TYPES[token], text[match.end():closing], None, None))
+        position = closing + len(token)
+
+    if position < end:
+        items.append((TextType.NORMAL, text[position:end], None, None))
+
+def tokenize_inline(text: str, start: int = 0, end: int | None = None) -> list[tuple]:
+    """
+    Lexes inline markdown in text[start:end] left to right.
+
+    Returns (TextType, text, url, children) items, where children is None for
+    leaf spans or a list of nested items (bold inside a link, for example).
+    The spans are those the split_nodes_* chain finds, only the emphasis in
+    a link's or bold span's text is nested. Unclosed delimiters raise a
+    ValueError.
+    """
+    if end is None:
+        end = len(text)
+
+    items = []
+    position = start
+    for match in INLINE_SPAN_PATTERN.finditer(text, start, end):
+        _tokenize_delimiters(text, position, match.start(), items)
+        if match.lastindex == 2:
+            items.append((TextType.IMAGE, match.group(1), match.group(2), None))
         else:
-            current_block_lines.append(line)
-    
-    if current_block_lines:
-        blocks.append("\n".join(current_block_lines).strip())
-    
-    return [block for block in blocks if block]
+            children = _tokenize_emphasis(text, match.start(3), match.end(3))
+            items.append(_container_item(TextType.LINK, children, match.group(4)))
+        position = match.end()
 
-def block_to_blocktype(block: str) -> BlockType:
-    lines = block.split('\n')
+    _tokenize_delimiters(text, position, end, items)
+    return items
+
+def tokenize_inline_memoized(text: str) -> list[tuple]:
+    """tokenize_inline(text) through the inline memo. The items are shared, so they must not be changed."""
+    if len(text) > MEMO_MAX_TEXT:
+        return tokenize_inline(text)
+    return inline_memo.get_or_render(text, lambda: tokenize_inline(text))
 
-    if block.startswith("#") and block.lstrip("#").startswith(" ") and 1 <= len(block.split(" ")[0]) <= 6:
+def _item_to_textnode(item: tuple) -> TextNode:
+    text_type, text, url, children = item
+    if children is None:
+        return TextNode(text, text_type, url)
+    return TextNode(text, text_type, url, [_item_to_textnode(child) for child in children])
+
+def text_to_textnodes(text: str) -> list[TextNode]:
+    return [_item_to_textnode(item) for item in tokenize_inline_memoized(text)]
+
+HEADING_PATTERN = re.compile(r"#{1,6} ")
+
+def _split_lines(markdown: str) -> Iterator[str]:
+    # Slice lines off one at a time instead of splitting the whole document
+    position = 0
+    length = len(markdown)
+    while position < length:
+        newline = markdown.find("\n", position)
+        if newline == -1:
+            newline = length
+        yield markdown[position:newline]
+        position = newline + 1
+
+def _iter_lines(markdown: str | Iterable[str]) -> Iterator[str]:
+    if isinstance(markdown, str):
+        raw_lines = _split_lines(markdown)
+    else:
+        raw_lines = (line.rstrip("\n") for line in markdown)
+
+    for line in raw_lines:
+        if line.endswith("\r"):
+            line = line[:-1]
+        line = line.replace("\xa0", " ")
+        if "\r" in line:
+            yield from line.split("\r")
+        else:
+            yield line
+
+def _classify_lines(lines: list[str]) -> BlockType:
+    first = lines[0]
+    if HEADING_PATTERN.match(first):
         return BlockType.HEADING
-    
-    if block.startswith("```") and block.endswith("```"):
+
+    if first.startswith("```") and lines[-1].endswith("```"):
         return BlockType.CODE
-    
-    is_quote = True
-    for line in lines:
-        if not line.startswith(">"):
-            is_quote = False
-            break
+
+    # Check every line kind in a single pass, stopping once nothing matches
+    is_quote = is_unordered_list = is_ordered_list = True
+    for i, line in enumerate(lines, 1):
+        is_quote = is_quote and line.startswith(">")
+        is_unordered_list = is_unordered_list and line.startswith("- ")
+        is_ordered_list = is_ordered_list and line.startswith(f"{i}. ")
+        if not (is_quote or is_unordered_list or is_ordered_list):
+            return BlockType.PARAGRAPH
+
     if is_quote:
         return BlockType.QUOTE
-    
-    is_unordered_list = True
-    for line in lines:
-        if not line.startswith("- "):
-            is_unordered_list = False
-            break
     if is_unordered_list:
         return BlockType.UNORDERED_LIST
-    
-    is_ordered_list = True
-    for i, line in enumerate(lines, 1):
-        expected_prefix = f"{i}. "
-        if not line.startswith(expected_prefix):
-            is_ordered_list = False
-            break
-    if is_ordered_list:
-        return BlockType.ORDERED_LIST
-    
-    # default to paragraph
-    return BlockType.PARAGRAPH
+    return BlockType.ORDERED_LIST
+
+def _finish_block(lines: list[str]) -> tuple[BlockType, str]:
+    lines[0] = lines[0].lstrip()
+    lines[-1] = lines[-1].rstrip()
+    return _classify_lines(lines), "\n".join(lines)
+
+def iter_blocks(markdown: str | Iterable[str]) -> Iterator[tuple[BlockType, str]]:
+    """
+    Lexes markdown line by line and lazily yields (BlockType, block) pairs.
+
+    Accepts a string or any iterable of lines, such as an open file. Fenced
+    code blocks are kept whole, including any blank lines inside them.
+    """
+    block_lines = []
+    in_fence = False
+
+    for line in _iter_lines(markdown):
+        if in_fence:
+            block_lines.append(line)
+            if line.rstrip().endswith("```"):
+                yield _finish_block(block_lines)
+                block_lines = []
+                in_fence = False
+            continue
+
+        if line.strip() == "":
+            if block_lines:
+                yield _finish_block(block_lines)
+                block_lines = []
+            continue
+
+        if not block_lines:
+            stripped = line.strip()
+            # A fence opens a code block unless it also closes on the same line
+            in_fence = stripped.startswith("```") and (len(stripped) < 6 or not stripped.endswith("```"))
+
+        block_lines.append(line)
+
+    if block_lines:
+        yield _finish_block(block_lines)
+
+def markdown_to_blocks(markdown : str) -> list[str]:
+    return [block for _, block in iter_blocks(markdown)]
+
+def block_to_blocktype(block: str) -> BlockType:
+    return _classify_lines(block.split('\n'))
 
 def text_to_html_nodes(text: str) -> list[HtmlNode]:
     text_nodes = text_to_textnodes(text)
@@ -201,25 +477,21 @@ def text_to_html_nodes(text: str) -> list[HtmlNode]:
         html_nodes.append(text_node.text_node_to_html_node())
     return html_nodes
 
-def heading_block_to_html_node(block: str) -> HtmlNode:
-    heading_level = len(block.split(" ")[0])
+def heading_block_content(block: str) -> tuple[int, str]:
+    space = block.find(" ")
+    heading_level = space if space != -1 else len(block)
     if not (1 <= heading_level <= 6):
         raise ValueError(f"Invalid heading level. Must start with 1 to 6 hash characters: {block}")
-    
-    heading_text = block.lstrip("#").strip()
-    children = text_to_html_nodes(heading_text)
-    return ParentNode(f"h{heading_level}", children)
 
-def code_block_to_html_node(block: str) -> HtmlNode:
+    return heading_level, block.lstrip("#").strip()
+
+def code_block_content(block: str) -> str:
     if not (block.startswith("```") and block.endswith("```")):
         raise ValueError(f"Invalid code block. Must start with '```' and end with '```': {block.strip()}")
-    
-    code_content = block[3:-3].strip()
-    code_leaf = LeafNode("code", code_content)
-    
-    return ParentNode("pre", [code_leaf])
 
-def quote_block_to_html_node(block: str) -> HtmlNode:
+    return block[3:-3].strip()
+
+def quote_block_content(block: str) -> str:
     lines = block.split("\n")
     clean_lines = []
     
@@ -229,65 +501,246 @@ def quote_block_to_html_node(block: str) -> HtmlNode:
         
         clean_lines.append(line[1:].strip())
     
-    inner_text = "\n".join(clean_lines)
-    children = text_to_html_nodes(inner_text)
-    
-    return ParentNode("blockquote", children)
+    return "\n".join(clean_lines)
 
-def ul_block_to_html_node(block: str) -> HtmlNode:
+def ul_block_items(block: str) -> list[str]:
     lines = block.split("\n")
-    list_items = []
+    items = []
 
     for line in lines:
         if not line.startswith("- "):
             raise ValueError(f"Invalid unordered list block. All lines must begin with a '- ' character: {line.strip()}")
         
-        inner_text = line[2:].strip()
-        li_children = text_to_html_nodes(inner_text)
-        list_items.append(ParentNode("li", li_children))
+        items.append(line[2:].strip())
     
-    return ParentNode("ul", list_items)
+    return items
 
-def ol_block_to_html_node(block: str) -> HtmlNode:
+def ol_block_items(block: str) -> list[str]:
     lines = block.split("\n")
-    list_items = []
+    items = []
 
     for i, line in enumerate(lines, 1):
         expected_prefix = f"{i}. "
         if not line.startswith(expected_prefix):
             raise ValueError(f"Invalid ordered list block. All lines must begin with a number followed by a '.': {line.strip()}")
         
-        inner_text = line[len(expected_prefix):].strip()
-        li_children = text_to_html_nodes(inner_text)
-        list_items.append(ParentNode("li", li_children))
+        items.append(line[len(expected_prefix):].strip())
     
+    return items
+
+def paragraph_block_content(block: str) -> str:
+    return block.replace("\n", " ").strip()
+
+def heading_block_to_html_node(block: str) -> HtmlNode:
+    heading_level, heading_text = heading_block_content(block)
+    children = text_to_html_nodes(heading_text)
+    return ParentNode(f"h{heading_level}", children)
+
+def code_block_to_html_node(block: str) -> HtmlNode:
+    code_leaf = LeafNode("code", code_block_content(block))
+    return ParentNode("pre", [code_leaf])
+
+def quote_block_to_html_node(block: str) -> HtmlNode:
+    children = text_to_html_nodes(quote_block_content(block))
+    return ParentNode("blockquote", children)
+
+def ul_block_to_html_node(block: str) -> HtmlNode:
+    list_items = [ParentNode("li", text_to_html_nodes(item)) for item in ul_block_items(block)]
+    return ParentNode("ul", list_items)
+
+def ol_block_to_html_node(block: str) -> HtmlNode:
+    list_items = [ParentNode("li", text_to_html_nodes(item)) for item in ol_block_items(block)]
     return ParentNode("ol", list_items)
 
 def paragraph_block_to_html_node(block: str) -> HtmlNode:
-    inner_text = block.replace("\n", " ").strip()
-    children = text_to_html_nodes(inner_text)
+    children = text_to_html_nodes(paragraph_block_content(block))
     return ParentNode("p", children)
 
-def markdown_to_html_node(markdown: str) -> HtmlNode:
-    blocks = markdown_to_blocks(markdown)
+def block_to_html_node(block_type: BlockType, block: str) -> HtmlNode:
+    if block_type == BlockType.HEADING:
+        return heading_block_to_html_node(block)
+    elif block_type == BlockType.CODE:
+        return code_block_to_html_node(block)
+    elif block_type == BlockType.QUOTE:
+        return quote_block_to_html_node(block)
+    elif block_type == BlockType.UNORDERED_LIST:
+        return ul_block_to_html_node(block)
+    elif block_type == BlockType.ORDERED_LIST:
+        return ol_block_to_html_node(block)
+    elif block_type == BlockType.PARAGRAPH:
+        return paragraph_block_to_html_node(block)
+    else:
+        raise ValueError(f"Invalid block type: {block_type}")
+
+def blocks_to_html_node(typed_blocks: Iterable[tuple[BlockType, str]]) -> HtmlNode:
     children_nodes = []
 
-    for block in blocks:
-        block_type = block_to_blocktype(block)
-        
-        if block_type == BlockType.HEADING:
-            children_nodes.append(heading_block_to_html_node(block))
-        elif block_type == BlockType.CODE:
-            children_nodes.append(code_block_to_html_node(block))
-        elif block_type == BlockType.QUOTE:
-            children_nodes.append(quote_block_to_html_node(block))
-        elif block_type == BlockType.UNORDERED_LIST:
-            children_nodes.append(ul_block_to_html_node(block))
-        elif block_type == BlockType.ORDERED_LIST:
-            children_nodes.append(ol_block_to_html_node(block))
-        elif block_type == BlockType.PARAGRAPH:
-            children_nodes.append(paragraph_block_to_html_node(block))
-        else:
-            raise ValueError(f"Invalid block type: {block_type}")
+    for block_type, block in typed_blocks:
+        children_nodes.append(block_to_html_node(block_type, block))
     
-    return ParentNode("div", children_nodes)
\ No newline at end of file
+    return ParentNode("div", children_nodes)
+
+def markdown_to_html_node(markdown: str | Iterable[str]) -> HtmlNode:
+    return blocks_to_html_node(iter_blocks(markdown))
+
+class RenderedUrls:
+    """
+    The URLs of the links and images rendered inside collect_urls, as
+    written in the markdown. complete is False if some of the HTML came
+    from a cache instead of the renderer, so its URLs weren't seen.
+    """
+
+    def __init__(self):
+        self.urls = set()
+        self.complete = True
+
+    def known(self) -> set[str] | None:
+        return self.urls if self.complete else None
+
+_rendered_urls = contextvars.ContextVar("rendered_urls", default=None)
+
+@contextlib.contextmanager
+def collect_urls() -> Iterator[RenderedUrls]:
+    """Collects the URLs rendered by this thread inside the with block."""
+    rendered = RenderedUrls()
+    token = _rendered_urls.set(rendered)
+    try:
+        yield rendered
+    finally:
+        _rendered_urls.reset(token)
+
+def note_urls(urls: Iterable[str] | None):
+    """Adds urls to those being collected. None stands for HTML taken from a cache, whose URLs are unknown."""
+    rendered = _rendered_urls.get()
+    if rendered is None:
+        return
+    if urls is None:
+        rendered.complete = False
+    else:
+        rendered.urls.update(urls)
+
+def site_url(url: str, basepath: str = BASEPATH_SLOT) -> str:
+    """Returns url with basepath in place of its leading slash if it is site-absolute, like "/images/tom.png"."""
+    rendered = _rendered_urls.get()
+    if rendered is not None:
+        rendered.urls.add(url)
+
+    if url.startswith("/") and not url.startswith("//"):
+        return basepath + url[1:]
+    return url
+
+def apply_basepath(basepath: str, html: str) -> str:
+    """Fills basepath into the URLs of HTML rendered with BASEPATH_SLOT."""
+    return html.replace(BASEPATH_SLOT, basepath)
+
+def rebase_urls(node: HtmlNode, basepath: str = BASEPATH_SLOT) -> HtmlNode:
+    """
+    Applies site_url to the href of every link and the src of every image
+    in the tree below node, in place, and returns node. Only these
+    attributes change, never text that merely looks like one.
+    """
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        attribute = URL_ATTRIBUTES.get(item.tag)
+        if attribute is not None and item.props and attribute in item.props:
+            item.props[attribute] = site_url(item.props[attribute], basepath)
+        if isinstance(item, ParentNode):
+            stack.extend(child for child in item.children if isinstance(child, HtmlNode))
+    return node
+
+
+INLINE_TAGS = {
+    TextType.NORMAL: None,
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+    TextType.LINK: "a",
+}
+
+def _inline_items_to_html(items: list[tuple], parts: list[str]):
+    for text_type, text, url, children in items:
+        if text_type == TextType.NORMAL:
+            parts.append(text)
+        elif text_type == TextType.IMAGE:
+            parts.append(f'<img src="{site_url(url)}" alt="{text}"></img>')
+        else:
+            tag = INLINE_TAGS[text_type]
+            parts.append(f'<a href="{site_url(url)}">' if text_type == TextType.LINK else f"<{tag}>")
+            if children is None:
+                parts.append(text)
+            else:
+                _inline_items_to_html(children, parts)
+            parts.append(f"</{tag}>")
+
+def _inline_element_to_html(tag: str, text: str, parts: list[str]) -> bool:
+    items = tokenize_inline_memoized(text)
+    parts.append(f"<{tag}>")
+    _inline_items_to_html(items, parts)
+    parts.append(f"</{tag}>")
+    return bool(items)
+
+def block_to_html(block_type: BlockType, block: str, parts: list[str]) -> bool:
+    """
+    Appends the HTML of one block to parts. Returns False if the block has an
+    element without children, which the tree path refuses to serialize.
+    Blocks seen before are served from the block memo.
+    """
+    if len(block) > MEMO_MAX_TEXT:
+        return _render_block(block_type, block, parts)
+
+    html, valid, urls = block_memo.get_or_render((block_type, block), lambda: _render_fragment(block_type, block))
+    parts.append(html)
+    # Memo hits render nothing, so the block's URLs are kept with its HTML
+    if urls:
+        note_urls(urls)
+    return valid
+
+def _render_fragment(block_type: BlockType, block: str) -> tuple[str, bool, tuple[str, ...]]:
+    parts = []
+    with collect_urls() as rendered:
+        valid = _render_block(block_type, block, parts)
+    return "".join(parts), valid, tuple(rendered.urls)
+
+def _render_block(block_type: BlockType, block: str, parts: list[str]) -> bool:
+    if block_type == BlockType.HEADING:
+        heading_level, heading_text = heading_block_content(block)
+        return _inline_element_to_html(f"h{heading_level}", heading_text, parts)
+    elif block_type == BlockType.CODE:
+        parts.append(f"<pre><code>{code_block_content(block)}</code></pre>")
+        return True
+    elif block_type == BlockType.QUOTE:
+        return _inline_element_to_html("blockquote", quote_block_content(block), parts)
+    elif block_type in (BlockType.UNORDERED_LIST, BlockType.ORDERED_LIST):
+        tag = "ul" if block_type == BlockType.UNORDERED_LIST else "ol"
+        items = ul_block_items(block) if block_type == BlockType.UNORDERED_LIST else ol_block_items(block)
+        parts.append(f"<{tag}>")
+        valid = True
+        for item in items:
+            valid = _inline_element_to_html("li", item, parts) and valid
+        parts.append(f"</{tag}>")
+        return valid
+    elif block_type == BlockType.PARAGRAPH:
+        return _inline_element_to_html("p", paragraph_block_content(block), parts)
+    else:
+        raise ValueError(f"Invalid block type: {block_type}")
+
+def markdown_to_html(markdown: str | Iterable[str], basepath: str | None = "/") -> str:
+    """
+    Renders markdown straight to the HTML markdown_to_html_node(markdown).to_html()
+    returns, emitting string fragments per block without building any nodes.
+    Site-absolute link and image URLs start with basepath instead of "/",
+    or with BASEPATH_SLOT if basepath is None.
+    """
+    parts = ["<div>"]
+    valid = True
+    for block_type, block in iter_blocks(markdown):
+        valid = block_to_html(block_type, block, parts) and valid
+
+    # Raised after parsing everything, like the tree path does when serializing
+    if not valid or len(parts) == 1:
+        raise ValueError("Parent nodes must have children")
+
+    parts.append("</div>")
+    html = "".join(parts)
+    return html if basepath is None else apply_basepath(basepath, html)
@@ -1,6 +1,8 @@
 from htmlnode import HtmlNode
 
 class LeafNode(HtmlNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, value=None, props=None):
         if value is None:
             raise ValueError("Leaf nodes must have a value")
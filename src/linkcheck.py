@@ -0,0 +1,171 @@
+import argparse
+import logging
+import os
+import re
+import sys
+from urllib.parse import unquote, urljoin, urlsplit
+from application import PageGenerationError, configure_logging
+from listings import BLOG_DIR
+from sitedb import ANCHOR_ATTRIBUTE, SiteDatabase, page_url
+from template import load_template
+import tracing
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_URL = re.compile(r'\b(?:href|src)="([^"]*)"')
+# Fragments every page has, the browser scrolls to the top for them
+TOP_FRAGMENTS = ("", "top")
+
+class LinkReport:
+    """
+    What check_links found: broken links as (source, link, reason), the
+    sources of pages no other page links to, and the static files (relative
+    to the static directory) nothing links to.
+    """
+
+    def __init__(self):
+        self.links = 0
+        self.broken = []
+        self.orphans = []
+        self.unused_assets = []
+
+    def is_clean(self) -> bool:
+        return not (self.broken or self.orphans or self.unused_assets)
+
+def resolve_link(page: str, target: str) -> tuple[str, str] | None:
+    """
+    Returns the site-absolute path and the fragment a link on the page at
+    URL page points at, ("/blog/tom/", "intro") for "../tom/#intro" on
+    "/blog/glorfindel/", or None if it leaves the site.
+    """
+    path, _, fragment = target.partition("#")
+    path = path.partition("?")[0]
+    if path.startswith("/") and not path.startswith("//") and "/." not in path:
+        # Already site-absolute and normalized, most links are
+        return unquote(path), unquote(fragment)
+
+    parts = urlsplit(target)
+    if parts.scheme or parts.netloc:
+        return None
+    path = urljoin(page, parts.path) if parts.path else page
+    return unquote(path), unquote(parts.fragment)
+
+def output_urls(output: str) -> list[str]:
+    """Returns the URLs an output path relative to the site root is served at, with and without index.html."""
+    url = page_url(output)
+    urls = ["/" + output.replace(os.sep, "/")]
+    if url != urls[0]:
+        urls.append(url)
+        if url != "/":
+            # Served through the web server's redirect to the directory
+            urls.append(url.rstrip("/"))
+    return urls
+
+def _static_files(static_dir: str) -> dict[str, str]:
+    files = {}
+    for dir_path, _, file_names in os.walk(static_dir):
+        for item in file_names:
+            relative_path = os.path.relpath(os.path.join(dir_path, item), static_dir)
+            files["/" + relative_path.replace(os.sep, "/")] = relative_path
+    return files
+
+def check_links(database: SiteDatabase, static_dir: str, template_path: str, listings: bool = False) -> LinkReport:
+    """
+    Checks every link and image recorded in the site database, and those in
+    the template, against the generated pages, the static files and the
+    anchors of each page, in one pass over the links. A page no other page
+    or the template links to is an orphan, unless listings is True and it
+    is shown on the blog index or a tag page; the home page never is.
+    """
+    report = LinkReport()
+    pages = {}
+    for page in database.pages(drafts=True):
+        for url in output_urls(page["output"]):
+            pages[url] = page["source"]
+    generated = {url for output in database.collections() for url in output_urls(output)} if listings else set()
+    assets = _static_files(static_dir)
+    anchors = database.anchors()
+
+    template_html = "".join(load_template(template_path).literals)
+    # Ids in the template are on every page
+    shared_anchors = set(ANCHOR_ATTRIBUTE.findall(template_html))
+    links = [(template_path, "/", target) for target in TEMPLATE_URL.findall(template_html)]
+    links.extend((link["source"], link["url"], link["target"]) for link in database.connection.execute(
+        "SELECT links.source, pages.url, links.target FROM links JOIN pages USING (source)"
+    ))
+
+    linked = set()
+    used_assets = set()
+    for source, url, target in links:
+        report.links += 1
+        resolved = resolve_link(url, target)
+        if resolved is None:
+            continue
+        path, fragment = resolved
+
+        if path in assets:
+            used_assets.add(path)
+        elif path in pages:
+            target_source = pages[path]
+            if target_source != source:
+                linked.add(target_source)
+            if fragment not in TOP_FRAGMENTS and fragment not in shared_anchors and fragment not in anchors.get(target_source, ()):
+                report.broken.append((source, target, f"no anchor #{fragment}"))
+        elif path not in generated:
+            report.broken.append((source, target, "no such page or file"))
+
+    if listings:
+        linked.update(page["source"] for page in database.pages(prefix=f"/{BLOG_DIR}/"))
+        linked.update(page["source"] for tagged in database.tags().values() for page in tagged)
+
+    report.orphans = [page["source"] for page in database.pages() if page["url"] != "/" and page["source"] not in linked]
+    report.unused_assets = sorted(relative_path for path, relative_path in assets.items() if path not in used_assets)
+    return report
+
+def log_report(report: LinkReport):
+    for source, target, reason in report.broken:
+        logger.warning("Broken link in %s: %s (%s)", source, target, reason)
+    for source in sorted(report.orphans):
+        logger.warning("Orphan page, nothing links to %s", source)
+    for relative_path in report.unused_assets:
+        logger.warning("Unused static file: %s", relative_path)
+    logger.info(
+        "Link check: %s links, %s broken, %s orphan pages, %s unused static files",
+        report.links, len(report.broken), len(report.orphans), len(report.unused_assets),
+    )
+
+def check_site_links(dir_path_content: str, static_dir: str, template_path: str, listings: bool = False, database_path: str | None = None) -> LinkReport:
+    """Updates the site database from dir_path_content, checks the links of the whole site and logs what was found."""
+    database = SiteDatabase(database_path) if database_path else SiteDatabase()
+    try:
+        with tracing.span("metadata index"):
+            database.update(dir_path_content)
+        with tracing.span("link check"):
+            report = check_links(database, static_dir, template_path, listings)
+    finally:
+        database.close()
+
+    log_report(report)
+    return report
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py links", description="Report broken links and anchors, orphan pages and unused static files without building the site")
+    parser.add_argument("--content-dir", default="content", help="directory of the Markdown pages (default: content)")
+    parser.add_argument("--static-dir", default="static", help="directory of the static files (default: static)")
+    parser.add_argument("--template", default="template.html", help="template whose links are checked too (default: template.html)")
+    parser.add_argument("--listings", action="store_true", help="count the generated blog index and tag pages as links to the pages they show")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging()
+
+    for directory in (args.content_dir, args.static_dir):
+        if not os.path.isdir(directory):
+            logger.error("Error, directory does not exist: %s", directory)
+            return
+
+    try:
+        check_site_links(args.content_dir, args.static_dir, args.template, args.listings)
+    except PageGenerationError as e:
+        logger.error("Error, %s", e)
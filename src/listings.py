@@ -0,0 +1,209 @@
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Callable, Iterable
+from application import fill_page, write_page
+from manifest import GENERATOR_VERSION, BuildManifest, remove_output
+from helpers import site_url
+from sitedb import SiteDatabase
+from template import load_template
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Pages below content/blog/ are the posts listed on the blog index and in the feed
+BLOG_DIR = "blog"
+TAGS_DIR = "tags"
+PAGE_SIZE = 10
+FEED_SIZE = 20
+
+def tag_slug(tag: str) -> str:
+    """Returns the URL segment of a tag, "c-sharp" style: lowercase letters and digits joined by dashes."""
+    return re.sub(r"[^a-z0-9]+", "-", tag.lower()).strip("-") or "tag"
+
+def tag_slugs(tags: Iterable[str]) -> dict[str, str]:
+    """
+    Returns the URL segment of every tag. Tags whose slugs collide, like
+    "c" and "C#", are told apart with a warning by a numeric suffix, "c-2".
+    A tag already written as its slug keeps it, the others follow in sorted
+    order, so the same tags always get the same URLs.
+    """
+    slugs = {}
+    # slug -> tag it was given to
+    taken = {}
+    for tag in sorted(tags, key=lambda tag: (tag_slug(tag) != tag, tag)):
+        slug = base = tag_slug(tag)
+        number = 1
+        while slug in taken:
+            number += 1
+            slug = f"{base}-{number}"
+        if slug != base:
+            logger.warning("Tags %r and %r have the same URL, %r is listed at /%s/%s/", taken[base], tag, tag, TAGS_DIR, slug)
+        taken[slug] = tag
+        slugs[tag] = slug
+    return slugs
+
+def _signature(*parts: object) -> str:
+    return hashlib.sha256(json.dumps([GENERATOR_VERSION, *parts], default=str).encode()).hexdigest()
+
+def _members(pages: list[sqlite3.Row]) -> list[tuple]:
+    # Everything about a member that shows up on a collection page
+    return [(page["url"], page["title"], page["date"], page["modified"]) for page in pages]
+
+def _page_date(page: sqlite3.Row) -> datetime:
+    parsed = datetime.fromisoformat(page["date"] or page["modified"])
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+def _paginated_url(base_url: str, number: int) -> str:
+    return base_url if number == 1 else f"{base_url}page/{number}/"
+
+def _listing_html(heading: str, pages: list[sqlite3.Row], base_url: str, number: int, count: int) -> str:
+    items = []
+    for page in pages:
+        date = page["date"] or ""
+        time = f' <time datetime="{html.escape(date)}">{html.escape(date[:10])}</time>' if date else ""
+        items.append(f'<li><a href="{html.escape(site_url(page["url"]))}">{html.escape(page["title"])}</a>{time}</li>')
+
+    navigation = []
+    if number > 1:
+        navigation.append(f'<a href="{site_url(_paginated_url(base_url, number - 1))}">Newer posts</a>')
+    if number < count:
+        navigation.append(f'<a href="{site_url(_paginated_url(base_url, number + 1))}">Older posts</a>')
+    nav = f"<nav>{' '.join(navigation)}</nav>" if navigation else ""
+
+    return f"<div><h1>{html.escape(heading)}</h1><ul>{''.join(items)}</ul>{nav}</div>"
+
+def _absolute_url(site_url: str, basepath: str, url: str) -> str:
+    return site_url.rstrip("/") + basepath.rstrip("/") + url
+
+def _sitemap_xml(entries: list[tuple[str, str]]) -> str:
+    urls = "".join(f"<url><loc>{html.escape(loc)}</loc><lastmod>{html.escape(lastmod)}</lastmod></url>" for loc, lastmod in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>\n'
+
+def _feed_xml(title: str, link: str, items: list[tuple[str, str, str]]) -> str:
+    entries = "".join(
+        f"<item><title>{html.escape(item_title)}</title><link>{html.escape(url)}</link><guid>{html.escape(url)}</guid><pubDate>{published}</pubDate></item>"
+        for item_title, url, published in items
+    )
+    channel = f"<title>{html.escape(title)}</title><link>{html.escape(link)}</link><description>{html.escape(title)}</description>"
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>{channel}{entries}</channel></rss>\n'
+
+def generate_listings(database: SiteDatabase, basepath: str, template_path: str, dest_dir_path: str, site_url: str | None = None, page_size: int = PAGE_SIZE, manifest: BuildManifest | None = None) -> tuple[int, int]:
+    """
+    Writes the blog index and the tag pages, paginated by page_size, and,
+    given the site's URL, sitemap.xml and the blog's RSS feed, all from the
+    site database. Each output is only rewritten when its signature changes,
+    a hash of everything shown on it, so editing a post only regenerates
+    the listings that post appears on. Outputs of earlier builds that are no
+    longer produced, like the page of a tag nobody uses anymore, are
+    removed. Every output is recorded in manifest, if given, with the query
+    it lists and the pages it shows. Returns how many outputs were written
+    and how many were already up to date.
+    """
+    template = load_template(template_path)
+    site = {page["output"] for page in database.pages(drafts=True)}
+    # output path -> (signature, function returning the output's text)
+    outputs: dict[str, tuple[str, Callable[[], str]]] = {}
+    # output path -> (query, source paths of the pages shown), for the manifest
+    queries: dict[str, tuple[str, list[str]]] = {}
+
+    # (url, last change) of the first page of every listing, for the sitemap
+    listing_urls = []
+
+    def add_listing(heading: str, pages: list[sqlite3.Row], base_url: str, query: str):
+        if not pages:
+            return
+        listing_urls.append((base_url, max(page["date"] or page["modified"] for page in pages)))
+
+        count = -(-len(pages) // page_size)
+        for number in range(1, count + 1):
+            url = _paginated_url(base_url, number)
+            output = os.path.join(*url.strip("/").split("/"), "index.html")
+            if output in site:
+                logger.warning("Not generating the listing at %s, a page is already written there", output)
+                continue
+
+            members = pages[(number - 1) * page_size:number * page_size]
+            signature = _signature("listing", template.hash, basepath, heading, number, count, _members(members))
+
+            def render(heading=heading, members=members, base_url=base_url, number=number, count=count) -> str:
+                content = _listing_html(heading, members, base_url, number, count)
+                title = heading if number == 1 else f"{heading} - page {number}"
+                return fill_page(basepath, template, title, content)
+
+            outputs[output] = (signature, render)
+            queries[output] = (query, [page["source"] for page in members])
+
+    posts = [page for page in database.pages(prefix=f"/{BLOG_DIR}/") if page["url"] != f"/{BLOG_DIR}/"]
+    add_listing("Blog", posts, f"/{BLOG_DIR}/", f"pages below /{BLOG_DIR}/")
+    tags = database.tags()
+    slugs = tag_slugs(tags)
+    for tag, pages in tags.items():
+        add_listing(f"Tagged {tag}", pages, f"/{TAGS_DIR}/{slugs[tag]}/", f"pages tagged {tag}")
+
+    if site_url:
+        pages = database.pages()
+        home = next((page for page in pages if page["url"] == "/"), None)
+        site_title = home["title"] if home is not None else "Blog"
+
+        entries = [(page["url"], page["date"] or page["modified"]) for page in pages] + listing_urls
+        sitemap = [(_absolute_url(site_url, basepath, url), lastmod) for url, lastmod in sorted(entries)]
+        outputs["sitemap.xml"] = (_signature("sitemap", sitemap), lambda: _sitemap_xml(sitemap))
+        queries["sitemap.xml"] = ("every page", [page["source"] for page in pages])
+
+        feed = [(post["title"], _absolute_url(site_url, basepath, post["url"]), format_datetime(_page_date(post))) for post in posts[:FEED_SIZE]]
+        link = _absolute_url(site_url, basepath, "/")
+        outputs[os.path.join(BLOG_DIR, "feed.xml")] = (_signature("feed", site_title, link, feed), lambda: _feed_xml(site_title, link, feed))
+        queries[os.path.join(BLOG_DIR, "feed.xml")] = (f"newest {FEED_SIZE} pages below /{BLOG_DIR}/", [post["source"] for post in posts[:FEED_SIZE]])
+    else:
+        logger.info("No site URL given, skipping sitemap.xml and the feed")
+
+    written = 0
+    for output, (signature, render) in outputs.items():
+        output_path = os.path.join(dest_dir_path, output)
+        previous = database.collection_signature(output)
+        if previous == signature and os.path.exists(output_path):
+            reason = None
+        else:
+            logger.info("Generating listing %s", output_path)
+            write_page(output_path, render())
+            database.record_collection(output, signature)
+            written += 1
+            if previous is None:
+                reason = "new listing"
+            else:
+                reason = "output was missing" if previous == signature else "listed pages, template or basepath changed"
+
+        if manifest is not None:
+            manifest.record_listing(output_path, *queries[output], reason)
+
+    for output in database.collections():
+        if output in outputs:
+            continue
+        output_path = os.path.join(dest_dir_path, output)
+        # A page written where a listing used to be is content, not a stale listing
+        if output not in site and os.path.isfile(output_path):
+            logger.info("Removing listing %s", output_path)
+            remove_output(output_path, dest_dir_path)
+        database.record_collection(output, None)
+
+    return written, len(outputs) - written
+
+def build_listings(dir_path_content: str, basepath: str, template_path: str, dest_dir_path: str, site_url: str | None = None, database_path: str | None = None, manifest: BuildManifest | None = None):
+    """Updates the site database from dir_path_content and regenerates the listings that changed."""
+    database = SiteDatabase(database_path) if database_path else SiteDatabase()
+    try:
+        with tracing.span("metadata index"):
+            changed, removed = database.update(dir_path_content)
+        with tracing.span("listings"):
+            written, unchanged = generate_listings(database, basepath, template_path, dest_dir_path, site_url, manifest=manifest)
+    finally:
+        database.close()
+
+    logger.info("Site database: %s pages changed, %s removed; listings: %s written, %s unchanged", changed, removed, written, unchanged)
@@ -1,34 +1,339 @@
+import argparse
+import logging
 import os
+import shutil
 import sys
 from application import *
+from helpers import block_memo, inline_memo
+from linkcheck import check_site_links
+from listings import build_listings
+from manifest import BuildManifest, MANIFEST_FILE
+from pipeline import generate_pages_pipeline
+from parsecache import PARSE_CACHE_DIR, ParseCache
+from rendercache import RenderCache
+import catalog
+import daemon
+import devserver
+import explain
+import linkcheck
+import shards
+import tracing
 
-def main():
-    basepath = "/"
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-    
+logger = logging.getLogger(__name__)
+
+# Subcommands, the default command builds the site
+COMMANDS = {
+    "daemon": daemon.main,
+    "serve": devserver.main,
+    "merge": shards.main,
+    "pages": catalog.main,
+    "explain": explain.main,
+    "links": linkcheck.main,
+}
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate the static site from Markdown content")
+    parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served from")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"only re-render pages whose inputs changed and sync changed static files since the last build (tracked in {MANIFEST_FILE})",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="number of pages rendered in parallel, 0 uses every CPU (default: 1)",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread"],
+        help="worker pool used when --jobs is not 1 (default: thread on free-threaded Python, process otherwise)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="stream pages through concurrent read, render and write stages with bounded queues, --jobs sets the render threads",
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="render Markdown straight to HTML without building the intermediate node tree",
+    )
+    parser.add_argument(
+        "--shard",
+        type=shards.parse_shard,
+        metavar="K/N",
+        help="only render the K-th of N size-balanced parts of the pages, without the static files, for 'main.py merge' to combine",
+    )
+    parser.add_argument(
+        "--listings",
+        action="store_true",
+        help="also generate the blog index, tag pages and, with --site-url, sitemap.xml and the RSS feed from the site database",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="after the build, report broken links and anchors, orphan pages and unused static files",
+    )
+    parser.add_argument(
+        "--site-url",
+        metavar="URL",
+        help="scheme and host the site is published at, such as https://example.com, used for the absolute URLs in sitemap.xml and the feed",
+    )
+    parser.add_argument(
+        "--target",
+        nargs=2,
+        action="append",
+        metavar=("BASEPATH", "DIR"),
+        help="write the site for BASEPATH to DIR instead, can be repeated to render every page once and write it for several basepaths",
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="directory the site is written to (default: docs, or docs-shard-K-of-N with --shard)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("SSG_RENDER_CACHE"),
+        help="directory of rendered pages shared between builds, checkouts and machines (default: $SSG_RENDER_CACHE, no cache if unset)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        metavar="MB",
+        help="size the render cache is trimmed to after a build, least recently used pages first (default: 1024)",
+    )
+    parser.add_argument(
+        "--parse-cache",
+        metavar="DIR",
+        default=os.environ.get("SSG_PARSE_CACHE"),
+        help=f"directory of rendered Markdown reused after template or basepath changes (default: $SSG_PARSE_CACHE, or {PARSE_CACHE_DIR} with --incremental)",
+    )
+    parser.add_argument(
+        "--parse-cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="size the parse cache is trimmed to after a build, least recently used entries first (default: 256)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="ask the build daemon started with 'main.py daemon' to do the build instead",
+    )
+    parser.add_argument(
+        "--socket",
+        default=daemon.DEFAULT_SOCKET,
+        help=f"Unix socket of the build daemon (default: {daemon.DEFAULT_SOCKET})",
+    )
+    parser.add_argument(
+        "--quiet",
+        "-q",
+        action="store_true",
+        help="only log warnings and errors, same as --log-level WARNING",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="minimum level of the build messages that are shown (default: INFO)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write a Chrome trace of every build phase and page to FILE, viewable in chrome://tracing or ui.perfetto.dev",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also record the peak memory of every page with tracemalloc (slows the build down, ignored when pages render in threads)",
+    )
+    parser.add_argument(
+        "--trace-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="number of slowest pages listed after a traced build (default: 10)",
+    )
+    return parser.parse_args(argv)
+
+def generate_pages(args: argparse.Namespace, basepath: str, content_dir: str, template_file: str, output_dir: str, manifest: BuildManifest | None = None):
+    cache = RenderCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+    parse_cache_dir = args.parse_cache or (PARSE_CACHE_DIR if args.incremental else None)
+    parsed = ParseCache(parse_cache_dir, args.parse_cache_size * 1024 * 1024) if parse_cache_dir else None
+    block_memo.reset_counts()
+    inline_memo.reset_counts()
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if args.target:
+        # Rendered once with the slot as the basepath, then written for every target
+        executor = "thread" if jobs == 1 else args.executor
+        generate_pages_parallel(BASEPATH_SLOT, content_dir, template_file, output_dir, jobs, executor=executor, fast=args.fast, cache=cache, parsed=parsed, targets=args.target)
+    elif args.pipeline:
+        pages = None
+        if args.shard is not None:
+            pages = shard_pages(discover_pages(content_dir, output_dir), *args.shard)
+        generate_pages_pipeline(basepath, content_dir, template_file, output_dir, jobs, manifest, args.fast, cache, pages, parsed=parsed)
+    elif args.shard is not None:
+        # Sharding needs the full page list up front, a single thread renders it in-process
+        executor = "thread" if jobs == 1 else args.executor
+        generate_pages_parallel(basepath, content_dir, template_file, output_dir, jobs, executor=executor, manifest=manifest, fast=args.fast, cache=cache, shard=args.shard, parsed=parsed)
+    elif jobs == 1:
+        generate_pages_recursive(basepath, content_dir, template_file, output_dir, manifest, args.fast, cache, parsed)
+    else:
+        generate_pages_parallel(basepath, content_dir, template_file, output_dir, jobs, executor=args.executor, manifest=manifest, fast=args.fast, cache=cache, parsed=parsed)
+
+    if cache is not None:
+        with tracing.span("cache evict"):
+            evicted = cache.evict()
+        totals = cache.save_stats(evicted)
+        logger.info(
+            "Render cache: %s hits, %s misses (%.0f%% hit rate), %s evicted; %s hits and %s misses in total",
+            cache.hits, cache.misses, cache.hit_rate() * 100, evicted, totals["hits"], totals["misses"],
+        )
+
+    if parsed is not None:
+        with tracing.span("parse cache evict"):
+            evicted = parsed.evict()
+        parsed.save_stats(evicted)
+        logger.info("Parse cache: %s hits, %s misses (%.0f%% hit rate), %s evicted", parsed.hits, parsed.misses, parsed.hit_rate() * 100, evicted)
+
+    logger.info("Render memo: %s, %s", _memo_summary("blocks", block_memo), _memo_summary("inline spans", inline_memo))
+
+def _memo_summary(name: str, memo) -> str:
+    hits, misses = memo.counts()
+    lookups = hits + misses
+    return f"{name} {hits * 100 / lookups if lookups else 0:.0f}% of {lookups} lookups hit"
+
+def renders_pages_in_threads(args: argparse.Namespace) -> bool:
+    """Whether one process renders several pages at once, as the render threads of --pipeline and the thread executor do."""
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    # The pipeline reads and writes pages in their own threads even with one render thread
+    return args.pipeline or (jobs > 1 and (args.executor or default_executor()) == "thread")
+
+def build(args: argparse.Namespace, basepath: str, static_dir: str, content_dir: str, template_file: str, output_dir: str):
+    manifest = None
+    if args.target:
+        with tracing.span("static copy"):
+            for _, target_dir in args.target:
+                copy_directory_recursive(static_dir, target_dir)
+        generate_pages(args, basepath, content_dir, template_file, output_dir)
+    elif args.incremental:
+        manifest = BuildManifest(MANIFEST_FILE)
+        manifest.begin(template_file, basepath, static_dir)
+
+        # Static files are added once by 'main.py merge', not by every shard
+        if args.shard is None:
+            with tracing.span("static sync"):
+                previous = manifest.assets if manifest.loaded else unrecorded_assets(output_dir, content_dir)
+                manifest.assets = sync_directory(static_dir, output_dir, previous)
+        generate_pages(args, basepath, content_dir, template_file, output_dir, manifest)
+    else:
+        if args.shard is None:
+            with tracing.span("static copy"):
+                copy_directory_recursive(static_dir, output_dir)
+        elif os.path.exists(output_dir):
+            logger.info("Removing contents from %s", output_dir)
+            shutil.rmtree(output_dir)
+        generate_pages(args, basepath, content_dir, template_file, output_dir)
+
+    # Listings cover the whole site, sharded builds leave them to a full build
+    listings = args.listings and args.shard is None
+    if listings:
+        build_listings(content_dir, basepath, template_file, output_dir, args.site_url, manifest=manifest)
+
+    if manifest is not None:
+        manifest.prune(output_dir, listings)
+        manifest.save()
+
+    if args.check_links:
+        check_site_links(content_dir, static_dir, template_file, listings)
+
+def request_build(args: argparse.Namespace, basepath: str):
+    try:
+        response = daemon.send_request(args.socket, {"command": "build", "basepath": basepath, "root": os.getcwd()})
+    except (ConnectionError, OSError):
+        logger.error("Error, no build daemon is listening on %s", args.socket)
+        return
+
+    if not response["ok"]:
+        logger.error("Error, the build daemon failed: %s", response["error"])
+        return
+
+    for source_path in response["built"]:
+        logger.info("Generated page from %s", source_path)
+    for output_path in response["removed"]:
+        logger.info("Removed stale page %s", output_path)
+    logger.info("Daemon built %s of %s pages in %.1fms", len(response["built"]), response["pages"], response["seconds"] * 1000)
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
+
+    args = parse_args(argv)
+    configure_logging(logging.WARNING if args.quiet else args.log_level)
+
+    basepath = args.basepath
     if basepath and not basepath.endswith('/'):
         basepath += '/'
-    
+
+    if args.target:
+        unsupported = [option for option, value in (("--incremental", args.incremental), ("--pipeline", args.pipeline), ("--shard", args.shard), ("--listings", args.listings), ("--daemon", args.daemon), ("--output-dir", args.output_dir)) if value]
+        if unsupported:
+            logger.error("Error, --target cannot be combined with %s", ", ".join(unsupported))
+            return
+        for target in args.target:
+            if not target[0].endswith("/"):
+                target[0] += "/"
+
     static_dir = "static"
-    output_dir = "docs"
+    output_dir = args.output_dir or "docs"
+    if args.target:
+        output_dir = args.target[0][1]
+    if args.shard is not None and args.output_dir is None:
+        output_dir = "docs-shard-{}-of-{}".format(*args.shard)
     content_dir = "content"
     template_file = "template.html"
 
-    print(f"Starting page generation with basepath: {basepath}")
+    if args.target:
+        logger.info("Starting page generation for basepaths: %s", ", ".join(target_basepath for target_basepath, _ in args.target))
+    else:
+        logger.info("Starting page generation with basepath: %s", basepath)
 
     if not os.path.exists(static_dir):
-        print(f"Error, source directory does not exist: {static_dir}")
+        logger.error("Error, source directory does not exist: %s", static_dir)
         return
 
     if not os.path.exists(content_dir):
-        print(f"Error, content directory does not exist: {content_dir}")
+        logger.error("Error, content directory does not exist: %s", content_dir)
+        return
+
+    if args.daemon:
+        request_build(args, basepath)
         return
-    
-    copy_directory_recursive(static_dir, output_dir)
-    generate_pages_recursive(basepath, content_dir, template_file, output_dir)
 
-    print("Page generation complete")
+    if args.trace and args.trace_memory and renders_pages_in_threads(args):
+        # Peaks are process-wide, concurrent pages would be charged for each other's memory
+        logger.warning("--trace-memory is ignored when pages render in threads, use --executor process or --jobs 1")
+        args.trace_memory = False
+
+    tracer = tracing.Tracer(args.trace_memory) if args.trace else tracing.NullTracer()
+    previous_tracer = tracing.set_tracer(tracer)
+    try:
+        with tracer.span("build"):
+            build(args, basepath, static_dir, content_dir, template_file, output_dir)
+    finally:
+        tracing.set_tracer(previous_tracer)
+
+    logger.info("Page generation complete")
+
+    if args.trace:
+        tracer.write_chrome_trace(args.trace)
+        tracer.print_summary(args.trace_top)
+        print(f"Trace written to {args.trace}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
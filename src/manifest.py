@@ -0,0 +1,325 @@
+import contextlib
+import contextvars
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+from template import load_template
+
+logger = logging.getLogger(__name__)
+
+GENERATOR_VERSION = "2"
+MANIFEST_FILE = ".build-manifest.json"
+
+# Dependency kinds whose change means the outputs depending on them must be regenerated
+INVALIDATING_KINDS = ("source", "template", "listed page")
+ASSET_ATTRIBUTE = re.compile(r'\b(?:src|href)="([^"]*)"')
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SourceVersion(NamedTuple):
+    """The size, mtime and content hash of a source file as it was read."""
+
+    size: int
+    mtime_ns: int
+    hash: str
+
+def source_version(path: str) -> SourceVersion:
+    # Taken before hashing, so a write in between makes the recorded version look stale rather than fresh
+    stat = os.stat(path)
+    return SourceVersion(stat.st_size, stat.st_mtime_ns, hash_file(path))
+
+_read_sources = contextvars.ContextVar("read_sources", default=None)
+
+@contextlib.contextmanager
+def collect_sources() -> Iterator[dict[str, SourceVersion]]:
+    """Collects the version of every source read by this thread inside the with block, by path."""
+    sources = {}
+    token = _read_sources.set(sources)
+    try:
+        yield sources
+    finally:
+        _read_sources.reset(token)
+
+def read_source(path: str) -> tuple[bytes, SourceVersion]:
+    """Returns the bytes of a source file and the version they are, which collect_sources collects."""
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    version = SourceVersion(stat.st_size, stat.st_mtime_ns, hash_bytes(data))
+    sources = _read_sources.get()
+    if sources is not None:
+        sources.setdefault(path, version)
+    return data, version
+
+def note_source(path: str):
+    """Collects the version of a source about to be read in pieces, if collect_sources is collecting."""
+    sources = _read_sources.get()
+    if sources is not None and path not in sources:
+        sources[path] = source_version(path)
+
+def remove_output(path: str, output_root: str):
+    """Deletes a generated file and any directories it leaves empty below output_root."""
+    os.remove(path)
+
+    root = os.path.abspath(output_root)
+    directory = os.path.dirname(os.path.abspath(path))
+    while directory.startswith(root + os.sep) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+class BuildManifest:
+    """
+    Records, for every generated page, the inputs it was rendered from so an
+    incremental build can skip pages whose inputs have not changed.
+
+    Entries are keyed by output path and hold the source path, source hash,
+    template hash, basepath and generator version. The source's size and
+    mtime are stored as well so unchanged files never need to be re-hashed.
+
+    Each entry also lists its dependencies, the files it was built from
+    (its Markdown, the template and everything the template includes, the
+    static files it references, the pages shown on a listing), and why it
+    was last rebuilt. The reverse index from every dependency to the
+    outputs built from it is saved with the manifest, so stale() finds the
+    outputs affected by a set of changed files without visiting the others.
+    """
+
+    def __init__(self, path: str = MANIFEST_FILE):
+        self.path = path
+        self.entries = {}
+        self.assets = set()
+        self.seen = set()
+        self.reasons = {}
+        self.dependents = {}
+        self.template_hash = None
+        self.template_files = {}
+        self.template_urls = []
+        self.basepath = None
+        self.static_dir = None
+        # False until a manifest written by this generator version is read
+        self.loaded = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            logger.info("Ignoring unreadable manifest: %s", self.path)
+            return
+
+        # A manifest written by another generator version cannot be trusted
+        if data.get("generator_version") != GENERATOR_VERSION:
+            return
+
+        self.entries = data.get("pages", {})
+        self.assets = set(data.get("assets", []))
+        self.dependents = data.get("dependents") or self._index_dependents()
+        self.loaded = True
+
+    def _index_dependents(self) -> dict[str, list[str]]:
+        dependents = {}
+        for output_path, entry in self.entries.items():
+            for path in entry.get("dependencies", {}):
+                dependents.setdefault(path, []).append(output_path)
+        return {path: sorted(outputs) for path, outputs in dependents.items()}
+
+    def save(self):
+        self.dependents = self._index_dependents()
+        data = {
+            "generator_version": GENERATOR_VERSION,
+            "pages": self.entries,
+            "assets": sorted(self.assets),
+            "dependents": self.dependents,
+        }
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def begin(self, template_path: str, basepath: str, static_dir: str | None = None):
+        # Covers the template's includes and layouts, not just the file itself
+        template = load_template(template_path)
+        self.template_hash = template.hash
+        self.template_files = {os.path.relpath(path): content_hash for path, (_, content_hash) in template.dependencies.items()}
+        # The template's own links are on every page
+        self.template_urls = ASSET_ATTRIBUTE.findall("".join(template.literals))
+        self.basepath = basepath
+        self.static_dir = static_dir
+        self.seen = set()
+        self.reasons = {}
+
+    def is_fresh(self, source_path: str, output_path: str) -> bool:
+        self.seen.add(output_path)
+
+        reason = self._stale_reason(source_path, output_path)
+        if reason is None:
+            return True
+
+        # Kept until the page is recorded, for 'main.py explain'
+        self.reasons[output_path] = reason
+        return False
+
+    def _stale_reason(self, source_path: str, output_path: str) -> str | None:
+        entry = self.entries.get(output_path)
+        if entry is None or entry["source_path"] is None:
+            return "new page"
+        if not os.path.exists(output_path):
+            return "output was missing"
+        if entry["source_path"] != source_path:
+            return f"source moved from {entry['source_path']}"
+        if entry["generator_version"] != GENERATOR_VERSION:
+            return "generator version changed"
+        if entry["basepath"] != self.basepath:
+            return f"basepath changed from {entry['basepath']} to {self.basepath}"
+        if entry["template_hash"] != self.template_hash:
+            recorded = entry.get("template_files", {})
+            changed = sorted(path for path in set(recorded) | set(self.template_files) if recorded.get(path) != self.template_files.get(path))
+            return f"template changed: {', '.join(changed)}" if changed else "template changed"
+
+        stat = os.stat(source_path)
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return None
+
+        # Metadata changed (touch, checkout...), fall back to the content hash
+        if hash_file(source_path) != entry["source_hash"]:
+            return f"source changed: {source_path}"
+
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return None
+
+    def record(self, source_path: str, output_path: str, urls: Iterable[str] | None = None, version: SourceVersion | None = None):
+        """
+        Records the page generated from source_path. urls are the link and
+        image URLs the renderer put in its content, or None if the content
+        came from a cache, in which case the static files recorded for the
+        same source by an earlier build are kept. version is the source as
+        it was read for rendering; without it the file is looked at now,
+        which misses a save made while the page was being rendered.
+        """
+        size, mtime_ns, source_hash = version or source_version(source_path)
+        self.seen.add(output_path)
+
+        dependencies = {os.path.relpath(source_path): "source"}
+        dependencies.update((path, "template") for path in self.template_files)
+        dependencies.update((path, "asset") for path in self._assets_used(output_path, source_hash, urls))
+
+        self.entries[output_path] = {
+            "source_path": source_path,
+            "source_hash": source_hash,
+            "template_hash": self.template_hash,
+            "template_files": self.template_files,
+            "basepath": self.basepath,
+            "generator_version": GENERATOR_VERSION,
+            "output_path": output_path,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "dependencies": dependencies,
+            "reason": self.reasons.pop(output_path, "rebuilt"),
+        }
+
+    def record_listing(self, output_path: str, query: str, sources: list[str], reason: str | None):
+        """
+        Records a page generated from the site database, like a tag page:
+        the query it lists and the pages it shows. reason is None when the
+        listing was up to date and kept from an earlier build.
+        """
+        self.seen.add(output_path)
+        previous = self.entries.get(output_path)
+        if reason is None:
+            reason = previous["reason"] if previous is not None else "rebuilt"
+
+        dependencies = {os.path.relpath(source): "listed page" for source in sources}
+        dependencies.update((path, "template") for path in self.template_files)
+        self.entries[output_path] = {
+            "source_path": None,
+            "query": query,
+            "template_hash": self.template_hash,
+            "template_files": self.template_files,
+            "basepath": self.basepath,
+            "generator_version": GENERATOR_VERSION,
+            "output_path": output_path,
+            "dependencies": dependencies,
+            "reason": reason,
+        }
+
+    def _assets_used(self, output_path: str, source_hash: str, urls: Iterable[str] | None) -> set[str]:
+        """Returns the static files (as paths below static_dir) that the template and urls link to."""
+        if self.static_dir is None or not self.assets:
+            return set()
+
+        if urls is None:
+            previous = self.entries.get(output_path)
+            if previous is not None and previous.get("source_hash") == source_hash:
+                return {path for path, kind in previous["dependencies"].items() if kind == "asset"}
+            urls = ()
+
+        used = set()
+        for url in itertools.chain(self.template_urls, urls):
+            # Static files are linked by site-absolute URLs, which the basepath is put in front of
+            if not url.startswith("/") or url.startswith("//"):
+                continue
+            relative_path = os.path.normpath(url[1:].partition("#")[0].partition("?")[0])
+            if relative_path in self.assets:
+                used.add(os.path.relpath(os.path.join(self.static_dir, relative_path)))
+        return used
+
+    def stale(self, changed_paths: list[str]) -> dict[str, list[tuple[str, str]]]:
+        """
+        Returns the outputs that depend on any of changed_paths, with the
+        (changed path, kind) that affects each. Only the reverse index
+        entries of the changed paths are looked at. Static files are left
+        out, since pages keep linking to them unchanged; the static sync
+        copies them on its own.
+        """
+        stale = {}
+        for changed_path in changed_paths:
+            path = os.path.relpath(changed_path)
+            for output_path in self.dependents.get(path, []):
+                kind = self.entries[output_path]["dependencies"][path]
+                if kind in INVALIDATING_KINDS:
+                    stale.setdefault(output_path, []).append((path, kind))
+        return stale
+
+    def prune(self, output_root: str, listings: bool = False) -> list[str]:
+        """
+        Deletes outputs below output_root whose sources were not seen in this
+        build. Listings are only deleted when listings is True, meaning this
+        build generated them; otherwise they are left to the next build that does.
+        """
+        removed = []
+        # Pages written to another output directory, like a shard's, belong to other builds
+        root = os.path.join(os.path.normpath(output_root), "")
+        unseen = [
+            output_path for output_path in set(self.entries) - self.seen
+            if os.path.normpath(output_path).startswith(root) and (listings or self.entries[output_path]["source_path"] is not None)
+        ]
+
+        for output_path in sorted(unseen):
+            del self.entries[output_path]
+
+            if os.path.exists(output_path):
+                logger.info("Removing stale page %s", output_path)
+                remove_output(output_path, output_root)
+                removed.append(output_path)
+
+        return removed
@@ -1,26 +1,15 @@
 from htmlnode import HtmlNode
-from leafnode import LeafNode
+# A module import, since serializer imports this module back for ParentNode
+import serializer
 
 class ParentNode(HtmlNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
     def to_html(self):
-        if not self.tag:
-            raise ValueError("Parent nodes must have a tag")
-        
-        if not self.children:
-            raise ValueError("Parent nodes must have children")
-        
-        props_str = f" {self.props_to_html()}" if self.props is not None else ""
-        html = f"<{self.tag}{props_str}>"
-        for child in self.children:
-            if isinstance(child, HtmlNode):
-                html += child.to_html() 
-            else:
-                html += str(child)
-        html += f"</{self.tag}>"
-        return html
+        return serializer.render_html(self)
     
     def __repr__(self):
         return f"ParentNode({self.tag}, {self.children}, {self.props})"
@@ -0,0 +1,61 @@
+import hashlib
+import marshal
+import os
+from collections.abc import Iterable
+from manifest import GENERATOR_VERSION
+from rendercache import RenderCache
+
+# Used by incremental builds when no directory is given
+PARSE_CACHE_DIR = ".parse-cache"
+# Bumped when what an entry holds changes, so older entries are never read
+ENTRY_FORMAT = 2
+
+class ParseCache(RenderCache):
+    """
+    A directory of the content HTML rendered from cleaned markdown, with the
+    link and image URLs rendered into it, keyed by
+    the hash of the markdown and the generator version only. The template
+    and the basepath are applied afterwards by fill_template, so after a
+    template or basepath change every page whose markdown is unchanged skips
+    parsing and rendering and is only filled in and written.
+
+    Entries are marshal-encoded, the fastest format the standard library
+    loads, and share the render cache's atomic writes and LRU eviction.
+    """
+
+    suffix = ".bin"
+
+    def __getstate__(self) -> dict:
+        # Worker processes get their own copy, count only their own lookups and report them back
+        state = super().__getstate__()
+        state["hits"] = state["misses"] = 0
+        return state
+
+    def key(self, markdown: str) -> str:
+        # The marshal format can change between Python versions
+        digest = hashlib.sha256(f"{GENERATOR_VERSION}\0{marshal.version}\0{ENTRY_FORMAT}\0".encode())
+        digest.update(markdown.encode())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> tuple[str, tuple[str, ...]] | None:
+        """Returns the cached content HTML and its URLs, or None if they aren't cached."""
+        entry_path = self.path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                entry = marshal.load(f)
+            os.utime(entry_path)
+        except FileNotFoundError:
+            self.record(False)
+            return None
+
+        self.record(True)
+        return entry
+
+    def save(self, key: str, html: str, urls: Iterable[str] = ()):
+        entry = (html, tuple(urls))
+        self._store(key, "wb", lambda f: marshal.dump(entry, f))
+
+    def add_counts(self, hits: int, misses: int):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
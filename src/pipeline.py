@@ -0,0 +1,176 @@
+import logging
+import os
+import queue
+import threading
+from typing import Callable, Iterable
+from application import PageGenerationError, fetch_page, generate_page, is_streamed, iter_pages, render_source, store_page
+from helpers import collect_urls
+from manifest import BuildManifest, SourceVersion, collect_sources
+from parsecache import ParseCache
+from rendercache import RenderCache
+from template import load_template
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Readers and writers mostly wait on the filesystem, so a few of each keep it busy
+IO_THREADS = 4
+QUEUE_SIZE = 64
+
+_DONE = object()
+
+class StageError(Exception):
+    def __init__(self, stage: str, item: object, error: Exception):
+        super().__init__(f"{stage} stage failed: {error}")
+        self.stage = stage
+        self.item = item
+        self.error = error
+
+def run_pipeline(items: Iterable, stages: list[tuple[str, Callable, int]], queue_size: int = QUEUE_SIZE):
+    """
+    Streams items through stages, given as (name, function, workers). Each
+    stage runs on its own worker threads and hands what its function returns
+    to the next stage through a queue holding at most queue_size items, so
+    memory stays flat however many items there are and a slow stage holds
+    back the ones before it. Returning None drops an item. The first error
+    stops the pipeline and is raised as a StageError once every thread is
+    done.
+    """
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(queue_size) for _ in stages]
+    remaining = [workers for name, function, workers in stages]
+    lock = threading.Lock()
+
+    def put(outbox: queue.Queue, item: object):
+        # Once stopping, downstream workers only drain, so results can be dropped
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def work(index: int):
+        name, function, workers = stages[index]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+
+        try:
+            while (item := inbox.get()) is not _DONE:
+                if stop.is_set():
+                    continue
+                try:
+                    result = function(item)
+                except Exception as e:
+                    with lock:
+                        errors.append(StageError(name, item, e))
+                    stop.set()
+                    continue
+                if result is not None and outbox is not None:
+                    put(outbox, result)
+        finally:
+            with lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            # The last worker of a stage tells every worker of the next one to finish
+            if last and outbox is not None:
+                for _ in range(stages[index + 1][2]):
+                    outbox.put(_DONE)
+
+    threads = [
+        threading.Thread(target=work, args=(index,), name=f"{name}-{worker}", daemon=True)
+        for index, (name, function, workers) in enumerate(stages)
+        for worker in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for item in items:
+            if stop.is_set():
+                break
+            put(queues[0], item)
+    finally:
+        for _ in range(stages[0][2]):
+            queues[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+def generate_pages_pipeline(basepath: str, dir_path_content: str, template_path: str, dest_dir_path: str, render_workers: int = 1, manifest: BuildManifest | None = None, fast: bool = False, cache: RenderCache | None = None, pages: Iterable[tuple[str, str]] | None = None, io_threads: int = IO_THREADS, parsed: ParseCache | None = None):
+    """
+    Generates the same pages as generate_pages_recursive as a streaming
+    pipeline: pages are discovered lazily, read, rendered and written by
+    separate stages built from generate_page's own steps, so reading and
+    writing overlap with rendering. Pages generate_page would stream are
+    generated whole by the render stage.
+    """
+    logger.info("Generating pages from directory %s with %s readers, %s renderers and %s writers", dir_path_content, io_threads, render_workers, io_threads)
+
+    # The manifest is shared by every stage
+    lock = threading.Lock()
+    template = load_template(template_path)
+
+    def read(page: tuple[str, str]) -> tuple | None:
+        source, output = page
+        if manifest is not None:
+            with lock:
+                if manifest.is_fresh(source, output):
+                    logger.info("Skipping unchanged page: %s", source)
+                    return None
+
+        if is_streamed(source):
+            return source, output, None, None, None
+
+        with tracing.page(source), collect_urls() as rendered, collect_sources() as sources:
+            fetched = fetch_page(basepath, source, template, output, cache)
+        if cache is not None:
+            cache.record(fetched is None)
+        if fetched is None:
+            logger.info("Page copied from the render cache to %s", output)
+            record(source, output, rendered.known(), sources.get(source))
+            return None
+
+        data, key = fetched
+        return source, output, key, data, sources.get(source)
+
+    def render(item: tuple) -> tuple:
+        source, output, key, data, version = item
+        if data is None:
+            # Never held in memory whole, so read, rendered and written here in one go
+            with collect_urls() as rendered, collect_sources() as sources:
+                from_cache = generate_page(basepath, source, template_path, output, fast, cache, parsed)
+            if cache is not None:
+                cache.record(from_cache)
+            return source, output, None, None, rendered.known(), sources.get(source)
+
+        logger.info("Generating page from %s to %s using %s", source, output, template_path)
+        with tracing.page(source), collect_urls() as rendered:
+            page = render_source(basepath, data, template, fast, parsed)
+        return source, output, key, page, rendered.known(), version
+
+    def write(item: tuple):
+        source, output, key, page, urls, version = item
+        if page is not None:
+            with tracing.page(source):
+                store_page(output, page, cache, key)
+            logger.info("Page generated at %s", output)
+        record(source, output, urls, version)
+
+    def record(source: str, output: str, urls: set[str] | None, version: SourceVersion | None):
+        if manifest is not None:
+            with lock:
+                manifest.record(source, output, urls, version)
+
+    os.makedirs(dest_dir_path, exist_ok=True)
+    stages = [("read", read, io_threads), ("render", render, render_workers), ("write", write, io_threads)]
+
+    try:
+        run_pipeline(iter_pages(dir_path_content, dest_dir_path) if pages is None else pages, stages)
+    except StageError as e:
+        raise PageGenerationError(e.item[0], e.error) from e.error
+
+    logger.info("Finished generating pages from directory: %s", dir_path_content)
@@ -0,0 +1,186 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import IO, Callable
+from manifest import GENERATOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+STATS_FILE = "stats.json"
+# Temporary files this old were left behind by a build that crashed
+STALE_TMP_SECONDS = 3600
+
+class RenderCache:
+    """
+    A directory of rendered pages keyed by the hash of everything a page
+    depends on: its markdown bytes, the template hash, the basepath and the
+    generator version. Nothing in the key depends on the working tree, so
+    the directory can be shared between checkouts, branches, CI runs and
+    machines.
+
+    Entries are written to a temporary file and renamed into place, so
+    concurrent builds never see a partial page. Every hit refreshes the
+    entry's mtime, and evict() deletes the least recently used entries once
+    the directory grows past max_bytes.
+    """
+
+    suffix = ".html"
+
+    def __init__(self, root: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def __getstate__(self) -> dict:
+        # Sent to worker processes, which only look entries up and store them
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def key(self, markdown: bytes, template_hash: str, basepath: str) -> str:
+        digest = _key_digest(template_hash, basepath)
+        digest.update(markdown)
+        return digest.hexdigest()
+
+    def key_file(self, markdown_path: str, template_hash: str, basepath: str) -> str:
+        """Same key as key(), hashing the markdown file in chunks instead of reading it whole."""
+        digest = _key_digest(template_hash, basepath)
+        with open(markdown_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key[2:]}{self.suffix}")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copies the cached page to output_path. Returns False if it isn't cached."""
+        entry_path = self.path(key)
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            shutil.copyfile(entry_path, output_path)
+            os.utime(entry_path)
+        except FileNotFoundError:
+            # Never cached, or evicted by another build in the meantime
+            return False
+        return True
+
+    def store(self, key: str, page: str):
+        self._store(key, "w", lambda f: f.write(page))
+
+    def store_file(self, key: str, page_path: str):
+        """Stores the page already written at page_path without reading it into memory."""
+        with open(page_path, "rb") as page:
+            self._store(key, "wb", lambda f: shutil.copyfileobj(page, f))
+
+    def _store(self, key: str, mode: str, write: Callable[[IO], object]):
+        entry_path = self.path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry_path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, entry_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def record(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evict(self) -> int:
+        """Deletes the least recently used entries until the cache fits in max_bytes. Returns how many."""
+        entries = []
+        total = 0
+        now = time.time()
+
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                if entry.name.startswith(".tmp-"):
+                    if now - stat.st_mtime > STALE_TMP_SECONDS:
+                        _remove(entry.path)
+                    continue
+
+                entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        # Evict down to 90% so the next builds don't have to evict again right away
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for mtime_ns, entry_path, size in sorted(entries):
+            if total <= target:
+                break
+            _remove(entry_path)
+            total -= size
+            evicted += 1
+
+        return evicted
+
+    def save_stats(self, evicted: int = 0) -> dict:
+        """Adds this build's counts to the totals kept in the cache directory and returns the totals."""
+        lock_path = os.path.join(self.root, ".stats.lock")
+        stats_path = os.path.join(self.root, STATS_FILE)
+
+        with open(lock_path, "w") as lock:
+            # Builds sharing the cache update the totals one at a time
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(stats_path, "r") as f:
+                    totals = json.load(f)
+            except (OSError, ValueError):
+                totals = {}
+
+            for name, count in (("hits", self.hits), ("misses", self.misses), ("evictions", evicted)):
+                totals[name] = totals.get(name, 0) + count
+
+            tmp_path = f"{stats_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(totals, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, stats_path)
+
+        return totals
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+def _key_digest(template_hash: str, basepath: str):
+    return hashlib.sha256(f"{GENERATOR_VERSION}\0{template_hash}\0{basepath}\0".encode())
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        # Another build sharing the cache got there first
+        pass
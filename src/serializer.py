@@ -0,0 +1,68 @@
+import html
+from typing import Iterator, TextIO
+from htmlnode import HtmlNode
+from leafnode import LeafNode
+# parentnode imports this module too, ParentNode is looked up when serializing
+import parentnode
+
+def _props_to_html(props: dict, escape: bool) -> str:
+    if not escape:
+        return ' '.join(f'{key}="{str(value)}"' for key, value in props.items())
+    return ' '.join(f'{key}="{html.escape(str(value))}"' for key, value in props.items())
+
+def _leaf_to_html(node: LeafNode, escape: bool) -> str:
+    if node.value is None:
+        raise ValueError("All leaf nodes must have a value")
+
+    value = html.escape(node.value, quote=False) if escape else node.value
+    if not node.tag:
+        return value
+
+    props_str = f" {_props_to_html(node.props, escape)}" if node.props else ""
+    return f"<{node.tag}{props_str}>{value}</{node.tag}>"
+
+def iter_html(node: HtmlNode, escape: bool = False) -> Iterator[str]:
+    """
+    Yields the HTML of a node tree as fragments, walking it with an explicit
+    stack so deep trees never hit the recursion limit.
+
+    With escape=False the fragments join to exactly what to_html() returns.
+    With escape=True text is HTML-escaped and attribute values are quoted.
+    Builds don't escape: markdown may contain inline HTML, and the tree
+    renderer must emit the same HTML as markdown_to_html.
+    """
+    # Pending nodes, and already rendered fragments such as closing tags
+    stack = [node]
+
+    while stack:
+        item = stack.pop()
+
+        if isinstance(item, str):
+            yield item
+        elif isinstance(item, LeafNode) and type(item).to_html is LeafNode.to_html:
+            yield _leaf_to_html(item, escape)
+        elif isinstance(item, parentnode.ParentNode) and type(item).to_html is parentnode.ParentNode.to_html:
+            if not item.tag:
+                raise ValueError("Parent nodes must have a tag")
+
+            if not item.children:
+                raise ValueError("Parent nodes must have children")
+
+            props_str = f" {_props_to_html(item.props, escape)}" if item.props is not None else ""
+            yield f"<{item.tag}{props_str}>"
+
+            stack.append(f"</{item.tag}>")
+            for child in reversed(item.children):
+                if isinstance(child, HtmlNode):
+                    stack.append(child)
+                else:
+                    stack.append(html.escape(str(child), quote=False) if escape else str(child))
+        else:
+            # Node types with their own to_html() render themselves
+            yield item.to_html()
+
+def render_html(node: HtmlNode, escape: bool = False) -> str:
+    return "".join(iter_html(node, escape))
+
+def write_html(node: HtmlNode, file: TextIO, escape: bool = False):
+    file.writelines(iter_html(node, escape))
@@ -0,0 +1,82 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+from application import configure_logging
+
+logger = logging.getLogger(__name__)
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """Parses "K/N", the K-th of N shards counting from 1."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like K/N, not {text!r}")
+
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Shard {text} is out of range, K must be between 1 and N")
+    return index, count
+
+def _list_files(root: str) -> list[str]:
+    relative_paths = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        relative_dir = os.path.relpath(dir_path, root)
+        relative_paths.extend(os.path.normpath(os.path.join(relative_dir, name)) for name in sorted(file_names))
+    return relative_paths
+
+def merge_shards(static_dir: str, shard_dirs: list[str], output_dir: str) -> int:
+    """
+    Combines the static files and the pages rendered by every shard into
+    output_dir. Raises ValueError, before anything is written, if two of them
+    contain the same path. Returns the number of files merged.
+    """
+    written = {}
+    duplicates = []
+
+    for root in [static_dir, *shard_dirs]:
+        for relative_path in _list_files(root):
+            if relative_path in written:
+                duplicates.append(f"{relative_path} ({written[relative_path]} and {root})")
+            else:
+                written[relative_path] = root
+
+    if duplicates:
+        raise ValueError(f"These paths were written more than once: {', '.join(duplicates)}")
+
+    if os.path.exists(output_dir):
+        logger.info("Removing contents from %s", output_dir)
+        shutil.rmtree(output_dir)
+
+    for relative_path, root in written.items():
+        dest_path = os.path.join(output_dir, relative_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        shutil.copy2(os.path.join(root, relative_path), dest_path)
+
+    return len(written)
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="main.py merge", description="Merge the outputs of sharded builds and the static files into one site")
+    parser.add_argument("shard_dirs", nargs="+", metavar="SHARD_DIR", help="output directories of the 'main.py --shard K/N' builds")
+    parser.add_argument("--static-dir", default="static", help="static files to include (default: static)")
+    parser.add_argument("--output-dir", default="docs", help="directory the site is merged into (default: docs)")
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging()
+
+    for directory in [args.static_dir, *args.shard_dirs]:
+        if not os.path.isdir(directory):
+            logger.error("Error, directory does not exist: %s", directory)
+            # A deploy step must not publish a partial site
+            sys.exit(1)
+
+    try:
+        count = merge_shards(args.static_dir, args.shard_dirs, args.output_dir)
+    except ValueError as e:
+        logger.error("Error, cannot merge shards: %s", e)
+        sys.exit(1)
+
+    logger.info("Merged %s files from %s shards into %s", count, len(args.shard_dirs), args.output_dir)
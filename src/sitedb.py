@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+from application import PageGenerationError, clean_markdown, extract_title, iter_pages
+from frontmatter import split_front_matter
+from helpers import BlockType, extract_markdown_images, extract_markdown_links, iter_blocks
+from manifest import hash_bytes
+
+logger = logging.getLogger(__name__)
+
+SITE_DB = ".site-metadata.sqlite"
+# Bumped whenever the tables change, older databases are rebuilt from scratch
+SCHEMA_VERSION = 2
+# Raw HTML passes through the renderer, so its ids and names are anchors too
+ANCHOR_ATTRIBUTE = re.compile(r'\b(?:id|name)="([^"]+)"')
+
+SCHEMA = """
+CREATE TABLE pages (
+    source TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT,
+    modified TEXT NOT NULL,
+    draft INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE tags (
+    source TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (source, tag)
+);
+CREATE INDEX tags_by_tag ON tags (tag);
+CREATE TABLE links (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    image INTEGER NOT NULL
+);
+CREATE INDEX links_by_source ON links (source);
+CREATE TABLE anchors (
+    source TEXT NOT NULL,
+    anchor TEXT NOT NULL,
+    PRIMARY KEY (source, anchor)
+);
+CREATE TABLE collections (
+    output TEXT PRIMARY KEY,
+    signature TEXT NOT NULL
+);
+"""
+
+def page_url(output: str) -> str:
+    """Returns the site-absolute URL of an output path relative to the site root, "/blog/tom/" for "blog/tom/index.html"."""
+    url = "/" + output.replace(os.sep, "/")
+    return url[:-len("index.html")] if url.endswith("/index.html") else url
+
+def extract_anchors(markdown: str) -> set[str]:
+    """Returns the ids and names set by the raw HTML in markdown, the anchors a link to the page can point at."""
+    return set(ANCHOR_ATTRIBUTE.findall(markdown))
+
+def extract_links(markdown: str) -> list[tuple[str, bool]]:
+    """Returns the (url, is image) of every link and image in markdown without front matter, outside code blocks."""
+    links = []
+    for block_type, block in iter_blocks(markdown):
+        if block_type == BlockType.CODE:
+            continue
+        links.extend((url, True) for _, url in extract_markdown_images(block))
+        links.extend((url, False) for _, url in extract_markdown_links(block))
+    return links
+
+class SiteDatabase:
+    """
+    A SQLite index of every page: where it is written, its title, dates,
+    tags, content hash, outgoing links and anchors. update() only reads the files
+    whose size or mtime changed since the last build, so listings, tag
+    pages, the sitemap and the feed are produced from the index without
+    parsing every page again.
+    """
+
+    def __init__(self, path: str = SITE_DB):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                for table in ("pages", "tags", "links", "anchors", "collections"):
+                    self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+                self.connection.executescript(SCHEMA)
+                self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, dir_path_content: str) -> tuple[int, int]:
+        """Brings the index in line with the pages below dir_path_content. Returns how many pages changed and were removed."""
+        known = {row["source"]: (row["mtime_ns"], row["size"]) for row in self.connection.execute("SELECT source, mtime_ns, size FROM pages")}
+        changed = 0
+
+        with self.connection:
+            for source, output in iter_pages(dir_path_content, ""):
+                stat = os.stat(source)
+                if known.pop(source, None) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                try:
+                    self._index_page(source, output, stat)
+                except (OSError, ValueError) as e:
+                    raise PageGenerationError(source, e) from e
+                changed += 1
+
+            for source in known:
+                self._delete_page(source)
+
+        return changed, len(known)
+
+    def _index_page(self, source: str, output: str, stat: os.stat_result):
+        with open(source, "rb") as f:
+            data = f.read()
+        markdown = clean_markdown(data.decode().replace("\r\n", "\n").replace("\r", "\n"))
+        metadata, body = split_front_matter(markdown)
+        metadata["title"] = extract_title(markdown)
+        modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(timespec="seconds")
+
+        self._delete_page(source)
+        self.connection.execute(
+            "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                source, output, page_url(output), metadata["title"], metadata.get("date"), modified,
+                int(metadata.get("draft", False)), hash_bytes(data), stat.st_mtime_ns, stat.st_size, json.dumps(metadata),
+            ),
+        )
+        self.connection.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)", ((source, tag) for tag in metadata.get("tags", [])))
+        self.connection.executemany("INSERT INTO links VALUES (?, ?, ?)", ((source, url, int(image)) for url, image in extract_links(body)))
+        self.connection.executemany("INSERT INTO anchors VALUES (?, ?)", ((source, anchor) for anchor in extract_anchors(body)))
+
+    def _delete_page(self, source: str):
+        for table in ("pages", "tags", "links", "anchors"):
+            self.connection.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+
+    def pages(self, drafts: bool = False, prefix: str = "") -> list[sqlite3.Row]:
+        """Returns the pages whose URL starts with prefix, newest first."""
+        return self.connection.execute(
+            "SELECT * FROM pages WHERE url LIKE ? ESCAPE '\\' AND (? OR NOT draft) ORDER BY COALESCE(date, modified) DESC, url",
+            (prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%", drafts),
+        ).fetchall()
+
+    def tags(self, drafts: bool = False) -> dict[str, list[sqlite3.Row]]:
+        """Returns the pages of every tag, newest first."""
+        tagged = {}
+        rows = self.connection.execute(
+            "SELECT tags.tag, pages.* FROM tags JOIN pages USING (source) WHERE ? OR NOT pages.draft ORDER BY tags.tag, COALESCE(date, modified) DESC, url",
+            (drafts,),
+        )
+        for row in rows:
+            tagged.setdefault(row["tag"], []).append(row)
+        return tagged
+
+    def links(self, source: str | None = None) -> list[sqlite3.Row]:
+        """Returns the outgoing links of source, or of every page."""
+        if source is None:
+            return self.connection.execute("SELECT * FROM links ORDER BY source").fetchall()
+        return self.connection.execute("SELECT * FROM links WHERE source = ?", (source,)).fetchall()
+
+    def anchors(self) -> dict[str, set[str]]:
+        """Returns the anchors of every page that has any, by source."""
+        anchors = {}
+        for row in self.connection.execute("SELECT source, anchor FROM anchors"):
+            anchors.setdefault(row["source"], set()).add(row["anchor"])
+        return anchors
+
+    def collection_signature(self, output: str) -> str | None:
+        row = self.connection.execute("SELECT signature FROM collections WHERE output = ?", (output,)).fetchone()
+        return row["signature"] if row is not None else None
+
+    def collections(self) -> list[str]:
+        return [row["output"] for row in self.connection.execute("SELECT output FROM collections")]
+
+    def record_collection(self, output: str, signature: str | None):
+        """Remembers the signature a collection page was generated from, or forgets the page if signature is None."""
+        with self.connection:
+            if signature is None:
+                self.connection.execute("DELETE FROM collections WHERE output = ?", (output,))
+            else:
+                self.connection.execute("INSERT OR REPLACE INTO collections VALUES (?, ?)", (output, signature))
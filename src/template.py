@@ -0,0 +1,206 @@
+import hashlib
+import os
+import re
+from typing import Iterable, Iterator
+
+# {{ Name }} placeholders and {% tag "argument" %} / {% tag name %} statements
+TAG_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}|\{%\s*(\w+)(.*?)%\}")
+# Site-absolute URLs written in the template's own HTML, not protocol-relative ones
+SITE_URL_ATTRIBUTE = re.compile(r'\b(href|src)="/(?!/)')
+
+class Variable:
+    def __init__(self, name: str):
+        self.name = name
+
+class Block:
+    def __init__(self, name: str, children: list):
+        self.name = name
+        self.children = children
+
+class Template:
+    """
+    A template compiled into alternating literal segments and placeholder
+    names, so rendering is a single join. Includes are inlined and layout
+    inheritance is resolved at compile time.
+    """
+
+    def __init__(self, path: str, literals: list[str], names: list[str], dependencies: dict[str, tuple]):
+        self.path = path
+        self.literals = literals
+        self.names = names
+        # absolute path -> (stat key, content hash) of every file the template was built from
+        self.dependencies = dependencies
+
+        root = os.path.dirname(os.path.abspath(path))
+        digest = hashlib.sha256()
+        for dependency in sorted(dependencies, key=lambda dependency: os.path.relpath(dependency, root)):
+            digest.update(f"{os.path.relpath(dependency, root)}:{dependencies[dependency][1]}\n".encode())
+        self.hash = digest.hexdigest()
+        self.rebased_templates = {}
+
+    def rebased(self, basepath: str) -> "Template":
+        """
+        Returns this template with basepath in place of the leading slash of
+        the href and src URLs written in it, compiled once per basepath.
+        Values filled into it are left alone.
+        """
+        template = self.rebased_templates.get(basepath)
+        if template is None:
+            literals = [SITE_URL_ATTRIBUTE.sub(lambda match: f'{match.group(1)}="{basepath}', literal) for literal in self.literals]
+            template = Template(self.path, literals, self.names, self.dependencies)
+            self.rebased_templates[basepath] = template
+        return template
+
+    def render(self, context: dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for name, literal in zip(self.names, self.literals[1:]):
+            parts.append(context.get(name, ""))
+            parts.append(literal)
+        return "".join(parts)
+
+    def stream(self, context: dict[str, str | Iterable[str]]) -> Iterator[str]:
+        """
+        Yields the rendered template piece by piece. A value can be an
+        iterable of chunks, which are passed through without being joined.
+        """
+        yield self.literals[0]
+        for name, literal in zip(self.names, self.literals[1:]):
+            value = context.get(name, "")
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+            yield literal
+
+    def is_stale(self) -> bool:
+        return any(_stat_key(dependency) != key for dependency, (key, _) in self.dependencies.items())
+
+class TemplateLoader:
+    """Caches compiled templates and recompiles them only when one of their files changes."""
+
+    def __init__(self):
+        self.templates = {}
+
+    def load(self, path: str) -> Template:
+        template = self.templates.get(path)
+        if template is None or template.is_stale():
+            template = compile_template(path)
+            self.templates[path] = template
+        return template
+
+def _stat_key(path: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _parse_file(path: str, stack: tuple[str, ...], dependencies: dict[str, tuple]) -> tuple[str | None, list]:
+    if path in stack:
+        raise ValueError(f"Template include cycle: {' -> '.join(stack + (path,))}")
+
+    # Stat before reading so a concurrent edit is picked up by the next staleness check
+    stat_key = _stat_key(path)
+    with open(path, "r") as f:
+        text = f.read()
+    dependencies[path] = (stat_key, hashlib.sha256(text.encode()).hexdigest())
+
+    directory = os.path.dirname(path)
+    extends = None
+    nodes = []
+    current = nodes
+    open_blocks = []
+    position = 0
+
+    for match in TAG_PATTERN.finditer(text):
+        if match.start() > position:
+            current.append(text[position:match.start()])
+        position = match.end()
+
+        if match.group(1):
+            current.append(Variable(match.group(1)))
+            continue
+
+        tag = match.group(2)
+        argument = match.group(3).strip().strip('"') or None
+        if tag in ("include", "extends", "block") and argument is None:
+            raise ValueError(f"'{tag}' needs an argument in template: {path}")
+
+        if tag == "include":
+            included_path = os.path.join(directory, argument)
+            current.extend(_compile_nodes(included_path, stack + (path,), dependencies))
+        elif tag == "extends":
+            if extends is not None or any(not isinstance(node, str) or node.strip() for node in nodes):
+                raise ValueError(f"'extends' must be the first tag in template: {path}")
+            extends = os.path.join(directory, argument)
+        elif tag == "block":
+            block = Block(argument, [])
+            current.append(block)
+            open_blocks.append(current)
+            current = block.children
+        elif tag == "endblock":
+            if not open_blocks:
+                raise ValueError(f"'endblock' without a matching 'block' in template: {path}")
+            current = open_blocks.pop()
+        else:
+            raise ValueError(f"Unknown template tag '{tag}' in template: {path}")
+
+    if open_blocks:
+        raise ValueError(f"Unclosed 'block' in template: {path}")
+
+    if position < len(text):
+        current.append(text[position:])
+
+    return extends, nodes
+
+def _collect_blocks(nodes: list, blocks: dict[str, Block]) -> dict[str, Block]:
+    for node in nodes:
+        if isinstance(node, Block):
+            blocks[node.name] = node
+            _collect_blocks(node.children, blocks)
+    return blocks
+
+def _apply_blocks(nodes: list, overrides: dict[str, Block]) -> list:
+    resolved = []
+    for node in nodes:
+        if isinstance(node, Block):
+            children = overrides[node.name].children if node.name in overrides else node.children
+            resolved.append(Block(node.name, _apply_blocks(children, overrides)))
+        else:
+            resolved.append(node)
+    return resolved
+
+def _compile_nodes(path: str, stack: tuple[str, ...], dependencies: dict[str, tuple]) -> list:
+    path = os.path.abspath(path)
+    extends, nodes = _parse_file(path, stack, dependencies)
+    if extends is None:
+        return nodes
+
+    # A child template only contributes its blocks, everything else is ignored
+    parent_nodes = _compile_nodes(extends, stack + (path,), dependencies)
+    return _apply_blocks(parent_nodes, _collect_blocks(nodes, {}))
+
+def _flatten(nodes: list, literals: list[str], names: list[str]):
+    for node in nodes:
+        if isinstance(node, str):
+            literals[-1] += node
+        elif isinstance(node, Variable):
+            names.append(node.name)
+            literals.append("")
+        else:
+            _flatten(node.children, literals, names)
+
+def compile_template(path: str) -> Template:
+    dependencies = {}
+    nodes = _compile_nodes(path, (), dependencies)
+
+    literals = [""]
+    names = []
+    _flatten(nodes, literals, names)
+
+    return Template(path, literals, names, dependencies)
+
+default_loader = TemplateLoader()
+
+def load_template(path: str) -> Template:
+    return default_loader.load(path)
@@ -0,0 +1,31 @@
+import os
+import tempfile
+import unittest
+
+class TempDirTestCase(unittest.TestCase):
+    """A test case with a fresh temporary directory, self.root, removed after every test."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        # Runs after the subclass's tearDown, which may still need the files
+        self.addCleanup(self.tmp.cleanup)
+
+    def _path(self, relative_path: str) -> str:
+        return os.path.join(self.root, relative_path)
+
+    def _write(self, relative_path: str, text: str | bytes) -> str:
+        """Writes text, or bytes, to the file as is, without translating newlines, and returns its path."""
+        path = self._path(relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(text, bytes):
+            with open(path, "wb") as f:
+                f.write(text)
+        else:
+            with open(path, "w", newline="") as f:
+                f.write(text)
+        return path
+
+    def _read(self, relative_path: str) -> str:
+        with open(self._path(relative_path)) as f:
+            return f.read()
@@ -1,6 +1,11 @@
+import io
+import logging
 import unittest
+import unittest.mock
+import os
 import textwrap
 from application import *
+from support import TempDirTestCase
 
 class TestApplication(unittest.TestCase):
     
@@ -14,4 +19,178 @@ class TestApplication(unittest.TestCase):
         This is a paragraph of the subsection.
         """)
         title = extract_title(md)
-        self.assertEqual(title, "This Is The Main Title")
\ No newline at end of file
+        self.assertEqual(title, "This Is The Main Title")
+
+
+class TestSyncDirectory(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = self._path("static")
+        self.dest = self._path("docs")
+        self._write("static/index.css", "body {}")
+        self._write("static/images/logo.png", "png")
+
+    def test_sync_copies_new_files(self):
+        synced = sync_directory(self.src, self.dest)
+        self.assertEqual(synced, {"index.css", os.path.join("images", "logo.png")})
+        with open(os.path.join(self.dest, "images", "logo.png")) as f:
+            self.assertEqual(f.read(), "png")
+
+    def test_sync_leaves_unchanged_files_alone(self):
+        sync_directory(self.src, self.dest)
+        dest_css = os.path.join(self.dest, "index.css")
+        os.utime(dest_css, ns=(1, os.stat(dest_css).st_mtime_ns))
+        inode = os.stat(dest_css).st_ino
+
+        sync_directory(self.src, self.dest)
+        self.assertEqual(os.stat(dest_css).st_ino, inode)
+        self.assertEqual(os.stat(dest_css).st_atime_ns, 1)
+
+    def test_sync_copies_changed_files(self):
+        sync_directory(self.src, self.dest)
+        self._write("static/index.css", "body { color: red; }")
+        sync_directory(self.src, self.dest)
+        with open(os.path.join(self.dest, "index.css")) as f:
+            self.assertEqual(f.read(), "body { color: red; }")
+
+    def test_sync_removes_orphans_but_keeps_other_files(self):
+        previous = sync_directory(self.src, self.dest)
+        page = self._write("docs/index.html", "<p>page</p>")
+        os.remove(os.path.join(self.src, "images", "logo.png"))
+
+        synced = sync_directory(self.src, self.dest, previous)
+        self.assertEqual(synced, {"index.css"})
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images")))
+        self.assertTrue(os.path.exists(page))
+
+    def test_unrecorded_assets_leave_out_pages(self):
+        self._write("content/index.md", "# Home")
+        self._write("content/blog/post.md", "# Post")
+        self._write("docs/index.html", "<p>page</p>")
+        self._write("docs/blog/post.html", "<p>post</p>")
+        self._write("docs/images/old.png", "png")
+        self.assertEqual(unrecorded_assets(self.dest, self._path("content")), {os.path.join("images", "old.png")})
+
+class TestConfigureLogging(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger()
+        self.addCleanup(setattr, root, "handlers", root.handlers[:])
+        self.addCleanup(root.setLevel, root.level)
+        root.handlers = []
+
+    def test_leaves_the_callers_handlers_alone(self):
+        root = logging.getLogger()
+        handler = logging.NullHandler()
+        root.addHandler(handler)
+        root.setLevel(logging.ERROR)
+        configure_logging(logging.DEBUG)
+        self.assertEqual(root.handlers, [handler])
+        self.assertEqual(root.level, logging.ERROR)
+
+    def test_calling_again_only_changes_the_level(self):
+        root = logging.getLogger()
+        configure_logging(logging.INFO)
+        handlers = root.handlers[:]
+        configure_logging(logging.WARNING)
+        self.assertEqual(root.handlers, handlers)
+        self.assertEqual(root.level, logging.WARNING)
+
+class TestGeneratePagesParallel(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        self.template = self._write("template.html", "<title>{{ Title }}</title><article>{{ Content }}</article>")
+        self._write("content/index.md", "# Home\n\n[Post](/blog/post)")
+        self._write("content/blog/post/index.md", "# Post\n\n" + "Some **long** text. " * 200)
+        self._write("content/blog/notes.txt", "not markdown")
+
+    def _read_tree(self, root: str) -> dict[str, str]:
+        files = {}
+        for dir_path, _, file_names in os.walk(root):
+            for item in file_names:
+                path = os.path.join(dir_path, item)
+                with open(path) as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_discover_pages(self):
+        pages = discover_pages(self.content, "docs")
+        self.assertEqual(pages, [
+            (os.path.join(self.content, "index.md"), os.path.join("docs", "index.html")),
+            (os.path.join(self.content, "blog", "post", "index.md"), os.path.join("docs", "blog", "post", "index.html")),
+        ])
+
+    def test_parallel_output_matches_serial(self):
+        serial_dir = self._path("serial")
+        parallel_dir = self._path("parallel")
+        generate_pages_recursive("/base/", self.content, self.template, serial_dir)
+        generate_pages_parallel("/base/", self.content, self.template, parallel_dir, 2, executor="thread")
+        self.assertEqual(self._read_tree(parallel_dir), self._read_tree(serial_dir))
+
+    def test_parallel_error_names_source_file(self):
+        self._write("content/broken.md", "# Broken\n\nan `unclosed code span")
+        with self.assertRaises(PageGenerationError) as context:
+            generate_pages_parallel("/", self.content, self.template, self._path("out"), 2, executor="thread")
+        self.assertEqual(context.exception.source_path, os.path.join(self.content, "broken.md"))
+        self.assertIn("broken.md", str(context.exception))
+
+class TestTargets(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        self.template = self._write("template.html", '<link href="/index.css">{{ Content }}')
+        self._write("content/blog/index.md", "# Blog\n\n[Home](/)")
+        self.targets = [("/preview/", self._path("preview")), ("/", self._path("docs"))]
+
+    def test_every_target_gets_its_basepath(self):
+        with unittest.mock.patch("application.render_content", wraps=render_content) as render:
+            generate_pages_parallel(BASEPATH_SLOT, self.content, self.template, self.targets[0][1], 1, executor="thread", targets=self.targets)
+        render.assert_called_once()
+
+        for basepath, directory in self.targets:
+            with open(os.path.join(directory, "blog", "index.html")) as f:
+                self.assertEqual(f.read(), f'<link href="{basepath}index.css"><div><h1>Blog</h1><p><a href="{basepath}">Home</a></p></div>')
+        self.assertEqual(os.listdir(os.path.join(self.targets[0][1], "blog")), ["index.html"])
+
+class TestStreamPage(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = self._write("template.html", '<a href="/">{{ Title }}</a><main>{{ Content }}</main><img src="/logo.png">')
+        self.output = self._path("docs/index.html")
+
+    def test_output_matches_generate_page(self):
+        source = self._write("index.md", "\n  # Title \n\n```\ncode\n  \n\n```\n\n- [a](/a)\n- ![b](/b.png)\n\n> quote\n\n```\nfence  \n\n \n```\n \n")
+        expected = self._path("expected.html")
+        generate_page("/site/", source, self.template, expected)
+        stream_page("/site/", source, self.template, self.output)
+        with open(expected) as f, open(self.output) as g:
+            self.assertEqual(g.read(), f.read())
+
+    def test_errors_leave_no_output(self):
+        for text, message in (("# Title\n\n**open", "Invalid Markdown syntax"), ("# Title\n\n> \n\ntext", "Parent nodes must have children"), ("#", "No title found")):
+            source = self._write("broken.md", text)
+            with self.assertRaisesRegex(ValueError, message):
+                stream_page("/", source, self.template, self.output)
+            self.assertEqual(os.listdir(os.path.dirname(self.output)), [])
+
+    def test_large_pages_are_streamed(self):
+        source = self._write("index.md", "# Title\n\nSome text")
+        with unittest.mock.patch("application.STREAM_THRESHOLD", 1), unittest.mock.patch("application.stream_page") as stream:
+            generate_page("/", source, self.template, self.output)
+        stream.assert_called_once_with("/", source, self.template, self.output)
+
+    def test_only_link_and_image_urls_get_the_basepath(self):
+        source = self._write("index.md", '# Title\n\nSay href="/x" to [a](/a) or [b](//cdn/b)\n\n```\n<img src="/y.png">\n```\n\n![c](/c.png)\x00')
+        for fast in (False, True):
+            page = render_page("/site/", source, self.template, fast)
+            self.assertIn('<p>Say href="/x" to <a href="/site/a">a</a> or <a href="//cdn/b">b</a></p><pre><code><img src="/y.png"></code></pre>', page)
+            self.assertIn('<img src="/site/c.png" alt="c"></img>\ufffd', page)
+            self.assertTrue(page.startswith('<a href="/site/">Title</a>'))
+
+        stream_page("/site/", source, self.template, self.output)
+        with open(self.output) as f:
+            self.assertEqual(f.read(), page)
+
+    def test_clean_lines_matches_clean_markdown(self):
+        text = "\n \n  # Title\n\n   \n\tcode\n\x0c\ntext  \n\n \n"
+        self.assertEqual("\n".join(clean_lines(io.StringIO(text))), clean_markdown(text))
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+from bench.corpus import CorpusGenerator, DOCUMENT_SHAPES
+from helpers import markdown_to_html_node
+
+class TestCorpusGenerator(unittest.TestCase):
+    def test_same_seed_same_document(self):
+        self.assertEqual(CorpusGenerator(7).document("mixed", 5000), CorpusGenerator(7).document("mixed", 5000))
+        self.assertNotEqual(CorpusGenerator(7).document("mixed", 5000), CorpusGenerator(8).document("mixed", 5000))
+
+    def test_every_shape_renders(self):
+        generator = CorpusGenerator(1)
+        for shape in DOCUMENT_SHAPES:
+            with self.subTest(shape=shape):
+                document = generator.document(shape, 20_000)
+                self.assertGreaterEqual(len(document), 20_000)
+                self.assertTrue(document.startswith("# "))
+                markdown_to_html_node(document).to_html()
+
+    def test_unknown_shape_raises(self):
+        with self.assertRaisesRegex(ValueError, "Unknown document shape: tiny"):
+            CorpusGenerator().document("tiny")
+
+    def test_write_site(self):
+        with tempfile.TemporaryDirectory() as root:
+            size = CorpusGenerator(2).write_site(root, 3, 1000)
+            self.assertGreater(size, 3000)
+            self.assertTrue(os.path.exists(os.path.join(root, "content", "index.md")))
+            self.assertTrue(os.path.exists(os.path.join(root, "content", "posts", "000", "post-00002", "index.md")))
+            self.assertTrue(os.path.exists(os.path.join(root, "template.html")))
+            self.assertTrue(os.path.exists(os.path.join(root, "static", "index.css")))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import threading
+import unittest
+from unittest import mock
+import daemon
+from daemon import BuildDaemon, BuildServer, render_blocks, send_request
+from helpers import markdown_to_html
+from support import TempDirTestCase
+
+class TestRenderBlocks(unittest.TestCase):
+    def test_matches_markdown_to_html(self):
+        markdown = "# Title\n\nSome **bold** text\n\n- one\n- two\n\n```\ncode\n```"
+        html, fragments = render_blocks(markdown, {})
+        self.assertEqual(html, markdown_to_html(markdown))
+        self.assertEqual(len(fragments), 4)
+
+    def test_reuses_unchanged_blocks(self):
+        html, fragments = render_blocks("# Title\n\nFirst", {})
+        with mock.patch("daemon.block_to_html", wraps=daemon.block_to_html) as block_to_html:
+            html, fragments = render_blocks("# Title\n\nSecond", fragments)
+        self.assertEqual(block_to_html.call_count, 1)
+        self.assertEqual(html, "<div><h1>Title</h1><p>Second</p></div>")
+
+    def test_errors_match_markdown_to_html(self):
+        with self.assertRaisesRegex(ValueError, "Parent nodes must have children"):
+            render_blocks("", {})
+        with self.assertRaisesRegex(ValueError, "Invalid Markdown syntax"):
+            render_blocks("# Title\n\n**open", {})
+
+class TestBuildDaemon(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self._write("static/index.css", "body {}")
+        self._write("content/index.md", "# Home\n\n[About](/about)")
+        self._write("content/about/index.md", "# About")
+        self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.builder = BuildDaemon(*(self._path(name) for name in ("static", "content", "template.html", "docs")), self._path("manifest.json"))
+
+    def test_rebuilds_only_changed_pages(self):
+        self.assertEqual(len(self.builder.build("/")["built"]), 2)
+        self.assertEqual(self.builder.build("/")["built"], [])
+
+        self._write("content/about/index.md", "# About us")
+        os.utime(self._path("content/about/index.md"), ns=(1, 1))
+        self.assertEqual(self.builder.build("/")["built"], [self._path("content/about/index.md")])
+        self.assertEqual(self._read("docs/about/index.html"), "<title>About us</title><div><h1>About us</h1></div>")
+
+    def test_basepath_change_refills_without_parsing(self):
+        self.builder.build("/")
+        with mock.patch("daemon.render_blocks") as render:
+            result = self.builder.build("/site/")
+        render.assert_not_called()
+        self.assertEqual(len(result["built"]), 2)
+        self.assertIn('href="/site/about"', self._read("docs/index.html"))
+
+    def test_removed_page_is_pruned(self):
+        self.builder.build("/")
+        os.remove(self._path("content/about/index.md"))
+        result = self.builder.build("/")
+        self.assertEqual(result["removed"], [self._path("docs/about/index.html")])
+        self.assertNotIn(self._path("content/about/index.md"), self.builder.pages)
+
+    def test_first_build_removes_static_files_left_in_the_output(self):
+        self._write("docs/old.css", "body {}")
+        self._write("docs/about/index.html", "<p>old</p>")
+        self.builder.build("/")
+        self.assertFalse(os.path.exists(self._path("docs/old.css")))
+        self.assertEqual(self._read("docs/about/index.html"), "<title>About</title><div><h1>About</h1></div>")
+
+        # Later builds only remove the static files they synced
+        self._write("docs/extra.txt", "kept")
+        self.builder.build("/")
+        self.assertTrue(os.path.exists(self._path("docs/extra.txt")))
+
+    def test_build_keeps_listings_of_the_shared_manifest(self):
+        self.builder.build("/")
+        self._write("docs/tags/a/index.html", "<ul></ul>")
+        self.builder.manifest.record_listing(self._path("docs/tags/a/index.html"), "pages tagged a", [self._path("content/index.md")], "new page")
+        result = self.builder.build("/")
+        self.assertEqual(result["removed"], [])
+        self.assertIn(self._path("docs/tags/a/index.html"), self.builder.manifest.entries)
+
+    def test_update_rebuilds_only_the_changed_page(self):
+        self.builder.build("/")
+        self._write("content/about/index.md", "# About us")
+        result = self.builder.update("/", [self._path("content/about/index.md"), self._path("content/notes.txt")])
+        self.assertEqual(result["built"], [self._path("content/about/index.md")])
+        self.assertEqual(self._read("docs/about/index.html"), "<title>About us</title><div><h1>About us</h1></div>")
+
+    def test_update_copies_and_removes_static_files(self):
+        self.builder.build("/")
+        self._write("static/new.css", "p {}")
+        os.remove(self._path("static/index.css"))
+        result = self.builder.update("/", [self._path("static/new.css"), self._path("static/index.css")])
+        self.assertEqual(result["copied"], ["new.css"])
+        self.assertEqual(result["removed"], [self._path("docs/index.css")])
+        self.assertEqual(self.builder.manifest.assets, {"new.css"})
+
+    def test_update_removes_deleted_page(self):
+        self.builder.build("/")
+        os.remove(self._path("content/about/index.md"))
+        result = self.builder.update("/", [self._path("content/about/index.md")])
+        self.assertEqual(result["removed"], [self._path("docs/about/index.html")])
+        self.assertFalse(os.path.exists(self._path("docs/about")))
+
+    def test_update_template_change_rebuilds_everything(self):
+        self.builder.build("/")
+        self._write("template.html", "{{ Content }}")
+        result = self.builder.update("/", [self._path("template.html")])
+        self.assertEqual(len(result["built"]), 2)
+        self.assertEqual(self._read("docs/about/index.html"), "<div><h1>About</h1></div>")
+
+    def test_server_answers_build_requests(self):
+        socket_path = self._path("daemon.sock")
+        server = BuildServer(socket_path, self.builder, self.root)
+        thread = threading.Thread(target=server.serve_until_stopped)
+        thread.start()
+        try:
+            response = send_request(socket_path, {"command": "build", "basepath": "/", "root": self.root})
+            self.assertTrue(response["ok"])
+            self.assertEqual(response["pages"], 2)
+
+            with self.assertLogs("daemon", "ERROR"):
+                response = send_request(socket_path, {"command": "build", "root": "/elsewhere"})
+            self.assertFalse(response["ok"])
+        finally:
+            send_request(socket_path, {"command": "stop"})
+            thread.join()
+            server.server_close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import functools
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from unittest import mock
+from application import generate_page
+from devserver import (
+    LIVE_RELOAD_PATH,
+    LIVE_RELOAD_SCRIPT,
+    DevRequestHandler,
+    OnDemandRequestHandler,
+    OnDemandSite,
+    ReloadNotifier,
+    etag_matches,
+    inject_live_reload,
+)
+from support import TempDirTestCase
+
+class TestLiveReload(unittest.TestCase):
+    def test_script_goes_before_closing_body(self):
+        self.assertEqual(inject_live_reload("<body><p>x</p></body>"), f"<body><p>x</p>{LIVE_RELOAD_SCRIPT}</body>")
+        self.assertEqual(inject_live_reload("<p>x</p>"), f"<p>x</p>{LIVE_RELOAD_SCRIPT}")
+
+    def test_notifier_wakes_up_waiters(self):
+        notifier = ReloadNotifier()
+        self.assertEqual(notifier.wait(0, timeout=0.01), 0)
+
+        threading.Timer(0.05, notifier.notify).start()
+        self.assertEqual(notifier.wait(0, timeout=5), 1)
+
+class TestDevRequestHandler(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self._write("blog/index.html", "<body>Post</body>")
+        self._write("index.css", "body {}")
+
+        self.notifier = ReloadNotifier()
+        handler = functools.partial(DevRequestHandler, directory=self.root, notifier=self.notifier)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_pages_get_the_live_reload_script(self):
+        with urllib.request.urlopen(f"{self.url}/blog/") as response:
+            self.assertEqual(response.read().decode(), f"<body>Post{LIVE_RELOAD_SCRIPT}</body>")
+            self.assertEqual(response.headers["Cache-Control"], "no-store")
+
+    def test_other_files_are_served_unchanged(self):
+        with urllib.request.urlopen(f"{self.url}/index.css") as response:
+            self.assertEqual(response.read(), b"body {}")
+
+    def test_event_stream_sends_reload(self):
+        with urllib.request.urlopen(f"{self.url}{LIVE_RELOAD_PATH}") as response:
+            self.notifier.notify()
+            self.assertEqual(response.readline(), b"data: reload\n")
+
+class TestOnDemandSite(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        self.index = self._write("content/index.md", "# Home\n\n[Blog](/blog/)")
+        self.post = self._write("content/blog/index.md", "# Blog")
+        self.contact = self._write("content/contact.md", "# Contact")
+        self.template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.site = OnDemandSite(self.content, self.template, "/site/")
+
+    def _write(self, relative_path: str, text: str) -> str:
+        path = super()._write(relative_path, text)
+        # Every write gets a distinct mtime
+        os.utime(path, ns=(len(text), len(text)))
+        return path
+
+    def test_finds_source_for_url(self):
+        self.assertEqual(self.site.find_source("/"), self.index)
+        self.assertEqual(self.site.find_source("/index.html"), self.index)
+        self.assertEqual(self.site.find_source("/blog/?page=2"), self.post)
+        self.assertEqual(self.site.find_source("/blog/index.html"), self.post)
+        self.assertEqual(self.site.find_source("/contact.html"), self.contact)
+        self.assertIsNone(self.site.find_source("/missing/"))
+        self.assertIsNone(self.site.find_source("/../template.html"))
+
+    def test_page_matches_generate_page(self):
+        output = self._path("docs/index.html")
+        generate_page("/site/", self.index, self.template, output)
+        with open(output, "rb") as f:
+            self.assertEqual(self.site.get(self.index)[0], f.read())
+
+    def test_renders_once_until_source_or_template_changes(self):
+        with mock.patch("devserver.render_page", return_value="page") as render:
+            body, etag = self.site.get(self.index)
+            self.assertEqual(self.site.get(self.index), (body, etag))
+            self.assertEqual(render.call_count, 1)
+
+            self._write("content/index.md", "# New home")
+            self.site.get(self.index)
+            self.assertEqual(render.call_count, 2)
+
+            self._write("template.html", "{{ Content }}")
+            self.site.get(self.index)
+            self.assertEqual(render.call_count, 3)
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+    def test_server_sends_etag_and_304(self):
+        handler = functools.partial(OnDemandRequestHandler, directory=self.root, notifier=ReloadNotifier(), site=self.site)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        try:
+            with urllib.request.urlopen(f"{url}/blog") as response:
+                self.assertEqual(response.url, f"{url}/blog/")
+                etag = response.headers["ETag"]
+                self.assertIn(b"<h1>Blog</h1>", response.read())
+
+            request = urllib.request.Request(f"{url}/blog/", headers={"If-None-Match": etag})
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(request)
+            self.assertEqual(error.exception.code, 304)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    unittest.main()
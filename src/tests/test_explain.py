@@ -0,0 +1,46 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from explain import explain, find_output, main
+from manifest import BuildManifest
+from support import TempDirTestCase
+
+class TestExplain(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = self._write("template.html", "{{ Content }}")
+        self.source = self._write("content/index.md", "# Home")
+        self.output = self._write("docs/index.html", "<h1>Home</h1>")
+        self.manifest_path = self._path("manifest.json")
+
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        manifest.is_fresh(self.source, self.output)
+        manifest.record(self.source, self.output)
+        manifest.save()
+
+    def _run(self, *argv: str) -> str:
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            main(["--manifest", self.manifest_path, *argv])
+        return stdout.getvalue()
+
+    def test_find_output_accepts_the_source(self):
+        manifest = BuildManifest(self.manifest_path)
+        self.assertEqual(find_output(manifest, self.source), self.output)
+        self.assertIsNone(find_output(manifest, "missing.md"))
+
+    def test_explain_shows_the_reason_and_changed_dependencies(self):
+        self._write("template.html", "<main>{{ Content }}</main>")
+        lines = explain(BuildManifest(self.manifest_path), self.output)
+
+        self.assertIn("  last rebuilt because: new page", lines)
+        self.assertIn(f"    source       {os.path.relpath(self.source)} (unchanged)", lines)
+        self.assertIn(f"    template     {os.path.relpath(self.template)} (changed since)", lines)
+
+    def test_changed_lists_stale_outputs(self):
+        self.assertEqual(self._run("--changed", self.template), f"{self.output}: {os.path.relpath(self.template)} (template)\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import unittest
+from application import extract_title, generate_page, stream_page
+from catalog import scan_pages
+from frontmatter import scan_metadata, split_front_matter
+from support import TempDirTestCase
+
+PAGE = """---
+title: "Front matter: the title"
+date: 2024-05-01
+tags: [tolkien, elves]
+draft: false
+layout: post  # comment
+categories:
+  - books
+  - C#
+---
+
+# Heading
+
+Body text
+"""
+
+class TestFrontMatter(TempDirTestCase):
+    def test_split_front_matter(self):
+        metadata, body = split_front_matter(PAGE)
+        self.assertEqual(metadata, {
+            "title": "Front matter: the title",
+            "date": "2024-05-01",
+            "tags": ["tolkien", "elves"],
+            "draft": False,
+            "layout": "post",
+            "categories": ["books", "C#"],
+        })
+        self.assertEqual(body, "\n# Heading\n\nBody text\n")
+        self.assertEqual(split_front_matter("# Title\n\n---\n"), ({}, "# Title\n\n---\n"))
+
+    def test_invalid_front_matter(self):
+        for text, message in (
+            ("---\ntitle: x\n", "never closed"),
+            ("---\njust text\n---\n# T", "must look like 'key: value'"),
+            ("---\ndraft: maybe\n---\n# T", "'draft' must be true or false"),
+            ("---\ndate: May 1st\n---\n# T", "'date' must be an ISO date"),
+        ):
+            with self.subTest(text=text), self.assertRaisesRegex(ValueError, message):
+                split_front_matter(text)
+
+    def test_title_falls_back_to_the_heading(self):
+        self.assertEqual(extract_title(PAGE), "Front matter: the title")
+        self.assertEqual(extract_title("---\ntags: [a]\n---\n\n  ## Heading\n\ntext"), "Heading")
+        with self.assertRaisesRegex(ValueError, "No title found"):
+            extract_title("---\ntitle: ''\n---\n")
+
+    def test_scan_reads_only_the_header(self):
+        path = self._write("page.md", PAGE + "**unclosed bold\n" * 1000)
+        self.assertEqual(scan_metadata(path)["title"], "Front matter: the title")
+        self.assertEqual(scan_metadata(self._write("plain.md", "\n  # Plain title\n\ntext")), {"title": "Plain title"})
+
+    def test_pages_render_without_front_matter(self):
+        source = self._write("page.md", PAGE)
+        template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        for render in (generate_page, stream_page):
+            output = self._path(os.path.join(render.__name__, "index.html"))
+            render("/", source, template, output)
+            with open(output) as f, self.subTest(render=render.__name__):
+                self.assertEqual(f.read(), "<title>Front matter: the title</title><div><h1>Heading</h1><p>Body text</p></div>")
+
+    def test_scan_pages_leaves_out_drafts(self):
+        content = self._path("content")
+        self._write("content/index.md", "# Home")
+        self._write("content/blog/draft/index.md", "---\ndraft: true\n---\n# Draft")
+        self.assertEqual([output for _, output, _ in scan_pages(content)], ["index.html"])
+        self.assertEqual([output for _, output, _ in scan_pages(content, drafts=True)], ["index.html", os.path.join("blog", "draft", "index.html")])
+
+if __name__ == "__main__":
+    unittest.main()
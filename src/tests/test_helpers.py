@@ -1,3 +1,8 @@
+import glob
+import os
+import random
+import re
+import threading
 import unittest
 import textwrap
 from texnode import TextNode, TextType
@@ -534,6 +539,101 @@ class TestHelpers(unittest.TestCase):
         ]
         self.assertListEqual(nodes, expected_nodes)
 
+    def test_text_to_textnodes_bold_inside_link(self):
+        nodes = text_to_textnodes("See [the **docs**](https://boot.dev) now")
+        expected_nodes = [
+            TextNode("See ", TextType.NORMAL),
+            TextNode("the docs", TextType.LINK, "https://boot.dev", [
+                TextNode("the ", TextType.NORMAL),
+                TextNode("docs", TextType.BOLD),
+            ]),
+            TextNode(" now", TextType.NORMAL),
+        ]
+        self.assertListEqual(nodes, expected_nodes)
+
+    def test_text_to_textnodes_italic_inside_bold(self):
+        nodes = text_to_textnodes("**very _important_ note**")
+        expected_nodes = [
+            TextNode("very important note", TextType.BOLD, None, [
+                TextNode("very ", TextType.NORMAL),
+                TextNode("important", TextType.ITALIC),
+                TextNode(" note", TextType.NORMAL),
+            ]),
+        ]
+        self.assertListEqual(nodes, expected_nodes)
+
+    def test_text_to_textnodes_unclosed_delimiter_inside_span_is_text(self):
+        nodes = text_to_textnodes("**snake_case** and [a_b](url)")
+        expected_nodes = [
+            TextNode("snake_case", TextType.BOLD),
+            TextNode(" and ", TextType.NORMAL),
+            TextNode("a_b", TextType.LINK, "url"),
+        ]
+        self.assertListEqual(nodes, expected_nodes)
+
+    def test_text_to_textnodes_code_is_not_parsed(self):
+        nodes = text_to_textnodes("`**not bold** _nor italic_`")
+        self.assertListEqual(nodes, [TextNode("**not bold** _nor italic_", TextType.CODE)])
+
+    def test_text_to_textnodes_unclosed_delimiter_raises(self):
+        with self.assertRaisesRegex(ValueError, "closing delimiter '\\*\\*' not found"):
+            text_to_textnodes("This is **not closed")
+        with self.assertRaisesRegex(ValueError, "closing delimiter '`' not found"):
+            text_to_textnodes("This is `not closed")
+
+    def test_text_to_html_nodes_nested_spans(self):
+        nodes = text_to_html_nodes("[a **b**](l.com)")
+        expected_nodes = [
+            ParentNode("a", [LeafNode(None, "a "), LeafNode("b", "b")], {"href": "l.com"}),
+        ]
+        self.assertEqual(nodes, expected_nodes)
+
+    def test_text_to_textnodes_ambiguous_emphasis_inside_span_is_text(self):
+        self.assertListEqual(text_to_textnodes("[my_var_name](/u)"), [TextNode("my_var_name", TextType.LINK, "/u")])
+        self.assertListEqual(text_to_textnodes("[__init__](/u)"), [TextNode("__init__", TextType.LINK, "/u")])
+        self.assertListEqual(text_to_textnodes("**__init__**"), [TextNode("__init__", TextType.BOLD)])
+        self.assertListEqual(text_to_textnodes("a **__** b"), [
+            TextNode("a ", TextType.NORMAL),
+            TextNode("__", TextType.BOLD),
+            TextNode(" b", TextType.NORMAL),
+        ])
+        self.assertListEqual(text_to_textnodes("[a ** b **](/u)"), [TextNode("a ** b **", TextType.LINK, "/u")])
+
+    def test_text_to_textnodes_matches_split_nodes_chain(self):
+        def split_chain(text):
+            nodes = [TextNode(text, TextType.NORMAL)]
+            nodes = split_nodes_image(nodes)
+            nodes = split_nodes_link(nodes)
+            nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+            nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+            return split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+
+        def source(node):
+            # The markdown a nested span was lexed from
+            delimiter = {TextType.BOLD: "**", TextType.ITALIC: "_"}.get(node.type, "")
+            if node.children is None:
+                return delimiter + node.text + delimiter
+            return delimiter + "".join(source(child) for child in node.children) + delimiter
+
+        pieces = ["a", "b c", " ", "_", "**", "*", "`", "[x](/u)", "![i](/p.png)", "[", "](", ")", "!", "snake_case", "__init__", "_it_", "**b**"]
+        generator = random.Random(5)
+        for _ in range(5000):
+            text = "".join(generator.choice(pieces) for _ in range(generator.randint(0, 10)))
+            with self.subTest(text=text):
+                try:
+                    expected = split_chain(text)
+                except ValueError:
+                    self.assertRaises(ValueError, text_to_textnodes, text)
+                    continue
+
+                nodes = text_to_textnodes(text)
+                self.assertEqual([(node.type, node.url) for node in nodes], [(node.type, node.url) for node in expected])
+                for node, expected_node in zip(nodes, expected):
+                    if node.children is None:
+                        self.assertEqual(node.text, expected_node.text)
+                    else:
+                        self.assertEqual("".join(source(child) for child in node.children), expected_node.text)
+
     def test_markdown_to_blocks(self):
         md = """
 This is **bolded** paragraph
@@ -596,6 +696,48 @@ Fourth paragraph, no trailing newlines."""
         ]
         self.assertEqual(blocks, expected_blocks)
 
+    def test_markdown_to_blocks_keeps_blank_lines_in_fenced_code(self):
+        md = "Intro\n\n```\ndef a():\n    pass\n\n\ndef b():\n    pass\n```\n\nOutro"
+        blocks = markdown_to_blocks(md)
+        self.assertEqual(blocks, [
+            "Intro",
+            "```\ndef a():\n    pass\n\n\ndef b():\n    pass\n```",
+            "Outro",
+        ])
+
+    def test_iter_blocks_yields_typed_blocks(self):
+        md = "# Title\n\n> quote\n\n- a\n- b\n\n1. x\n2. y\n\n```\ncode\n```\n\ntext"
+        self.assertEqual(list(iter_blocks(md)), [
+            (BlockType.HEADING, "# Title"),
+            (BlockType.QUOTE, "> quote"),
+            (BlockType.UNORDERED_LIST, "- a\n- b"),
+            (BlockType.ORDERED_LIST, "1. x\n2. y"),
+            (BlockType.CODE, "```\ncode\n```"),
+            (BlockType.PARAGRAPH, "text"),
+        ])
+
+    def test_iter_blocks_accepts_lines_from_a_file(self):
+        lines = ["# Title\r\n", "\n", "Some\xa0text\n", "more\n"]
+        self.assertEqual(list(iter_blocks(lines)), [
+            (BlockType.HEADING, "# Title"),
+            (BlockType.PARAGRAPH, "Some text\nmore"),
+        ])
+
+    def test_iter_blocks_is_lazy(self):
+        def lines():
+            yield "first\n"
+            yield "\n"
+            raise AssertionError("read past the first block")
+
+        self.assertEqual(next(iter_blocks(lines())), (BlockType.PARAGRAPH, "first"))
+
+    def test_markdown_to_html_node_code_with_blank_line(self):
+        md = "```\nline one\n\nline three\n```"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><pre><code>line one\n\nline three</code></pre></div>",
+        )
+
     def test_block_to_blocktype_paragraph(self):
         block = "This is a normal paragraph of text."
         self.assertEqual(block_to_blocktype(block), BlockType.PARAGRAPH)
@@ -905,5 +1047,110 @@ Fourth paragraph, no trailing newlines."""
         ])
         self.assertEqual(html_node.to_html(), expected_html.to_html())
 
+class TestMarkdownToHtml(unittest.TestCase):
+    CONTENT_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "content")
+
+    def assertSameAsTree(self, markdown: str):
+        try:
+            expected = markdown_to_html_node(markdown).to_html()
+        except ValueError as e:
+            with self.assertRaisesRegex(ValueError, re.escape(str(e))):
+                markdown_to_html(markdown)
+            return
+        self.assertEqual(markdown_to_html(markdown), expected)
+
+    def test_matches_tree_on_content(self):
+        paths = glob.glob(os.path.join(self.CONTENT_DIR, "**", "*.md"), recursive=True)
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path) as f:
+                markdown = textwrap.dedent(f.read().strip()).strip()
+            with self.subTest(path=path):
+                self.assertSameAsTree(markdown)
+
+    def test_matches_tree_on_generated_documents(self):
+        lines = [
+            "# Heading **bold**", "## ", "# ****", "- item [link](/url)", "- item _italic_",
+            "1. first", "2. `code`", "> quote **[bold link](/x)**", ">no space", "text ![img](/i.png)",
+            "``", "```", "code", "", "", "- ", "a **b _c_ d**", "snake_case", "[a _b_](/c)",
+        ]
+        generator = random.Random(9)
+        for _ in range(2000):
+            markdown = "\n".join(generator.choice(lines) for _ in range(generator.randint(0, 8)))
+            with self.subTest(markdown=markdown):
+                self.assertSameAsTree(markdown)
+
+    def test_nested_spans(self):
+        self.assertEqual(
+            markdown_to_html("- [see **this**](/x) `now`"),
+            '<div><ul><li><a href="/x">see <b>this</b></a> <code>now</code></li></ul></div>',
+        )
+
+class TestRenderMemo(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        memo = RenderMemo(2)
+        memo.get_or_render("a", lambda: 1)
+        memo.get_or_render("b", lambda: 2)
+        memo.get_or_render("a", lambda: 3)
+        memo.get_or_render("c", lambda: 4)
+        self.assertEqual(list(memo.entries), ["a", "c"])
+        self.assertEqual(memo.get_or_render("a", lambda: 5), 1)
+        self.assertEqual(memo.counts(), (2, 3))
+
+    def test_errors_are_not_memoized(self):
+        memo = RenderMemo(2)
+
+        def fail():
+            raise ValueError("bad block")
+
+        for _ in range(2):
+            with self.assertRaisesRegex(ValueError, "bad block"):
+                memo.get_or_render("a", fail)
+        self.assertEqual(memo.counts(), (0, 2))
+        self.assertEqual(len(memo.entries), 0)
+
+    def test_shared_across_threads(self):
+        memo = RenderMemo(8)
+        results = []
+
+        def render_many():
+            results.extend(memo.get_or_render(i % 16, lambda i=i: i % 16) for i in range(2000))
+
+        threads = [threading.Thread(target=render_many) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(3), 4 * 125)
+        self.assertEqual(sum(memo.counts()), 8000)
+        self.assertLessEqual(len(memo.entries), 8)
+
+    def test_repeated_blocks_are_rendered_once(self):
+        block_memo.clear()
+        markdown = "# Page\n\n> Shared **disclaimer**\n\nUnique text"
+        expected = markdown_to_html_node(markdown).to_html()
+        hits, misses = block_memo.counts()
+        self.assertEqual(markdown_to_html(markdown), expected)
+        self.assertEqual(markdown_to_html(markdown.replace("Unique", "Other")), expected.replace("Unique", "Other"))
+        self.assertEqual(block_memo.counts(), (hits + 2, misses + 4))
+
+class TestBasepathSlot(unittest.TestCase):
+    def test_site_url(self):
+        self.assertEqual(site_url("/images/a.png", "/site/"), "/site/images/a.png")
+        self.assertEqual(site_url("//cdn/a.png", "/site/"), "//cdn/a.png")
+        self.assertEqual(site_url("https://example.com/", "/site/"), "https://example.com/")
+
+    def test_rebase_urls_only_changes_link_and_image_attributes(self):
+        node = markdown_to_html_node('[a](/a) href="/b" ![c](/c.png)')
+        self.assertEqual(rebase_urls(node, "/site/").to_html(), '<div><p><a href="/site/a">a</a> href="/b" <img src="/site/c.png" alt="c"></img></p></div>')
+
+    def test_fast_renderer_leaves_a_slot_for_the_basepath(self):
+        markdown = '[a](/a) href="/b"\n\n- ![c](/c.png)'
+        slotted = markdown_to_html(markdown, basepath=None)
+        self.assertEqual(slotted, rebase_urls(markdown_to_html_node(markdown)).to_html())
+        self.assertEqual(apply_basepath("/site/", slotted), markdown_to_html(markdown, "/site/"))
+        self.assertEqual(markdown_to_html(markdown), markdown_to_html_node(markdown).to_html())
+
 if __name__ == "__main__":
     unittest.main()
@@ -17,5 +17,11 @@ class TestHtmlNode(unittest.TestCase):
         ], {"class": "container"})
         self.assertIsInstance(node.children[0], HtmlNode)
 
+    def test_nodes_have_no_instance_dict(self):
+        for node in (HtmlNode("div"), LeafNode("p", "text")):
+            self.assertFalse(hasattr(node, "__dict__"))
+            with self.assertRaises(AttributeError):
+                node.extra = True
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
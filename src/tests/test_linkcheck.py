@@ -0,0 +1,62 @@
+import os
+import unittest
+from linkcheck import check_links, output_urls, resolve_link
+from sitedb import SiteDatabase
+from support import TempDirTestCase
+
+class TestLinkCheck(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        self.static = self._path("static")
+        self.template = self._write("template.html", '<link href="/index.css"><nav id="menu"><a href="/about/">About</a></nav>{{ Content }}')
+        self._write("static/index.css", "")
+        self._write("static/images/used.png", "")
+        self._write("static/images/unused.png", "")
+        self.database = SiteDatabase(self._path("site.sqlite"))
+
+    def tearDown(self):
+        self.database.close()
+
+    def _check(self, listings: bool = False):
+        self.database.update(self.content)
+        return check_links(self.database, self.static, self.template, listings)
+
+    def test_resolve_link(self):
+        self.assertEqual(resolve_link("/blog/glorfindel/", "../tom/#intro"), ("/blog/tom/", "intro"))
+        self.assertEqual(resolve_link("/blog/", "#top"), ("/blog/", "top"))
+        self.assertEqual(resolve_link("/", "/a%20b.png"), ("/a b.png", ""))
+        self.assertIsNone(resolve_link("/", "https://example.com/"))
+        self.assertIsNone(resolve_link("/", "mailto:tom@example.com"))
+
+    def test_output_urls(self):
+        self.assertEqual(output_urls(os.path.join("blog", "index.html")), ["/blog/index.html", "/blog/", "/blog"])
+        self.assertEqual(output_urls("about.html"), ["/about.html"])
+
+    def test_reports_broken_links_orphans_and_unused_assets(self):
+        home = self._write("content/index.md", '# Home\n\n[Post](/blog/post/#intro) [Gone](/blog/gone/) ![x](images/used.png) [Menu](/about/#menu)\n\n```\n[not a link](/nowhere/)\n```')
+        self._write("content/about/index.md", "# About\n\n[Missing anchor](/blog/post#outro) [Home](../)")
+        self._write("content/blog/post/index.md", '# Post\n\n<a id="intro"></a>Text')
+        self._write("content/orphan.md", "# Orphan")
+
+        report = self._check()
+        about = os.path.join(self.content, "about", "index.md")
+        self.assertEqual(sorted(report.broken), sorted([
+            (home, "/blog/gone/", "no such page or file"),
+            (about, "/blog/post#outro", "no anchor #outro"),
+        ]))
+        self.assertEqual(report.orphans, [os.path.join(self.content, "orphan.md")])
+        self.assertEqual(report.unused_assets, [os.path.join("images", "unused.png")])
+        self.assertEqual(report.links, 8)
+
+    def test_listed_pages_are_not_orphans(self):
+        self._write("content/index.md", "# Home")
+        self._write("content/blog/post/index.md", "---\ndate: 2024-05-01\n---\n# Post")
+        self._write("content/notes/index.md", "---\ntags: [elves]\n---\n# Notes")
+        self._write("content/about/index.md", "# About")
+
+        self.assertEqual(len(self._check().orphans), 2)
+        self.assertEqual(self._check(listings=True).orphans, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+from listings import generate_listings, tag_slug, tag_slugs
+from manifest import BuildManifest
+from sitedb import SiteDatabase
+from support import TempDirTestCase
+
+class TestListings(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        self.docs = self._path("docs")
+        self.template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+
+        self._write("content/index.md", "# Home")
+        for i in range(1, 4):
+            self._write(f"content/blog/post{i}/index.md", f"---\ntitle: Post {i}\ndate: 2024-05-0{i}\ntags: [{'elves' if i % 2 else 'dwarves'}]\n---\n# Post")
+        self.database = SiteDatabase(self._path("site.sqlite"))
+        self.database.update(self.content)
+
+    def tearDown(self):
+        self.database.close()
+
+    def test_tag_slug(self):
+        self.assertEqual(tag_slug("C# Tips"), "c-tips")
+        self.assertEqual(tag_slug("!!!"), "tag")
+
+    def test_colliding_tag_slugs_get_a_suffix(self):
+        with self.assertLogs("listings", "WARNING"):
+            self.assertEqual(tag_slugs(["C#", "c", "c 2", "C++"]), {"c": "c", "C#": "c-2", "C++": "c-3", "c 2": "c-2-2"})
+        self.assertEqual(tag_slugs(["elves"]), {"elves": "elves"})
+
+    def test_colliding_tags_both_get_a_page(self):
+        self._write("content/blog/post4/index.md", "---\ntitle: Post 4\ndate: 2024-05-04\ntags: [C#]\n---\n# Post")
+        self._write("content/blog/post5/index.md", "---\ntitle: Post 5\ndate: 2024-05-05\ntags: [c]\n---\n# Post")
+        self.database.update(self.content)
+        with self.assertLogs("listings", "WARNING"):
+            generate_listings(self.database, "/", self.template, self.docs)
+
+        self.assertIn("Post 5", self._read("docs/tags/c/index.html"))
+        self.assertIn("Post 4", self._read("docs/tags/c-2/index.html"))
+
+    def test_paginated_blog_index_and_tag_pages(self):
+        self.assertEqual(generate_listings(self.database, "/site/", self.template, self.docs, page_size=2), (4, 0))
+
+        first = self._read("docs/blog/index.html")
+        self.assertIn('<li><a href="/site/blog/post3/">Post 3</a> <time datetime="2024-05-03">2024-05-03</time></li>', first)
+        self.assertLess(first.index("Post 3"), first.index("Post 2"))
+        self.assertIn('<a href="/site/blog/page/2/">Older posts</a>', first)
+        self.assertIn("Post 1", self._read("docs/blog/page/2/index.html"))
+        self.assertIn("Post 2", self._read("docs/tags/dwarves/index.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "sitemap.xml")))
+
+    def test_sitemap_and_feed(self):
+        generate_listings(self.database, "/site/", self.template, self.docs, "https://example.com/")
+        sitemap = self._read("docs/sitemap.xml")
+        self.assertIn("<url><loc>https://example.com/site/blog/post1/</loc><lastmod>2024-05-01</lastmod></url>", sitemap)
+        self.assertIn("<loc>https://example.com/site/tags/elves/</loc>", sitemap)
+
+        feed = self._read("docs/blog/feed.xml")
+        self.assertIn("<channel><title>Home</title><link>https://example.com/site/</link>", feed)
+        self.assertIn("<pubDate>Fri, 03 May 2024 00:00:00 +0000</pubDate>", feed)
+
+    def test_only_changed_listings_are_written(self):
+        generate_listings(self.database, "/", self.template, self.docs)
+        self.assertEqual(generate_listings(self.database, "/", self.template, self.docs), (0, 3))
+
+        # Post 2 is only on the blog index and the dwarves page
+        self._write("content/blog/post2/index.md", "---\ntitle: Renamed\ndate: 2024-05-02\ntags: [dwarves]\n---\n# Post")
+        self.database.update(self.content)
+        self.assertEqual(generate_listings(self.database, "/", self.template, self.docs), (2, 1))
+        self.assertIn("Renamed", self._read("docs/tags/dwarves/index.html"))
+
+        # The dwarves page goes away with its last post
+        self._write("content/blog/post2/index.md", "---\ntitle: Renamed\ndate: 2024-05-02\n---\n# Post")
+        self.database.update(self.content)
+        generate_listings(self.database, "/", self.template, self.docs)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "tags", "dwarves")))
+
+    def test_a_page_replaces_a_former_listing(self):
+        generate_listings(self.database, "/", self.template, self.docs)
+        self._write("content/tags/elves/index.md", "# Elves")
+        page = self._write("docs/tags/elves/index.html", "<h1>Elves</h1>")
+        self.database.update(self.content)
+
+        with self.assertLogs("listings", "WARNING"):
+            generate_listings(self.database, "/", self.template, self.docs)
+        self.assertEqual(self._read(page), "<h1>Elves</h1>")
+        self.assertNotIn(os.path.join("tags", "elves", "index.html"), self.database.collections())
+
+    def test_listings_are_recorded_in_the_manifest(self):
+        manifest = BuildManifest(self._path("manifest.json"))
+        manifest.begin(self.template, "/")
+        generate_listings(self.database, "/", self.template, self.docs, manifest=manifest)
+        manifest.save()
+
+        output = os.path.join(self.docs, "tags", "dwarves", "index.html")
+        entry = manifest.entries[output]
+        self.assertEqual((entry["query"], entry["reason"]), ("pages tagged dwarves", "new listing"))
+        post = os.path.join(self.content, "blog", "post2", "index.md")
+        self.assertEqual(manifest.stale([post]), {
+            os.path.join(self.docs, "blog", "index.html"): [(os.path.relpath(post), "listed page")],
+            output: [(os.path.relpath(post), "listed page")],
+        })
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import unittest
+import unittest.mock
+from application import generate_pages_recursive, write_page
+from manifest import BuildManifest, hash_bytes, hash_file
+from support import TempDirTestCase
+
+class TestBuildManifest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.source = self._write("content/index.md", "# Title\n\nBody")
+        self.output = self._write("docs/index.html", "<p>Body</p>")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+
+    def _recorded_manifest(self, basepath: str = "/") -> BuildManifest:
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, basepath)
+        manifest.record(self.source, self.output)
+        manifest.save()
+        return manifest
+
+    def test_hash_file_matches_hash_bytes(self):
+        self.assertEqual(hash_file(self.source), hash_bytes(b"# Title\n\nBody"))
+
+    def test_unchanged_page_is_fresh_after_reload(self):
+        self._recorded_manifest()
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        self.assertTrue(manifest.is_fresh(self.source, self.output))
+
+    def test_source_change_makes_page_stale(self):
+        self._recorded_manifest()
+        self._write("content/index.md", "# Title\n\nBody with a typo fix")
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        self.assertFalse(manifest.is_fresh(self.source, self.output))
+
+    def test_touch_without_content_change_is_fresh(self):
+        self._recorded_manifest()
+        os.utime(self.source, ns=(1, 1))
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        self.assertTrue(manifest.is_fresh(self.source, self.output))
+
+    def test_a_save_while_rendering_leaves_the_page_stale(self):
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+
+        def save_while_writing(output_path: str, page: str):
+            write_page(output_path, page)
+            self._write("content/index.md", "# Title\n\nSaved after the page was rendered")
+
+        with unittest.mock.patch("application.write_page", side_effect=save_while_writing):
+            generate_pages_recursive("/", self._path("content"), self.template, self._path("docs"), manifest)
+        manifest.save()
+
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        self.assertFalse(manifest.is_fresh(self.source, self.output))
+
+    def test_template_or_basepath_change_makes_page_stale(self):
+        self._recorded_manifest()
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/static-site-generator/")
+        self.assertFalse(manifest.is_fresh(self.source, self.output))
+
+        self._write("template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        manifest.begin(self.template, "/")
+        self.assertFalse(manifest.is_fresh(self.source, self.output))
+
+    def test_missing_output_is_stale(self):
+        self._recorded_manifest()
+        os.remove(self.output)
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        self.assertFalse(manifest.is_fresh(self.source, self.output))
+
+    def test_prune_removes_outputs_of_deleted_sources(self):
+        nested_source = self._write("content/blog/post/index.md", "# Post")
+        nested_output = self._write("docs/blog/post/index.html", "<h1>Post</h1>")
+        manifest = self._recorded_manifest()
+        manifest.record(nested_source, nested_output)
+        manifest.save()
+
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        manifest.is_fresh(self.source, self.output)
+        removed = manifest.prune(os.path.join(self.root, "docs"))
+
+        self.assertEqual(removed, [nested_output])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "docs", "blog")))
+        self.assertTrue(os.path.exists(self.output))
+        self.assertNotIn(nested_output, manifest.entries)
+
+    def test_prune_leaves_other_output_directories_alone(self):
+        manifest = self._recorded_manifest()
+        manifest.begin(self.template, "/")
+        removed = manifest.prune(os.path.join(self.root, "docs-shard-1-of-2"))
+
+        self.assertEqual(removed, [])
+        self.assertTrue(os.path.exists(self.output))
+        self.assertIn(self.output, manifest.entries)
+
+    def test_prune_keeps_listings_unless_they_were_generated(self):
+        listing = self._write("docs/tags/a/index.html", "<ul></ul>")
+        manifest = self._recorded_manifest()
+        manifest.record_listing(listing, "pages tagged a", [self.source], "new page")
+        manifest.save()
+
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        manifest.is_fresh(self.source, self.output)
+        self.assertEqual(manifest.prune(os.path.join(self.root, "docs")), [])
+        self.assertIn(listing, manifest.entries)
+
+        self.assertEqual(manifest.prune(os.path.join(self.root, "docs"), listings=True), [listing])
+        self.assertNotIn(listing, manifest.entries)
+
+    def test_dependencies_are_indexed_by_the_files_they_come_from(self):
+        self._write("template.html", '{% include "nav.html" %}{{ Content }}')
+        nav = self._write("nav.html", "<nav></nav>")
+        image = self._write("static/images/tom.png", "png")
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/site/", os.path.join(self.root, "static"))
+        manifest.assets = {os.path.join("images", "tom.png")}
+        manifest.record(self.source, self.output, {"/images/tom.png", "https://example.com/"})
+        manifest.save()
+
+        manifest = BuildManifest(self.manifest_path)
+        self.assertEqual(manifest.entries[self.output]["dependencies"], {
+            os.path.relpath(self.source): "source",
+            os.path.relpath(self.template): "template",
+            os.path.relpath(nav): "template",
+            os.path.relpath(image): "asset",
+        })
+        self.assertEqual(manifest.stale([nav, self.source]), {self.output: [(os.path.relpath(nav), "template"), (os.path.relpath(self.source), "source")]})
+        # Pages keep linking to a changed static file unchanged
+        self.assertEqual(manifest.stale([image]), {})
+
+    def test_template_urls_and_cached_pages_keep_their_assets(self):
+        self._write("template.html", '<link href="/index.css">{{ Content }}')
+        stylesheet = self._write("static/index.css", "body {}")
+        image = self._write("static/tom.png", "png")
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/", os.path.join(self.root, "static"))
+        manifest.assets = {"index.css", "tom.png"}
+        manifest.record(self.source, self.output, {"/tom.png#top"})
+        assets = {os.path.relpath(stylesheet): "asset", os.path.relpath(image): "asset"}
+        self.assertLessEqual(assets.items(), manifest.entries[self.output]["dependencies"].items())
+
+        # Content from a cache renders no URLs, an unchanged source keeps the earlier ones
+        manifest.record(self.source, self.output, None)
+        self.assertLessEqual(assets.items(), manifest.entries[self.output]["dependencies"].items())
+
+        self._write("content/index.md", "# Title\n\nNo image")
+        manifest.record(self.source, self.output, None)
+        self.assertNotIn(os.path.relpath(image), manifest.entries[self.output]["dependencies"])
+
+    def test_rebuild_reason_names_the_changed_dependency(self):
+        nav = self._write("nav.html", "<nav></nav>")
+        self._write("template.html", '{% include "nav.html" %}{{ Content }}')
+        self._recorded_manifest()
+        self.assertEqual(BuildManifest(self.manifest_path).entries[self.output]["reason"], "rebuilt")
+
+        self._write("nav.html", "<nav>Home</nav>")
+        manifest = BuildManifest(self.manifest_path)
+        manifest.begin(self.template, "/")
+        self.assertFalse(manifest.is_fresh(self.source, self.output))
+        manifest.record(self.source, self.output)
+        self.assertEqual(manifest.entries[self.output]["reason"], f"template changed: {os.path.relpath(nav)}")
+
+        manifest.begin(self.template, "/site/")
+        manifest.is_fresh(self.source, self.output)
+        manifest.record(self.source, self.output)
+        self.assertEqual(manifest.entries[self.output]["reason"], "basepath changed from / to /site/")
+
+if __name__ == "__main__":
+    unittest.main()
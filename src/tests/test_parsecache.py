@@ -0,0 +1,56 @@
+import os
+import pickle
+import unittest
+from unittest import mock
+from application import generate_page, generate_pages_parallel
+from parsecache import ParseCache
+from support import TempDirTestCase
+
+class TestParseCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.parsed = ParseCache(self._path("parsed"))
+
+    def test_save_and_load(self):
+        key = self.parsed.key("# Title")
+        self.assertIsNone(self.parsed.load(key))
+        self.parsed.save(key, "<div><h1>Title</h1></div>")
+        self.assertEqual(self.parsed.load(key), ("<div><h1>Title</h1></div>", ()))
+        self.assertEqual((self.parsed.hits, self.parsed.misses), (1, 1))
+        self.assertTrue(self.parsed.path(key).endswith(".bin"))
+
+        self.parsed.save(key, '<div><img src="\x00tom.png"></img></div>', {"/tom.png"})
+        self.assertEqual(self.parsed.load(key), ('<div><img src="\x00tom.png"></img></div>', ("/tom.png",)))
+
+    def test_template_change_skips_parsing(self):
+        source = self._write("content/index.md", "# Title\n\nA [link](/about)")
+        template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        generate_page("/", source, template, os.path.join(self.root, "first.html"), parsed=self.parsed)
+
+        self._write("template.html", "<h1>{{ Title }}</h1><main>{{ Content }}</main>")
+        expected = os.path.join(self.root, "expected.html")
+        generate_page("/site/", source, template, expected)
+
+        output = os.path.join(self.root, "second.html")
+        with mock.patch("application.render_content") as render:
+            generate_page("/site/", source, template, output, parsed=self.parsed)
+        render.assert_not_called()
+        self.assertEqual(self._read(output), self._read(expected))
+
+    def test_worker_copies_count_their_own_lookups(self):
+        self.parsed.record(True)
+        copy = pickle.loads(pickle.dumps(self.parsed))
+        self.assertEqual((copy.hits, copy.misses), (0, 0))
+
+    def test_process_workers_report_their_counts(self):
+        content = os.path.join(self.root, "content")
+        for i in range(4):
+            self._write(f"content/{i}.md", f"# Page {i}")
+        template = self._write("template.html", "{{ Content }}")
+
+        for _ in range(2):
+            generate_pages_parallel("/", content, template, os.path.join(self.root, "docs"), 2, executor="process", parsed=self.parsed)
+        self.assertEqual((self.parsed.hits, self.parsed.misses), (4, 4))
+
+if __name__ == "__main__":
+    unittest.main()
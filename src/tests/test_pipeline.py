@@ -0,0 +1,95 @@
+import os
+import threading
+import unittest
+import unittest.mock
+from application import PageGenerationError, generate_pages_recursive, stream_page
+from pipeline import StageError, generate_pages_pipeline, run_pipeline
+from support import TempDirTestCase
+
+class TestRunPipeline(unittest.TestCase):
+    def test_every_item_goes_through_every_stage(self):
+        results = []
+        lock = threading.Lock()
+
+        def collect(item: int):
+            with lock:
+                results.append(item)
+
+        stages = [("double", lambda item: item * 2, 3), ("skip odd", lambda item: item if item % 4 else None, 2), ("collect", collect, 2)]
+        run_pipeline(range(100), stages, queue_size=2)
+        self.assertEqual(sorted(results), [item * 2 for item in range(100) if item % 2])
+
+    def test_queues_bound_the_items_in_flight(self):
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def start(item: int) -> int:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            return item
+
+        def finish(item: int):
+            nonlocal in_flight
+            threading.Event().wait(0.001)
+            with lock:
+                in_flight -= 1
+
+        run_pipeline(range(200), [("start", start, 1), ("finish", finish, 1)], queue_size=4)
+        # The queue, the item being finished and the one waiting to be queued
+        self.assertLessEqual(peak, 6)
+
+    def test_first_error_stops_the_pipeline(self):
+        seen = []
+
+        def fail(item: int) -> int:
+            if item == 3:
+                raise ValueError("bad item")
+            return item
+
+        with self.assertRaises(StageError) as error:
+            run_pipeline(range(10_000), [("check", fail, 2), ("collect", seen.append, 1)], queue_size=2)
+        self.assertEqual((error.exception.stage, error.exception.item), ("check", 3))
+        self.assertLess(len(seen), 10_000)
+
+class TestGeneratePagesPipeline(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        for i in range(20):
+            self._write(f"content/posts/{i}/index.md", f"# Post {i}\r\n\r\nSome **text** and a [link](/posts/{i + 1}/)")
+        self.template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+
+    def _read_tree(self, root: str) -> dict[str, str]:
+        files = {}
+        for dir_path, dir_names, file_names in os.walk(root):
+            for name in file_names:
+                with open(os.path.join(dir_path, name)) as f:
+                    files[os.path.relpath(os.path.join(dir_path, name), root)] = f.read()
+        return files
+
+    def test_output_matches_serial_build(self):
+        serial = os.path.join(self.root, "serial")
+        streamed = os.path.join(self.root, "streamed")
+        generate_pages_recursive("/site/", self.content, self.template, serial)
+        generate_pages_pipeline("/site/", self.content, self.template, streamed, render_workers=2, io_threads=3)
+        self.assertEqual(self._read_tree(streamed), self._read_tree(serial))
+
+    def test_large_pages_are_streamed(self):
+        serial = os.path.join(self.root, "serial")
+        streamed = os.path.join(self.root, "streamed")
+        generate_pages_recursive("/site/", self.content, self.template, serial)
+        with unittest.mock.patch("application.STREAM_THRESHOLD", 1), unittest.mock.patch("application.stream_page", wraps=stream_page) as stream:
+            generate_pages_pipeline("/site/", self.content, self.template, streamed, render_workers=2)
+        self.assertEqual(stream.call_count, 20)
+        self.assertEqual(self._read_tree(streamed), self._read_tree(serial))
+
+    def test_errors_name_the_source_file(self):
+        broken = self._write("content/posts/5/index.md", "# Broken\n\n**open")
+        with self.assertRaisesRegex(PageGenerationError, broken):
+            generate_pages_pipeline("/", self.content, self.template, os.path.join(self.root, "docs"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import unittest
+from unittest import mock
+from application import generate_page
+from rendercache import RenderCache
+from support import TempDirTestCase
+
+class TestRenderCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = RenderCache(self._path("cache"), max_bytes=1000)
+
+    def test_key_covers_every_input(self):
+        key = self.cache.key(b"# Title", "template", "/")
+        self.assertEqual(key, self.cache.key(b"# Title", "template", "/"))
+        self.assertNotEqual(key, self.cache.key(b"# Title!", "template", "/"))
+        self.assertNotEqual(key, self.cache.key(b"# Title", "other", "/"))
+        self.assertNotEqual(key, self.cache.key(b"# Title", "template", "/site/"))
+        with mock.patch("rendercache.GENERATOR_VERSION", "next"):
+            self.assertNotEqual(key, self.cache.key(b"# Title", "template", "/"))
+
+    def test_store_and_fetch(self):
+        output = os.path.join(self.root, "docs", "index.html")
+        self.assertFalse(self.cache.fetch("ab" * 32, output))
+
+        self.cache.store("ab" * 32, "<p>page</p>")
+        self.assertTrue(self.cache.fetch("ab" * 32, output))
+        self.assertEqual(self._read(output), "<p>page</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.cache.path("ab" * 32))), [f"{'ab' * 31}.html"])
+
+    def test_evicts_least_recently_used(self):
+        for i, key in enumerate(("aa", "bb", "cc")):
+            self.cache.store(key * 32, "x" * 400)
+            os.utime(self.cache.path(key * 32), ns=(i, i))
+        # A hit makes the oldest entry the most recently used
+        self.cache.fetch("aa" * 32, os.path.join(self.root, "out.html"))
+
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertTrue(os.path.exists(self.cache.path("aa" * 32)))
+        self.assertFalse(os.path.exists(self.cache.path("bb" * 32)))
+        self.assertTrue(os.path.exists(self.cache.path("cc" * 32)))
+        self.assertEqual(self.cache.evict(), 0)
+
+    def test_stats_accumulate_across_builds(self):
+        self.cache.record(True)
+        self.cache.record(False)
+        self.assertEqual(self.cache.hit_rate(), 0.5)
+        self.cache.save_stats(evicted=1)
+
+        other = RenderCache(self.cache.root)
+        other.record(True)
+        self.assertEqual(other.save_stats(), {"hits": 2, "misses": 1, "evictions": 1})
+
+    def test_generate_page_reuses_cached_page(self):
+        source = self._write("content/index.md", b"# Title\r\n\r\n  Some *text*\r\n")
+        template = self._write("template.html", b"<title>{{ Title }}</title>{{ Content }}")
+        expected = os.path.join(self.root, "expected.html")
+        generate_page("/", source, template, expected)
+
+        first = os.path.join(self.root, "first", "index.html")
+        second = os.path.join(self.root, "second", "index.html")
+        self.assertFalse(generate_page("/", source, template, first, cache=self.cache))
+        with mock.patch("application.render_markdown") as render:
+            self.assertTrue(generate_page("/", source, template, second, cache=self.cache))
+        render.assert_not_called()
+
+        self.assertEqual(self._read(first), self._read(expected))
+        self.assertEqual(self._read(second), self._read(expected))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import textwrap
+import unittest
+from helpers import markdown_to_html_node
+from htmlnode import HtmlNode
+from leafnode import LeafNode
+from parentnode import ParentNode
+from serializer import iter_html, render_html, write_html
+
+class TestSerializer(unittest.TestCase):
+    def test_render_matches_nested_to_html(self):
+        md = textwrap.dedent("""
+            # Heading with **bold**
+
+            A paragraph with a [link](/about) and ![image](/img.png).
+
+            - one
+            - two _italic_
+        """)
+        node = markdown_to_html_node(md)
+        expected = (
+            '<div><h1>Heading with <b>bold</b></h1>'
+            '<p>A paragraph with a <a href="/about">link</a> and <img src="/img.png" alt="image"></img>.</p>'
+            '<ul><li>one</li><li>two <i>italic</i></li></ul></div>'
+        )
+        self.assertEqual(render_html(node), expected)
+        self.assertEqual(node.to_html(), expected)
+
+    def test_empty_props_keep_to_html_spacing(self):
+        node = ParentNode("div", [LeafNode("span", "x", {})], {})
+        self.assertEqual(render_html(node), "<div ><span>x</span></div>")
+
+    def test_deep_tree_does_not_recurse(self):
+        node = LeafNode(None, "leaf")
+        for _ in range(20000):
+            node = ParentNode("span", [node])
+        html = render_html(node)
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(len(html), 20000 * len("<span></span>") + len("leaf"))
+
+    def test_escape_text_and_attributes(self):
+        node = ParentNode("p", [
+            LeafNode(None, "1 < 2 & \"3\""),
+            LeafNode("a", "<b>", {"href": "/search?q=\"x\"&y=1"}),
+        ])
+        self.assertEqual(
+            render_html(node, escape=True),
+            '<p>1 &lt; 2 &amp; "3"<a href="/search?q=&quot;x&quot;&amp;y=1">&lt;b&gt;</a></p>',
+        )
+
+    def test_write_html_streams_to_file(self):
+        node = ParentNode("ul", [ParentNode("li", [LeafNode(None, str(i))]) for i in range(3)])
+        buffer = io.StringIO()
+        write_html(node, buffer)
+        self.assertEqual(buffer.getvalue(), "<ul><li>0</li><li>1</li><li>2</li></ul>")
+
+    def test_invalid_nodes_raise(self):
+        with self.assertRaisesRegex(ValueError, "Parent nodes must have children"):
+            render_html(ParentNode("div", [ParentNode("p", [])]))
+        with self.assertRaisesRegex(ValueError, "Parent nodes must have a tag"):
+            render_html(ParentNode(None, [LeafNode(None, "x")]))
+        with self.assertRaises(NotImplementedError):
+            "".join(iter_html(ParentNode("div", [HtmlNode("p", "x")])))
+
+if __name__ == "__main__":
+    unittest.main()
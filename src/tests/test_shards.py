@@ -0,0 +1,59 @@
+import argparse
+import os
+import unittest
+from application import shard_pages
+from shards import main, merge_shards, parse_shard
+from support import TempDirTestCase
+
+class TestShards(TempDirTestCase):
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for text in ("0/4", "5/4", "2", "a/b"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(text)
+
+    def test_shards_are_disjoint_complete_and_balanced(self):
+        sizes = [900, 500, 400, 300, 300, 200, 100, 100]
+        pages = [(self._write(f"content/{i}.md", "x" * size), f"docs/{i}.html") for i, size in enumerate(sizes)]
+
+        shards = [shard_pages(pages, index, 3) for index in (1, 2, 3)]
+        self.assertEqual(sorted(page for shard in shards for page in shard), sorted(pages))
+
+        totals = [sum(os.path.getsize(source) for source, output in shard) for shard in shards]
+        self.assertEqual(sorted(totals), [900, 900, 1000])
+        self.assertEqual(shard_pages(list(reversed(pages)), 2, 3), shards[1])
+
+    def test_merge_combines_static_files_and_shards(self):
+        self._write("static/index.css", "body {}")
+        self._write("shard-1/index.html", "home")
+        self._write("shard-2/blog/index.html", "blog")
+        output = os.path.join(self.root, "docs")
+        self._write("docs/stale.html", "stale")
+
+        shard_dirs = [os.path.join(self.root, "shard-1"), os.path.join(self.root, "shard-2")]
+        count = merge_shards(os.path.join(self.root, "static"), shard_dirs, output)
+        self.assertEqual(count, 3)
+        self.assertEqual(sorted(os.listdir(output)), ["blog", "index.css", "index.html"])
+
+    def test_merge_refuses_paths_written_twice(self):
+        self._write("static/index.html", "static")
+        self._write("shard-1/index.html", "home")
+        output = self._write("docs/index.html", "previous")
+
+        with self.assertRaisesRegex(ValueError, "index.html"):
+            merge_shards(os.path.join(self.root, "static"), [os.path.join(self.root, "shard-1")], os.path.dirname(output))
+        with open(output) as f:
+            self.assertEqual(f.read(), "previous")
+
+    def test_main_fails_on_missing_shard_or_duplicate_path(self):
+        static_dir = os.path.dirname(self._write("static/index.html", "static"))
+        shard_dir = os.path.dirname(self._write("shard-1/index.html", "home"))
+        output = os.path.join(self.root, "docs")
+
+        for shard_dirs in ([os.path.join(self.root, "shard-2")], [shard_dir]):
+            with self.assertLogs("shards", "ERROR"), self.assertRaises(SystemExit) as raised:
+                main(["--static-dir", static_dir, "--output-dir", output, *shard_dirs])
+            self.assertEqual(raised.exception.code, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import unittest
+from application import PageGenerationError
+from sitedb import SiteDatabase, extract_links, page_url
+from support import TempDirTestCase
+
+class TestSiteDatabase(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = self._path("content")
+        self.database = SiteDatabase(self._path("site.sqlite"))
+
+    def tearDown(self):
+        self.database.close()
+
+    def _write(self, relative_path: str, text: str, mtime: int = 1_700_000_000) -> str:
+        path = super()._write(os.path.join("content", relative_path), text)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "/")
+        self.assertEqual(page_url(os.path.join("blog", "tom", "index.html")), "/blog/tom/")
+        self.assertEqual(page_url("about.html"), "/about.html")
+
+    def test_extract_links_skips_code_blocks(self):
+        markdown = "A [link](/a) and ![image](/i.png)\n\n```\n[not a link](/b)\n```"
+        self.assertEqual(extract_links(markdown), [("/i.png", True), ("/a", False)])
+
+    def test_update_indexes_only_changed_pages(self):
+        self._write("index.md", "# Home\n\n[Post](/blog/post/)")
+        post = self._write("blog/post/index.md", "---\ntitle: Post\ndate: 2024-05-01\ntags: [elves]\n---\n# Heading")
+        self.assertEqual(self.database.update(self.content), (2, 0))
+        self.assertEqual(self.database.update(self.content), (0, 0))
+
+        self._write("blog/post/index.md", "---\ntitle: Post\ndate: 2024-05-02\ntags: [elves, rings]\n---\n# Heading", mtime=1_700_000_100)
+        os.remove(os.path.join(self.content, "index.md"))
+        self.assertEqual(self.database.update(self.content), (1, 1))
+
+        [page] = self.database.pages()
+        self.assertEqual((page["source"], page["url"], page["title"], page["date"]), (post, "/blog/post/", "Post", "2024-05-02"))
+        self.assertEqual(sorted(self.database.tags()), ["elves", "rings"])
+        self.assertEqual(self.database.links(), [])
+
+    def test_drafts_are_left_out_of_listings(self):
+        self._write("blog/draft/index.md", "---\ndraft: true\n---\n# Draft")
+        self.database.update(self.content)
+        self.assertEqual(self.database.pages(), [])
+        self.assertEqual(len(self.database.pages(drafts=True)), 1)
+
+    def test_errors_name_the_source_file(self):
+        broken = self._write("broken.md", "---\ndraft: maybe\n---\n# Broken")
+        with self.assertRaisesRegex(PageGenerationError, "broken.md"):
+            self.database.update(self.content)
+
+if __name__ == "__main__":
+    unittest.main()
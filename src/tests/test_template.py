@@ -0,0 +1,66 @@
+import os
+import unittest
+from support import TempDirTestCase
+from template import TemplateLoader, compile_template
+
+class TestTemplate(TempDirTestCase):
+    def test_compiles_into_literals_and_placeholders(self):
+        path = self._write("template.html", "<title>{{ Title }}</title><article>{{Content}}</article>")
+        template = compile_template(path)
+        self.assertEqual(template.literals, ["<title>", "</title><article>", "</article>"])
+        self.assertEqual(template.names, ["Title", "Content"])
+
+    def test_render_fills_variables(self):
+        path = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}{{ Missing }}")
+        rendered = compile_template(path).render({"Title": "Hi", "Content": "<p>{{ Title }}</p>"})
+        self.assertEqual(rendered, "<title>Hi</title><p>{{ Title }}</p>")
+
+    def test_rebased_only_changes_site_absolute_attributes(self):
+        path = self._write("template.html", '<link href="/index.css"><script src="//cdn/x.js"></script>{{ Content }}')
+        template = compile_template(path)
+        rebased = template.rebased("/site/")
+        self.assertEqual(rebased.render({"Content": '<a href="/x">'}), '<link href="/site/index.css"><script src="//cdn/x.js"></script><a href="/x">')
+        self.assertIs(template.rebased("/site/"), rebased)
+        self.assertEqual(rebased.hash, template.hash)
+
+    def test_include_is_inlined(self):
+        self._write("partials/nav.html", "<nav>{{ Title }}</nav>")
+        path = self._write("template.html", '<body>{% include "partials/nav.html" %}{{ Content }}</body>')
+        template = compile_template(path)
+        self.assertEqual(template.render({"Title": "T", "Content": "C"}), "<body><nav>T</nav>C</body>")
+        self.assertEqual(len(template.dependencies), 2)
+
+    def test_layout_inheritance_overrides_blocks(self):
+        self._write("base.html", "<h1>{% block header %}Default{% endblock %}</h1><main>{% block main %}{% endblock %}</main>")
+        path = self._write("post.html", '{% extends "base.html" %}\n{% block main %}<article>{{ Content }}</article>{% endblock %}')
+        rendered = compile_template(path).render({"Content": "Body"})
+        self.assertEqual(rendered, "<h1>Default</h1><main><article>Body</article></main>")
+
+    def test_include_cycle_raises(self):
+        self._write("a.html", '{% include "b.html" %}')
+        path = self._write("b.html", '{% include "a.html" %}')
+        with self.assertRaisesRegex(ValueError, "Template include cycle"):
+            compile_template(path)
+
+    def test_unknown_tag_raises(self):
+        path = self._write("template.html", "{% for item in items %}")
+        with self.assertRaisesRegex(ValueError, "Unknown template tag 'for'"):
+            compile_template(path)
+
+    def test_loader_reloads_only_when_a_file_changes(self):
+        partial = self._write("partial.html", "v1")
+        path = self._write("template.html", '{% include "partial.html" %}')
+        loader = TemplateLoader()
+
+        first = loader.load(path)
+        self.assertIs(loader.load(path), first)
+
+        self._write("partial.html", "v2!")
+        os.utime(partial, ns=(1, 1))
+        second = loader.load(path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render({}), "v2!")
+        self.assertNotEqual(second.hash, first.hash)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import unittest
+from application import generate_page, generate_pages_parallel
+from main import parse_args, renders_pages_in_threads
+from pipeline import generate_pages_pipeline
+from support import TempDirTestCase
+import tracing
+
+class TestTracer(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tracer = tracing.Tracer()
+        self.previous = tracing.set_tracer(self.tracer)
+
+    def tearDown(self):
+        tracing.set_tracer(self.previous)
+
+    def test_span_records_complete_event(self):
+        with tracing.span("discovery", pages=3):
+            pass
+        event, = self.tracer.events
+        self.assertEqual(event["name"], "discovery")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["args"], {"pages": 3})
+        self.assertGreaterEqual(event["dur"], 0)
+
+    def test_null_tracer_records_nothing(self):
+        tracing.set_tracer(tracing.NullTracer())
+        with tracing.span("read"), tracing.page("a.md"):
+            pass
+        self.assertEqual(self.tracer.events, [])
+
+    def test_generate_page_records_every_phase(self):
+        source = self._write("content/index.md", "# Title\n\nSome **text**")
+        template = self._write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        generate_page("/", source, template, os.path.join(self.root, "docs", "index.html"))
+
+        names = {event["name"] for event in self.tracer.events}
+        self.assertEqual(names, {"page", "read", "dedent", "block split", "inline parse", "render", "template fill", "basepath rewrite", "write"})
+        self.assertEqual([source], list(self.tracer.page_times))
+
+    def test_parallel_build_merges_worker_traces(self):
+        for name in ("a", "b", "c"):
+            self._write(f"content/{name}.md", f"# {name}")
+        template = self._write("template.html", "{{ Content }}")
+        generate_pages_parallel("/", os.path.join(self.root, "content"), template, os.path.join(self.root, "docs"), 2, executor="process")
+
+        self.assertEqual(len(self.tracer.page_times), 3)
+        self.assertEqual(sum(event["name"] == "write" for event in self.tracer.events), 3)
+
+    def test_pipeline_adds_up_the_stages_of_every_page(self):
+        sources = [self._write(f"content/{name}.md", f"# {name}") for name in ("a", "b", "c")]
+        template = self._write("template.html", "{{ Content }}")
+        generate_pages_pipeline("/", os.path.join(self.root, "content"), template, os.path.join(self.root, "docs"))
+
+        self.assertEqual(sorted(self.tracer.page_times), sorted(sources))
+        page_spans = {}
+        for event in self.tracer.events:
+            if event["name"] == "page":
+                page_spans[event["args"]["source"]] = page_spans.get(event["args"]["source"], 0) + event["dur"] / 1_000_000
+        for source in sources:
+            self.assertAlmostEqual(self.tracer.page_times[source], page_spans[source], places=3)
+
+    def test_memory_peaks_and_slowest_pages(self):
+        tracer = tracing.Tracer(memory=True)
+        tracing.set_tracer(tracer)
+        with tracing.page("small.md"):
+            pass
+        with tracing.page("large.md"):
+            data = bytearray(2_000_000)
+        del data
+
+        self.assertGreater(tracer.page_peaks["large.md"], 1_000_000)
+        self.assertEqual(len(tracer.slowest_pages(1)), 1)
+
+    def test_pages_render_in_threads(self):
+        self.assertFalse(renders_pages_in_threads(parse_args(["--executor", "thread"])))
+        self.assertFalse(renders_pages_in_threads(parse_args(["--jobs", "2", "--executor", "process"])))
+        self.assertTrue(renders_pages_in_threads(parse_args(["--jobs", "2", "--executor", "thread"])))
+        self.assertTrue(renders_pages_in_threads(parse_args(["--pipeline"])))
+
+    def test_chrome_trace_is_relative_to_first_event(self):
+        with tracing.span("build"):
+            with tracing.span("write"):
+                pass
+        path = os.path.join(self.root, "trace.json")
+        self.tracer.write_chrome_trace(path)
+
+        with open(path) as f:
+            trace = json.load(f)
+        self.assertEqual(min(event["ts"] for event in trace["traceEvents"]), 0)
+        self.assertEqual({event["name"] for event in trace["traceEvents"]}, {"build", "write"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import unittest
+from support import TempDirTestCase
+from watcher import InotifyWatcher, PollingWatcher
+
+def inotify_available() -> bool:
+    try:
+        InotifyWatcher([]).close()
+    except (AttributeError, OSError, TypeError):
+        return False
+    return True
+
+class WatcherTests:
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.realpath(self.root)
+        os.makedirs(os.path.join(self.root, "content", "blog"))
+        self.template = self._write("template.html", "v1")
+        self.watcher = self.create([os.path.join(self.root, "content")], [self.template])
+
+    def tearDown(self):
+        self.watcher.close()
+
+    def _read_all(self) -> set[str]:
+        changed = set()
+        while more := self.watcher.read(0.3):
+            changed |= more
+        return changed
+
+    def test_reports_changed_files(self):
+        page = self._write("content/blog/post.md", "# Post")
+        self.assertIn(page, self._read_all())
+
+        os.remove(page)
+        self.assertIn(page, self._read_all())
+
+    def test_reports_watched_files_only(self):
+        self._write("unwatched.html", "x")
+        self._write("template.html", "v2!")
+        self.assertEqual(self._read_all(), {self.template})
+
+    def test_new_directories_are_watched(self):
+        os.makedirs(os.path.join(self.root, "content", "new"))
+        self._read_all()
+        page = self._write("content/new/index.md", "# New")
+        self.assertIn(page, self._read_all())
+
+    def test_batches_group_a_burst_of_changes(self):
+        pages = {self._write(f"content/{i}.md", "# Page") for i in range(5)}
+        batch = next(self.watcher.batches(debounce=0.3))
+        self.assertTrue(pages <= batch)
+
+class TestPollingWatcher(WatcherTests, TempDirTestCase):
+    def create(self, directories: list[str], files: list[str]) -> PollingWatcher:
+        return PollingWatcher(directories, files, interval=0.05)
+
+    def _write(self, relative_path: str, text: str) -> str:
+        path = super()._write(relative_path, text)
+        # Make the change visible even on filesystems with coarse mtimes
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return path
+
+@unittest.skipUnless(inotify_available(), "inotify is not available")
+class TestInotifyWatcher(WatcherTests, TempDirTestCase):
+    def create(self, directories: list[str], files: list[str]) -> InotifyWatcher:
+        return InotifyWatcher(directories, files)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 from enum import Enum
 from leafnode import LeafNode
+from parentnode import ParentNode
 
 class TextType(Enum):
     NORMAL = "Normal"
@@ -10,12 +11,26 @@ class TextType(Enum):
     IMAGE = "Image"
 
 class TextNode:
-    def __init__(self, text, type, url=None):
+    __slots__ = ("text", "type", "url", "children")
+
+    def __init__(self, text, type, url=None, children=None):
         self.text = text
         self.type = type
         self.url = url
+        # Nested spans, e.g. bold text inside a link
+        self.children = children
     
     def text_node_to_html_node(self):
+        if self.children:
+            children = [child.text_node_to_html_node() for child in self.children]
+            if self.type == TextType.BOLD:
+                return ParentNode("b", children)
+            elif self.type == TextType.ITALIC:
+                return ParentNode("i", children)
+            elif self.type == TextType.LINK:
+                return ParentNode("a", children, {"href": self.url})
+            raise ValueError(f"Text type cannot have nested spans: {self.type}")
+
         if self.type == TextType.NORMAL:
             return LeafNode(None, self.text, None)
         elif self.type == TextType.BOLD:
@@ -32,7 +47,14 @@ class TextNode:
     def __eq__(self, value):
         if not isinstance(value, self.__class__):
             return False
-        return self.text == value.text and self.type == value.type and self.url == value.url
+        return (
+            self.text == value.text and
+            self.type == value.type and
+            self.url == value.url and
+            self.children == value.children
+        )
 
     def __repr__(self):
+        if self.children:
+            return f"TextNode({self.text}, {self.type.value}, {self.url}, {self.children})"
         return f"TextNode({self.text}, {self.type.value}, {self.url})"
\ No newline at end of file
@@ -0,0 +1,126 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Iterator
+
+class NullTracer:
+    """The default tracer: records nothing and costs next to nothing."""
+
+    enabled = False
+    memory = False
+
+    def span(self, name: str, **args) -> contextlib.AbstractContextManager:
+        return contextlib.nullcontext()
+
+    def page(self, source_path: str) -> contextlib.AbstractContextManager:
+        return contextlib.nullcontext()
+
+class Tracer:
+    """
+    Records timed spans as Chrome trace events ("X" complete events), which
+    chrome://tracing and ui.perfetto.dev can open, plus the total time spent
+    on every page. With memory=True, tracemalloc also records the peak memory
+    of each page. The peak is process-wide and reset when a page starts, so it
+    is only right when a process renders one page at a time; pages rendered
+    by concurrent threads reset and share each other's peaks.
+    """
+
+    enabled = True
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.events = []
+        self.page_times = {}
+        self.page_peaks = {}
+        self.lock = threading.Lock()
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "ph": "X",
+                # perf_counter is system-wide on Linux, so worker process timestamps line up
+                "ts": start * 1_000_000,
+                "dur": (end - start) * 1_000_000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            with self.lock:
+                self.events.append(event)
+
+    @contextlib.contextmanager
+    def page(self, source_path: str) -> Iterator[None]:
+        if self.memory:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        with self.span("page", source=source_path):
+            yield
+
+        with self.lock:
+            # A page handled in several steps, like the stages of --pipeline, gets their total
+            self.page_times[source_path] = self.page_times.get(source_path, 0) + time.perf_counter() - start
+            if self.memory:
+                self.page_peaks[source_path] = max(self.page_peaks.get(source_path, 0), tracemalloc.get_traced_memory()[1])
+
+    def merge(self, events: list[dict], page_times: dict[str, float], page_peaks: dict[str, int]):
+        """Adds what a tracer in a worker process recorded."""
+        with self.lock:
+            self.events.extend(events)
+            self.page_times.update(page_times)
+            self.page_peaks.update(page_peaks)
+
+    def slowest_pages(self, count: int = 10) -> list[tuple[str, float]]:
+        return sorted(self.page_times.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def phase_totals(self) -> dict[str, float]:
+        totals = {}
+        for event in self.events:
+            totals[event["name"]] = totals.get(event["name"], 0) + event["dur"] / 1_000_000
+        return totals
+
+    def write_chrome_trace(self, path: str):
+        origin = min((event["ts"] for event in self.events), default=0)
+        events = [{**event, "ts": event["ts"] - origin} for event in self.events]
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def print_summary(self, count: int = 10):
+        print("Time per phase:")
+        for name, seconds in sorted(self.phase_totals().items(), key=lambda item: item[1], reverse=True):
+            print(f"  {name:<16} {seconds:9.4f}s")
+
+        print(f"Slowest {min(count, len(self.page_times))} of {len(self.page_times)} pages:")
+        for source_path, seconds in self.slowest_pages(count):
+            peak = self.page_peaks.get(source_path)
+            memory = f" (peak {peak / 1_000_000:.1f} MB)" if peak is not None else ""
+            print(f"  {seconds:9.4f}s {source_path}{memory}")
+
+tracer = NullTracer()
+
+def set_tracer(new_tracer: NullTracer | Tracer) -> NullTracer | Tracer:
+    """Installs the tracer used by span() and page() and returns the previous one."""
+    global tracer
+    previous = tracer
+    tracer = new_tracer
+    return previous
+
+def span(name: str, **args) -> contextlib.AbstractContextManager:
+    return tracer.span(name, **args)
+
+def page(source_path: str) -> contextlib.AbstractContextManager:
+    return tracer.page(source_path)
@@ -0,0 +1,187 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Iterable, Iterator
+
+# From <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+class Watcher:
+    """
+    Reports which files changed below a set of directories (watched
+    recursively) and a set of single files. A change to something that can't
+    be narrowed down to files, like a lost inotify event, is reported as the
+    watched directory itself.
+    """
+
+    def __init__(self, directories: Iterable[str], files: Iterable[str] = ()):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.files = set()
+        self.add_files(files)
+
+    def add_files(self, files: Iterable[str]):
+        self.files.update(os.path.abspath(path) for path in files)
+
+    def read(self, timeout: float) -> set[str]:
+        """Waits up to timeout seconds and returns the absolute paths that changed."""
+        raise NotImplementedError
+
+    def batches(self, debounce: float = 0.1, poll_timeout: float = 1.0) -> Iterator[set[str]]:
+        """
+        Yields the paths changed by each burst of events, once nothing more
+        has changed for debounce seconds. An editor saving, a git checkout or
+        a copied directory then triggers a single rebuild.
+        """
+        while True:
+            changed = self.read(poll_timeout)
+            if not changed:
+                continue
+
+            while more := self.read(debounce):
+                changed |= more
+            yield changed
+
+    def close(self):
+        pass
+
+class PollingWatcher(Watcher):
+    """Compares the size and mtime of every watched file every interval seconds."""
+
+    def __init__(self, directories: Iterable[str], files: Iterable[str] = (), interval: float = 0.5):
+        super().__init__(directories, files)
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def add_files(self, files: Iterable[str]):
+        super().add_files(files)
+        if hasattr(self, "snapshot"):
+            self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        paths = list(self.files)
+        for directory in self.directories:
+            for dir_path, dir_names, file_names in os.walk(directory):
+                paths.extend(os.path.join(dir_path, name) for name in file_names)
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def read(self, timeout: float) -> set[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(max(min(self.interval, deadline - time.monotonic()), 0))
+
+            snapshot = self._snapshot()
+            changed = {
+                path for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+class InotifyWatcher(Watcher):
+    """Uses Linux inotify through ctypes, so no dependency is needed."""
+
+    def __init__(self, directories: Iterable[str], files: Iterable[str] = ()):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch descriptor -> (directory, whether the directory is watched recursively)
+        self.watches = {}
+        super().__init__(directories, files)
+
+        for directory in self.directories:
+            self._watch_tree(directory)
+
+    def add_files(self, files: Iterable[str]):
+        files = [os.path.abspath(path) for path in files]
+        super().add_files(files)
+
+        # Editors often save by renaming a new file over the old one, so the
+        # parent directory is watched instead of the file itself
+        if hasattr(self, "fd"):
+            for path in files:
+                self._watch(os.path.dirname(path), recursive=False)
+
+    def _watch(self, directory: str, recursive: bool):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+
+        previous = self.watches.get(wd)
+        self.watches[wd] = (directory, recursive or (previous is not None and previous[1]))
+
+    def _watch_tree(self, directory: str):
+        for dir_path, dir_names, file_names in os.walk(directory):
+            self._watch(dir_path, recursive=True)
+
+    def read(self, timeout: float) -> set[str]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0"))
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, only a full rescan is safe
+                changed.update(self.directories)
+                changed.update(self.files)
+                continue
+
+            if wd not in self.watches or not name:
+                continue
+
+            directory, recursive = self.watches[wd]
+            path = os.path.join(directory, name)
+
+            if recursive:
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                changed.add(path)
+            elif path in self.files:
+                changed.add(path)
+
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+def create_watcher(directories: Iterable[str], files: Iterable[str] = (), poll: bool = False) -> Watcher:
+    """Returns an InotifyWatcher where inotify is available and a PollingWatcher otherwise."""
+    if not poll:
+        try:
+            return InotifyWatcher(directories, files)
+        except (AttributeError, OSError, TypeError):
+            pass
+    return PollingWatcher(directories, files)